@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+"""Band products (octave, third-octave or log-spaced band PSDs and RMS) from accumulated PSDs.
+
+A daily or ensemble PSD has nfft/2+1 bins (32769 or 65537 per axis), far more than a plot, comparison or export of it
+needs.  A BandSpectrum reduces each column (x, y, z and RSS) to average PSD and RMS (grms) in a few dozen to a few
+hundred bands.  Bands have centers 10**(n/b) and edges 10**((n-0.5)/b) and 10**((n+0.5)/b) for b bands per decade
+(10/3 for octave bands and 10 for third-octave bands, the base-10 ANSI S1.11 bands), and power in a band comes from the
+running integral of the PSD, taken linearly across bins that straddle a band edge, so band powers add up exactly to the
+total.  Band products for a psdsum file are cached next to it.
+"""
+
+import os
+import numpy as np
+from scipy.io import savemat, loadmat
+
+from ugaudio.spectral_average_calc import PsdAccumulator
+
+# bands per decade for each kind of band (log bands take bands_per_decade as given)
+BANDS_PER_DECADE = {'octave': 10.0 / 3.0, 'third': 10.0}
+
+
+def _bands_per_decade(kind, bands_per_decade=None):
+    """return bands per decade for kind of band ('octave', 'third' or 'log')"""
+    if kind == 'log':
+        if not bands_per_decade:
+            raise ValueError('log bands need bands_per_decade')
+        return float(bands_per_decade)
+    if kind not in BANDS_PER_DECADE:
+        raise ValueError('unhandled kind of band "%s" (use octave, third or log)' % kind)
+    return BANDS_PER_DECADE[kind]
+
+
+def band_edges(fmin, fmax, kind='third', bands_per_decade=None):
+    """return (centers, lo, hi) of bands with centers from fmin to fmax"""
+    b = _bands_per_decade(kind, bands_per_decade)
+    n = np.arange(np.ceil(round(b * np.log10(fmin), 9)), np.floor(round(b * np.log10(fmax), 9)) + 1)
+    return 10.0 ** (n / b), 10.0 ** ((n - 0.5) / b), 10.0 ** ((n + 0.5) / b)
+
+
+def band_power(psd, deltaf, lo, hi):
+    """return power (g**2) in each band from lo to hi for each column of PSD with bins every deltaf from zero Hz
+
+    Bin k covers (k - 0.5) * deltaf to (k + 0.5) * deltaf; a bin that straddles a band edge is split linearly.
+    """
+    n = psd.shape[0]
+    edges = (np.arange(n + 1) - 0.5) * deltaf
+    cum = np.zeros((n + 1,) + psd.shape[1:])
+    np.cumsum(psd * deltaf, axis=0, out=cum[1:])
+    cum = cum.reshape((n + 1, -1))
+    power = np.empty((lo.size, cum.shape[1]))
+    for j in xrange(cum.shape[1]):
+        power[:, j] = np.interp(hi, edges, cum[:, j]) - np.interp(lo, edges, cum[:, j])
+    return power.reshape((lo.size,) + psd.shape[1:])
+
+
+class BandSpectrum(object):
+    """A class for band PSDs and RMS (grms) of a PSD, e.g. a daily or ensemble spectral average.
+
+    The psd attribute is the average PSD in each band and grms is RMS in each
+    band, both (bands, columns) with columns of the input PSD (x, y, z and
+    RSS for a PsdAccumulator).  With rss (for x, y, z and RSS columns), grms
+    of the RSS column is root of the sum of x, y and z band powers, so it is
+    the RMS of the vector magnitude, not an integral of the RSS PSD (which
+    would be smaller).  Bands go from the one whose center is at or
+    above the first nonzero bin to the one whose center is at or below the
+    last bin; bands narrower than a bin are just split from it linearly.
+
+    """
+
+    def __init__(self, psd, deltaf, kind='third', bands_per_decade=None, count=0, rss=False):
+        self.kind = kind
+        self.bands_per_decade = _bands_per_decade(kind, bands_per_decade)
+        self.deltaf = float(deltaf)
+        self.count = count  # num segments in average the bands came from (for reference)
+        fmax = (psd.shape[0] - 1) * self.deltaf
+        self.centers, self.lo, self.hi = band_edges(self.deltaf, fmax, kind=kind,
+                                                    bands_per_decade=self.bands_per_decade)
+        power = band_power(psd, self.deltaf, self.lo, self.hi)
+        self.psd = power / (self.hi - self.lo).reshape((-1,) + (1,) * (power.ndim - 1))
+        if rss:
+            power[:, 3] = power[:, 0:3].sum(axis=1)
+        self.grms = np.sqrt(np.maximum(power, 0.0))
+
+    def __str__(self):
+        """str(self)"""
+        return '%s with %d %s bands from %g to %g Hz' % (self.__class__.__name__, self.centers.size, self.kind,
+                                                         self.lo[0], self.hi[-1])
+
+    def between(self, fmin, fmax):
+        """return (centers, psd, grms) for bands with centers from fmin to fmax"""
+        i = (self.centers >= fmin) & (self.centers <= fmax)
+        return self.centers[i], self.psd[i], self.grms[i]
+
+    def total_grms(self, fmin=0.0, fmax=np.inf):
+        """return RMS (grms) over bands with centers from fmin to fmax (root sum of squares of band grms)"""
+        centers, psd, grms = self.between(fmin, fmax)
+        return np.sqrt((grms ** 2).sum(axis=0))
+
+    def save(self, file_name, psdsum_stamp=None):
+        """save band products to mat file (with size, mtime & count of psdsum file they came from, if given)"""
+        mdict = {'kind': self.kind, 'bands_per_decade': self.bands_per_decade, 'deltaf': self.deltaf,
+                 'count': self.count, 'centers': self.centers, 'lo': self.lo, 'hi': self.hi, 'psd': self.psd,
+                 'grms': self.grms}
+        if psdsum_stamp is not None:
+            mdict['psdsum_stamp'] = np.array(psdsum_stamp, dtype=np.float64)
+        savemat(file_name, mdict)
+
+    @classmethod
+    def load(cls, file_name):
+        """return band products loaded from mat file written by save"""
+        m = loadmat(file_name)
+        bs = cls.__new__(cls)
+        bs.kind, bs.bands_per_decade = str(m['kind'][0]), float(m['bands_per_decade'][0][0])
+        bs.deltaf, bs.count = float(m['deltaf'][0][0]), int(m['count'][0][0])
+        bs.centers, bs.lo, bs.hi = m['centers'].ravel(), m['lo'].ravel(), m['hi'].ravel()
+        bs.psd, bs.grms = m['psd'], m['grms']
+        return bs
+
+    def save_csv(self, csv_file):
+        """save band centers, edges, PSDs and grms to csv file (e.g. for a spreadsheet)"""
+        cols = ['x', 'y', 'z', 'rss'][:self.psd.shape[1]]
+        names = ['center_hz', 'lo_hz', 'hi_hz'] + ['psd_%s' % c for c in cols] + ['grms_%s' % c for c in cols]
+        table = np.column_stack((self.centers, self.lo, self.hi, self.psd, self.grms))
+        np.savetxt(csv_file, table, fmt='%.6e', delimiter=',', header=','.join(names), comments='')
+
+
+def accumulator_bands(pa, kind='third', bands_per_decade=None):
+    """return BandSpectrum for spectral average of PsdAccumulator pa"""
+    return BandSpectrum(pa.spectral_avg(), pa.f[1], kind=kind, bands_per_decade=bands_per_decade, count=pa.count,
+                        rss=True)
+
+
+def band_filename(psdsum_file, kind='third', bands_per_decade=None):
+    """return band products file name for psdsum file (e.g. "..._psdsum.mat" -> "..._third_bands.mat")"""
+    tag = 'log%g' % bands_per_decade if kind == 'log' else kind
+    return psdsum_file.replace('_psdsum.mat', '') + '_%s_bands.mat' % tag
+
+
+def _psdsum_stamp(psdsum_file):
+    """return (size, mtime, count) of psdsum file (count is the only variable read from it)"""
+    st = os.stat(psdsum_file)
+    count = int(loadmat(psdsum_file, variable_names=['count'])['count'][0][0])
+    return st.st_size, st.st_mtime, count
+
+
+def psdsum_bands(psdsum_file, kind='third', bands_per_decade=None):
+    """return BandSpectrum for psdsum file, cached next to it and reused while psdsum file is the one it came from
+
+    Band file keeps size, mtime and count of the psdsum file it came from, so a psdsum file rewritten within the
+    (coarse, on some filesystems) mtime resolution of the band file still gets new bands.
+    """
+    band_file = band_filename(psdsum_file, kind=kind, bands_per_decade=bands_per_decade)
+    stamp = _psdsum_stamp(psdsum_file)
+    if os.path.exists(band_file):
+        m = loadmat(band_file, variable_names=['psdsum_stamp'])
+        if 'psdsum_stamp' in m and tuple(m['psdsum_stamp'].ravel()) == stamp:
+            return BandSpectrum.load(band_file)
+    bs = accumulator_bands(PsdAccumulator.load_psdsum_matfile(psdsum_file), kind=kind,
+                           bands_per_decade=bands_per_decade)
+    bs.save(band_file, psdsum_stamp=stamp)
+    return bs
+
+
+if __name__ == '__main__':
+
+    import glob
+    for f in sorted(glob.glob('C:/temp/psdsum/year2020/month04/*_121f08_500p0_32768_psdsum.mat')):
+        bs = psdsum_bands(f)
+        print os.path.basename(f), bs
+        print '  grms [ug] 0-3 Hz:', 1.0e6 * bs.total_grms(fmax=3.0)
@@ -3,24 +3,58 @@
 """Convert binary files to Audio Interchange File Format (AIFF).
 
     Given properly-formatted binary data file(s), convert and write the
-    information in Audio Interchange File Format (AIFF) file(s).
+    information in Audio Interchange File Format (AIFF) file(s), or WAV
+    file(s) if you prefer.
 
     DISCLAIMER: this project deserves more time than I am able to give and
     probably could benefit from more graceful handling of the unexpected.
 """
 
 import sys
+import time
+from multiprocessing import Pool
 from ugaudio.pad import PadFile
 from ugaudio.demo import demo_chirp, demo_accel
-from ugaudio.inputs import parse_args, show_args
+from ugaudio.inputs import parse_inputs, show_args
+
+# Wait this long (sec) for a worker result; any timeout lets ctrl-c reach us (Python 2 quirk).
+_FOREVER = 999999
+
+# Convert one file and return (file description, message, seconds); this runs in worker for jobs > 1.
+def convert_file(job):
+    """Convert one file and return (file description, message, seconds); this runs in worker for jobs > 1."""
+    filename, rate, axis, plot, taper, multichannel, fmt = job
+    tzero = time.time()
+    pad_file = PadFile(filename)
+    if pad_file.ispad:
+        
+        try:
+            pad_file.convert(rate=rate, axis=axis, plot=plot, taper=taper, multichannel=multichannel, fmt=fmt)
+            msg = 'succeeded'
+        
+        # ctrl-c goes to workers too, so just report it and let main clean up
+        except KeyboardInterrupt:
+            msg = 'interrupted'
+        
+        # FIXME with better exception handling               
+        except:
+            msg = 'failed' # just this one file, not a total failure
+            
+    else:
+        
+        # file must not be properly formatted!?
+        msg = 'not attempted'
+    
+    return str(pad_file), msg, time.time() - tzero
 
 # Parse input arguments and, if possible, convert to AIFF and return exit (status) code.
 def main():
     """Parse input arguments and, if possible, convert to AIFF and return exit (status) code."""
 
     # parse input arguments and show'em
-    mode, axis, rate, taper, files = parse_args()
-    show_args(mode, axis, rate, taper, files)
+    args = parse_inputs()
+    mode, axis, rate, taper, jobs, files = args.m, args.a, args.r, args.t, args.j, args.files
+    show_args(mode, axis, rate, taper, files, jobs=jobs)
 
     # demo and exit
     if mode == 'demo':
@@ -31,31 +65,38 @@ def main():
     # boolean: to plot or not to plot
     plot = ( mode == 'plot' )
 
-    # iterate over input file list
-    for i, filename in enumerate(files):
-        pad_file = PadFile(filename)
-        if pad_file.ispad:
-            
-            try:
-                pad_file.convert(rate=rate, axis=axis, plot=plot, taper=taper)
-                msg = 'succeeded'
-                
-             # FIXME if you know how to handle ctrl-c more gracefully
-            except KeyboardInterrupt:
-                print '\nuser pressed ctrl-c to exit...good-bye'
-                return 3
-            
-            # FIXME with better exception handling               
-            except:
-                msg = 'failed' # just this one file, not a total failure
-                
-        else:
-            
-            # file must not be properly formatted!?
-            msg = 'not attempted'
+    # one conversion job per input file
+    conversions = [ (filename, rate, axis, plot, taper, args.c, args.f) for filename in files ]
+
+    # convert files one at a time in this process, or fan out to pool of worker processes
+    pool = None
+    if jobs > 1:
+        pool = Pool(jobs)
+        pending = [ pool.apply_async(convert_file, (c,)) for c in conversions ]
+        pool.close()
+        results = ( p.get(_FOREVER) for p in pending )
+    else:
+        results = ( convert_file(c) for c in conversions )
+
+    # iterate over results (in input file order)
+    try:
+        for i, (desc, msg, seconds) in enumerate(results):
+            if msg == 'interrupted':
+                raise KeyboardInterrupt
             
-        # show one-line message for each conversion
-        print '%d. %s: conversion %s' % (i + 1, pad_file, msg)
+            # show one-line message for each conversion
+            print '%d. %s: conversion %s (%.2f sec)' % (i + 1, desc, msg, seconds)
+    
+    # FIXME if you know how to handle ctrl-c more gracefully
+    except KeyboardInterrupt:
+        if pool:
+            pool.terminate()
+            pool.join()
+        print '\nuser pressed ctrl-c to exit...good-bye'
+        return 3
+    
+    if pool:
+        pool.join()
         
     return 0  # exit code zero for success
 
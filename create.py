@@ -1,11 +1,11 @@
 #!/usr/bin/env python
 
-import aifc
 import numpy as np
 import tempfile
 import matplotlib.pyplot as plt
 from scipy.signal import chirp
-from ugaudio.load import aiffread, padread
+from ugaudio.load import aiffread, aiffmap, iter_aiff_chunks, padread
+from ugaudio.write import audiowrite_chunks
 
 # A class to implement a "signal" with alternating integers.
 class AlternateIntegers(object):
@@ -40,22 +40,8 @@ class AlternateIntegers(object):
     # Write data to AIFF file, fname.
     def aiffwrite(self, fname, fs=22050):
         """Write data to AIFF file, fname."""
-        # normalize to range +/-32000
-        data = self.signal / self.value
-        data = data * 32000.0
-        
-        # data conditioning
-        data = data.astype(np.int16) # not sure why we need this...maybe aifc assumptions
-        data = data.byteswap().newbyteorder() # need this on mac osx and linux (windows?)
-        
-        # convert data to string for aifc to work write
-        strdata = data.tostring()
-        g = aifc.open(fname, 'w')
-        sampwidth = 2
-        #nchannels, sampwidth, framerate, nframes, comptype, compname
-        g.setparams((1, sampwidth, fs, len(data), 'NONE', 'not compressed'))
-        g.writeframes(strdata)
-        g.close()
+        # normalize to range +/-32000 as frames go to file (a block at a time)
+        audiowrite_chunks(fname, [self.signal], fs, scale=32000.0 / self.value, nframes=len(self.signal))
 
     def write_pad(self, fname, fs=500):
         """Write dummy pad file to fname with alternating integer values."""
@@ -123,13 +109,22 @@ def uncompressed_aiff2pad(fname):
     # name for output PAD file
     pad_file = fname + '.pad'
     
-    # load data from AIFF file
-    x, params = aiffread(fname)
+    # get sample rate from AIFF file
+    m, params = aiffmap(fname)
     fs = params[2] # sample rate
+    del m
     
-    # Create y-axis data
-    y = -0.5 * x
-    padwrite(x, y, y, fs, pad_file) # NOTE: z = y
+    # convert (and write) a chunk of AIFF frames at a time (NOTE: z = y)
+    row = 0
+    with open(pad_file, 'wb') as f:
+        for x in iter_aiff_chunks(fname):
+            data = np.empty((len(x), 4), dtype=np.float32)
+            data[:, 0] = np.arange(row, row + len(x)) / float(fs)
+            data[:, 1] = x
+            data[:, 2] = -0.5 * x
+            data[:, 3] = data[:, 2]
+            data.tofile(f)
+            row += len(x)
 
 # quick demo to write 4-column PAD file
 def demo_write_pad_file(fname):
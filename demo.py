@@ -1,14 +1,15 @@
 #!/usr/bin/env python
 
-import aifc
 import os.path
 import numpy as np
 import matplotlib.pyplot as plt
-from ugaudio.load import padread
+from ugaudio.load import padread, build_day_array, pad_num_rows
 from ugaudio.create import get_chirp
 from ugaudio.signal import normalize
 from ugaudio.pad import PadFile
-from scipy.signal import welch
+from ugaudio.write import audiowrite_chunks
+from ugaudio.loghist import LogHistogram
+from ugaudio.psd import psd_engine
 
 
 def demo_chirp(fs=44100):
@@ -19,30 +20,14 @@ def demo_chirp(fs=44100):
     # get signal of interest
     y = get_chirp()
 
-    # demean signal
-    data = y - y.mean(axis=0)
-
-    # normalize to range -32768:32767 (actually, use -32000:32000)
-    data = data * 32000.0
-    
-    # data conditioning
-    data = data.astype(np.int16) # not sure why we need this...maybe aifc assumptions
-    data = data.byteswap().newbyteorder() # need this on mac osx and linux (windows?)
-    
-    # convert data to string for aifc to work write
-    strdata = data.tostring()
+    # demean and normalize to range -32768:32767 (actually, use -32000:32000) as frames go to file
     aiff_file = 'demo_chirp.aiff'
-    g = aifc.open(aiff_file, 'w')
-    sampwidth = 2
-    #nchannels, sampwidth, framerate, nframes, comptype, compname
-    g.setparams((1, sampwidth, fs, len(data), 'NONE', 'not compressed'))
-    g.writeframes(strdata)
-    g.close()
+    audiowrite_chunks(aiff_file, [y], fs, offset=y.mean(axis=0), scale=32000.0, nframes=len(y))
     print 'wrote demo chirp sound file %s' % aiff_file
     
     # plot data
     png_file = 'demo_chirp.png'   
-    plt.plot(data)
+    plt.plot(32000.0 * (y - y.mean(axis=0)))
     plt.savefig(png_file)    
     print 'wrote demo accel plot file  %s' % png_file
 
@@ -100,50 +85,45 @@ def show_samplerate(header_file):
     print pad_file
 
 
-def demo_build_numpy_array(sensor, y, m, d, minMinutes=5.5, num_files=None, base_dir='C:/temp/pad'):
+def demo_build_numpy_array(sensor, y, m, d, minMinutes=5.5, num_files=None, base_dir='C:/temp/pad', index_file=None):
     import glob
     import datetime
-    from ugaudio.load import padread
     from pims.utils.pimsdateutil import datetime_to_ymd_path
     from pims.files.filter_pipeline import FileFilterPipeline, MinDurMinutesPad, HeaderMatchesRateCutoffLocSsaPad
     
     location = 'LAB1P2, ER7, Cold Atom Lab Front Panel'
     fs, fc = 500, 200
     
-    ffp = FileFilterPipeline(MinDurMinutesPad(minMinutes), HeaderMatchesRateCutoffLocSsaPad(fs, fc, location))
-    print ffp
-    
-    ymd_dir = datetime_to_ymd_path(datetime.date(y, m, d), base_dir=base_dir)
-    glob_pat = '%s/*_accel_%s/*%s' % (ymd_dir, sensor, sensor)
-    fnames = glob.glob(glob_pat)
-
-    print glob_pat
-    print 'we have %d files before filtering' % len(fnames),
-    filt_fnames = list( ffp(fnames) )
-    print 'and %d files after filtering' % len(filt_fnames)    
+    if index_file is not None:
+        # quick query of (SQLite) PAD index instead of glob and header parsing
+        from ugaudio.padindex import PadIndex, SSA_COORDS
+        idx = PadIndex(index_file, pad_dir=base_dir)
+        filt_fnames = idx.select(sensor, datetime.date(y, m, d), fs=fs, fc=fc, location=location,
+                                 min_minutes=minMinutes, data_coords=SSA_COORDS)
+        idx.close()
+        print 'we have %d files from %s' % (len(filt_fnames), index_file)
+    else:
+        ffp = FileFilterPipeline(MinDurMinutesPad(minMinutes), HeaderMatchesRateCutoffLocSsaPad(fs, fc, location))
+        print ffp
+        
+        ymd_dir = datetime_to_ymd_path(datetime.date(y, m, d), base_dir=base_dir)
+        glob_pat = '%s/*_accel_%s/*%s' % (ymd_dir, sensor, sensor)
+        fnames = glob.glob(glob_pat)
+
+        print glob_pat
+        print 'we have %d files before filtering' % len(fnames),
+        filt_fnames = list( ffp(fnames) )
+        print 'and %d files after filtering' % len(filt_fnames)    
     
     if num_files is None:
         num_files = len(filt_fnames)
     
-    file_count = 0
-    arr = np.empty((0, 5), dtype=np.float32)  # float32 matches what we read from PAD file
+    # one preallocated (N, 5) array of t, x, y, z & vecmag for all files (demeaned file by file)
     print '\nBEGIN'
-    for fname in filt_fnames[0:num_files]:
-        # read data from file (not using double type here like MATLAB would, so we get courser demeaning)
-        file_count += 1
-        a = padread(fname)
-        a[:, 1:4] = a[:, 1:4] - a[:, 1:4].mean(axis=0)  # demean x, y and z columns
-        v = np.array(np.sqrt(a[:, 1]**2 + a[:, 2]**2 + a[:, 3]**2))  # compute vector magnitude
-        #print v
-        #new_col = np.reshape(v, (-1, 1))
-        ncols = 1
-        v.shape = (v.size//ncols, ncols)
-        #print v.shape, a.shape
-        a = np.append(a, v, axis=1) # append to get 5th column for vecmag
-        #print v.shape, a.shape
-        arr = np.append(arr, a, axis=0)
-        #print arr.shape
-        print file_count, arr.shape, fname
+    for file_count, fname in enumerate(filt_fnames[0:num_files], 1):
+        print file_count, pad_num_rows(fname), fname
+    arr = build_day_array(filt_fnames[0:num_files])
+    print arr.shape
     print 'END'
     return arr
 
@@ -151,15 +131,15 @@ def demo_build_numpy_array(sensor, y, m, d, minMinutes=5.5, num_files=None, base
 def psd_xyzv(txyz, fs=500.0, nperseg=32768):
     """return array of PSDs from acceleration vs. time value input array"""
 
-    pa = PsdAccumulator(500.0, nperseg=32768)
+    # (cached) engine has window, scaling and frequencies for these parameters already
+    engine = psd_engine(fs, nperseg)
 
-    # delete first (time) column
-    xyz = np.delete(txyz, 0, axis=1)
+    # first (time) column is not needed; no copy here
+    xyz = txyz[:, 1:4]
 
-    # calculate how many segments we can fit into data length
+    # calculate how many (overlapping) segments we can fit into data length
     N = xyz.shape[0]
-    numsegs = N // nperseg
-    numpts = nperseg * numsegs
+    numsegs = engine.num_segments(N)
 
     # complain about not enough data for at least one segment and early return
     if numsegs < 1:
@@ -167,13 +147,10 @@ def psd_xyzv(txyz, fs=500.0, nperseg=32768):
         return
 
     else:
-        print 'numsegs = %d, nperseg = %d, numpts = %d' % (numsegs, nperseg, numpts)
+        print 'numsegs = %d, nperseg = %d, numpts = %d' % (numsegs, nperseg, N)
 
-    # now do actual trim (resize) here
-    xyz = np.resize(xyz, (numpts, 3))
-
-    # compute PSD for each column (each axis)
-    f, Pxx = welch(xyz, fs, nperseg=nperseg, axis=0)
+    # compute PSD for each column (each axis) with batched rfft's over segments
+    f, Pxx = engine.psd(xyz)
 
     print Pxx.shape
 
@@ -217,33 +194,23 @@ def demo_batch2(sensor, y, m, d, num_files=None, base_dir='C:/temp/pad'):
 def demo_batch_files():
 
     import glob
-    from ugaudio.load import padread
 
     sensor = '121f04'
     pad_dir = '/Users/ken/Downloads/pad'
     glob_pat = '%s/*%s' % (pad_dir, sensor)
     filenames = glob.glob(glob_pat)
 
-    arr = np.empty((0, 5), dtype=np.float32)    # float32 matches what we read from PAD file
-
     # FIXME how best to filter filenames at this point for like common header, min file dur, etc.
 
-    # TODO in filenames iteration, we need to add to histogram buckets, update count, etc. for running hist
-
-    for fname in filenames:
-        # read data from file (not using double type here like MATLAB would, so we get courser demeaning)
-        a = padread(fname)
-        a[:, 1:4] = a[:, 1:4] - a[:, 1:4].mean(axis=0)  # demean x, y and z columns
-        v = np.array(np.sqrt(a[:, 1]**2 + a[:, 2]**2 + a[:, 3]**2))  # compute vector magnitude
-        #print v
-        #new_col = np.reshape(v, (-1, 1))
-        ncols = 1
-        v.shape = (v.size//ncols, ncols)
-        # print v.shape, a.shape
-        a = np.append(a, v, axis=1)  # append to get 5th column for vecmag
-        # print v.shape, a.shape
-        arr = np.append(arr, a, axis=0)
-        print arr.shape, fname
+    # one preallocated (N, 5) array of t, x, y, z & vecmag for all files (demeaned file by file)
+    arr = build_day_array(filenames)
+    print arr.shape
+
+    # running histogram of vecmag across files (for percentiles at end)
+    hist = LogHistogram()
+    hist.add(arr[:, 4])
+
+    print '50th, 95th & 99.9th percentile vecmag:', hist.percentiles([50, 95, 99.9])
 
     fig = plt.figure(figsize=(7.5, 10.0))
 
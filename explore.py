@@ -19,30 +19,23 @@ from scipy.io import wavfile
 import matplotlib.pyplot as plt
 from ugaudio.create import aiffread
 #from ugaudio.signal import pitchshift, timearray
-from ugaudio.load import padread
+from ugaudio.padstats import pad_stats
 
 # TODO put more power to explore in user's hands
 # TODO import and [completely] process iSeismograph files?
 
 
-def pad_file_percentiles(pad_file):
-    """return 5-number summary for pad_file input"""
-    # read data from file (not using double type here like MATLAB would, so we get courser demeaning)
-    b = padread(pad_file)
-    a = b - b.mean(axis=0)  # demean each column
-    a[:, 0] = np.sqrt(a[:, 1]**2 + a[:, 2]**2 + a[:, 3]**2)  # replace 1st column with vecmag
-    p = np.percentile(np.abs(a[:, 0]), [50, 95], axis=0)
-    return p
-
-
-def minmax_stats(pad_file):
-    """return num_pts and per-axis max abs values for PAD file"""
-    # read data from file (not using double type here like MATLAB would, so we get courser demeaning)
-    b = padread(pad_file)
-    a = b - b.mean(axis=0)  # demean each column
-    a = np.abs(a)
-    max_mg_values = 1.0e3 * np.max(a[:,1:], axis=0)
-    return  a.shape[0], max_mg_values
+def pad_file_percentiles(pad_file, cache=None):
+    """return 50th & 95th percentile vecmag for pad_file input (stats from cache, a PadStatsCache, if given)"""
+    s = pad_stats(pad_file, cache=cache)
+    return np.array([s.vecmag_p50, s.vecmag_p95])
+
+
+def minmax_stats(pad_file, cache=None):
+    """return num_pts and per-axis max abs values for PAD file (stats from cache, a PadStatsCache, if given)"""
+    s = pad_stats(pad_file, cache=cache)
+    max_mg_values = 1.0e3 * s.max_abs
+    return s.num_pts, max_mg_values
 
 
 def show_pad_minmax(num_pts, max_mg_vals):
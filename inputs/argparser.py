@@ -14,6 +14,7 @@ from pims.signal.rounding import is_power_of_two
 from spectral_average_defaults import DEFAULT_OUTDIR, DEFAULT_PADDIR
 from spectral_average_defaults import DEFAULT_SENSORS, DEFAULT_RATE, DEFAULT_CUTOFF, DEFAULT_NFFT, DEFAULT_NFILES
 from spectral_average_defaults import DEFAULT_START, DEFAULT_END
+from spectral_average_defaults import DEFAULT_JOBS, DEFAULT_TIMEOUT, DEFAULT_INDEX
 
 # create logger
 module_logger = logging.getLogger('ugaudio.argparser')
@@ -47,6 +48,28 @@ def nfiles_int(n):
     return value
 
 
+def jobs_int(n):
+    """return valid number of worker processes as int value converted from string, n"""
+    try:
+        value = int(n)
+    except Exception as e:
+        raise argparse.ArgumentTypeError('%s' % e)
+    if value < 1:
+        raise argparse.ArgumentTypeError('need at least one worker (job)')
+    return value
+
+
+def timeout_float(t):
+    """return valid task timeout in seconds as float value converted from string, t"""
+    try:
+        value = float(t)
+    except Exception as e:
+        raise argparse.ArgumentTypeError('%s' % e)
+    if value <= 0:
+        raise argparse.ArgumentTypeError('timeout must be positive number of seconds')
+    return value
+
+
 def nfft_int(n):
     """return valid Nfft as int value converted from string, n"""
     try:
@@ -155,6 +178,26 @@ def parse_inputs():
     help_end = 'end date'
     parser.add_argument('-e', '--end', default=DEFAULT_END, type=dtm_date, help=help_end)
 
+    # number of worker processes
+    help_jobs = 'number of sensor-day tasks to run at a time'
+    parser.add_argument('-j', '--jobs', default=DEFAULT_JOBS, type=jobs_int, help=help_jobs)
+
+    # task timeout
+    help_timeout = 'seconds before a sensor-day task gets killed'
+    parser.add_argument('-t', '--timeout', default=DEFAULT_TIMEOUT, type=timeout_float, help=help_timeout)
+
+    # force recompute
+    help_force = 'recompute sensor-days even if their psdsum file already exists'
+    parser.add_argument('-f', '--force', action='store_true', help=help_force)
+
+    # update existing
+    help_update = 'fold new PAD files into sensor-days whose psdsum file already exists'
+    parser.add_argument('-u', '--update', action='store_true', help=help_update)
+
+    # PAD index file
+    help_index = 'SQLite PAD index file to select files from (created/updated as needed) instead of glob and headers'
+    parser.add_argument('-x', '--index', default=DEFAULT_INDEX, help=help_index)
+
     # parse arguments
     module_logger.debug('calling parse_args')
     args = parser.parse_args()
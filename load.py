@@ -1,13 +1,16 @@
 #!/usr/bin/env python
 
+import os
 import sys
 import aifc
 import struct
 import datetime
 import numpy as np
+from collections import namedtuple
 from dateutil.relativedelta import relativedelta
 
 from pims.utils.pimsdateutil import pad_fullfilestr_to_start_stop
+from ugaudio.signal import demean_vecmag
 
 
 # Ted Wright's original bin2asc routine convert file to ASCII.
@@ -36,66 +39,280 @@ def padread(filename, columns=4, out_dtype=np.float32):
     return B.astype(out_dtype)
 
 
+# Return read-only 2d memmap of float32's backed by filename input (no copy).
+def padmap(filename, columns=4):
+    """Return read-only 2d memmap of float32's backed by filename input (no copy).
+
+    Unlike padread, nothing is read from disk until rows/columns of the
+    returned (N, columns) array are actually touched, so slicing one axis or a
+    time span only pages in those bytes.  Callers that need to modify values
+    (e.g. demean in place) must work on a copy.  An empty file gives a
+    (0, columns) array, since it cannot be mapped.
+    """
+    nbytes = os.path.getsize(filename)
+    if nbytes == 0:
+        return np.empty((0, columns), np.float32)
+    if nbytes % (4 * columns):
+        raise ValueError('%s has %d bytes, not a whole number of %d-column float32 rows' % (filename, nbytes, columns))
+    return np.memmap(filename, dtype=np.float32, mode='r').reshape((-1, columns))
+
+
+# A chunk of rows yielded by iter_pad_chunks.
+PadChunk = namedtuple('PadChunk', ['data', 'filename', 'row', 'start', 'new_run'])
+
+
+# Yield PadChunk's of chunk_rows float32 rows read contiguously across filenames input.
+def iter_pad_chunks(filenames, chunk_rows, overlap_rows=0, columns=4, fs=None, max_gap=None):
+    """Yield PadChunk's of chunk_rows float32 rows read contiguously across filenames input.
+
+    Files are mapped (see padmap) one at a time and their rows are copied into
+    (chunk_rows, columns) blocks, so a block may straddle a file boundary and
+    memory use stays bounded no matter how many files there are.  Consecutive
+    blocks share overlap_rows rows.  The last block of a run may be short.
+
+    Each PadChunk carries
+    - data     = the (n, columns) float32 block (caller owns it)
+    - filename = file that the first row of data came from
+    - row      = index of that first row within filename
+    - start    = datetime of first row (only when fs is given), else None
+    - new_run  = True for first block of a time-contiguous run of files
+
+    If max_gap (seconds) is given, file start/stop times are parsed from the
+    PAD filenames and a gap larger than max_gap between one file's stop and the
+    next file's start ends the current run, so no block ever spans a data gap
+    and downstream stages know (via new_run) to reset any carried state.
+    """
+    step = chunk_rows - overlap_rows
+    if step <= 0:
+        raise ValueError('overlap_rows (%d) must be less than chunk_rows (%d)' % (overlap_rows, chunk_rows))
+    use_times = fs is not None or max_gap is not None
+
+    buf = np.empty((chunk_rows, columns), dtype=np.float32)
+    nbuf = 0
+    origins = []  # (buf position, filename, row, file start) where each file's rows begin in buf
+    yielded = False  # have we yielded a chunk yet in this run
+    prev_stop = None
+
+    def _origin(pos):
+        # filename, row & file start time that buf[pos] came from
+        p, fname, row, fstart = [o for o in origins if o[0] <= pos][-1]
+        return fname, row + pos - p, fstart
+
+    def _chunk(n):
+        fname, row, fstart = _origin(0)
+        start = None
+        if fs is not None:
+            start = fstart + datetime.timedelta(seconds=row / float(fs))
+        return PadChunk(buf[:n], fname, row, start, not yielded)
+
+    for filename in filenames:
+
+        fstart = fstop = None
+        if use_times:
+            fstart, fstop = pad_fullfilestr_to_start_stop(filename)
+
+        # if gap from previous file is too big, then flush what we have and start a new run
+        if max_gap is not None and prev_stop is not None:
+            if (fstart - prev_stop).total_seconds() > max_gap:
+                if nbuf > (overlap_rows if yielded else 0):
+                    yield _chunk(nbuf)
+                    buf = np.empty((chunk_rows, columns), dtype=np.float32)
+                nbuf, origins, yielded = 0, [], False
+        prev_stop = fstop
+
+        m = padmap(filename, columns=columns)
+        i = 0
+        while i < m.shape[0]:
+            n = min(chunk_rows - nbuf, m.shape[0] - i)
+            origins.append((nbuf, filename, i, fstart))
+            buf[nbuf:nbuf + n] = m[i:i + n]
+            nbuf += n
+            i += n
+            if nbuf == chunk_rows:
+                chunk = _chunk(nbuf)
+                yielded = True
+                # new buffer starts with overlap rows carried from this one
+                fname, row, ostart = _origin(step)
+                buf = np.empty((chunk_rows, columns), dtype=np.float32)
+                buf[:overlap_rows] = chunk.data[step:]
+                nbuf = overlap_rows
+                origins = [(0, fname, row, ostart)]
+                yield chunk
+        del m
+
+    # flush whatever is left at end of last run
+    if nbuf > (overlap_rows if yielded else 0):
+        yield _chunk(nbuf)
+
+
+# Return list of time-contiguous runs (lists) of filenames input.
+def pad_runs(filenames, max_gap):
+    """Return list of time-contiguous runs (lists) of filenames input.
+
+    Like iter_pad_chunks with max_gap, file start/stop times are parsed from
+    the PAD filenames and a gap larger than max_gap (seconds) between one
+    file's stop and the next file's start ends the current run.
+    """
+    runs, prev_stop = [], None
+    for filename in filenames:
+        fstart, fstop = pad_fullfilestr_to_start_stop(filename)
+        if prev_stop is None or (fstart - prev_stop).total_seconds() > max_gap:
+            runs.append([])
+        runs[-1].append(filename)
+        prev_stop = fstop
+    return runs
+
+
 def padread_vxyz(filename, columns=4, out_dtype=np.float32):
     """Return 2d numpy array of float32's read from filename input (demeaned, then 1st column replaced by vecmag)"""
 
     # load file
     a = padread(filename, columns=columns, out_dtype=out_dtype)
 
-    # demean x, y and z columns
-    a[:, 1:4] = a[:, 1:4] - a[:, 1:4].mean(axis=0)
+    # demean x, y and z columns, then overwrite times in 1st column with vecmag values
+    demean_vecmag(a[:, 1:4], out=a[:, 0])
+    return a
 
-    # compute vector magnitude
-    v = np.array(np.sqrt(a[:, 1] ** 2 + a[:, 2] ** 2 + a[:, 3] ** 2))
 
-    # overwrite times in 1st column with vecmag values
-    a[:, 0] = v
+def pad_num_rows(filename, columns=4):
+    """Return number of (float32) rows in PAD file, from its size"""
+    return os.path.getsize(filename) // (4 * columns)
 
-    return a
 
+def build_day_array(filenames, columns=4, mmap_file=None):
+    """Return (N, 5) float32 array of t, x, y, z & vecmag rows for filenames (x, y & z demeaned file by file)
 
-def padread_hourpart(filename, fs, dh, columns=4, out_dtype=np.float32):
-    """Return 2d numpy array of float32's read from filename input where dh_lower <= t < dh_upper."""
+    The output is sized from the file sizes up front and each file is copied
+    into its rows in place (with mean in double precision), with vecmag going
+    into the 5th column in the same pass, so building a whole sensor-day is
+    linear in the amount of data.  If mmap_file is given, the output is a
+    memory map backed by that file instead of an array in memory.
+    """
+    nrows = [pad_num_rows(f, columns=columns) for f in filenames]
+    shape = (sum(nrows), 5)
+    if mmap_file is None:
+        arr = np.empty(shape, dtype=np.float32)
+    else:
+        arr = np.memmap(mmap_file, dtype=np.float32, mode='w+', shape=shape)
+    r = 0
+    for f, n in zip(filenames, nrows):
+        if n == 0:
+            continue
+        rows = arr[r:r + n]
+        m = padmap(f, columns=columns)
+        rows[:, 0:4] = m[:n, 0:4]
+        del m
+        demean_vecmag(rows[:, 1:4], out=rows[:, 4])
+        r += n
+    return arr
 
-    # load file
-    a = padread_vxyz(filename, columns=columns, out_dtype=out_dtype)
 
-    # get start & stop time of file
+def pad_window_rows(filename, fs, t1, t2, nrows=None, columns=4):
+    """Return (i1, i2) slice of rows in PAD file where t1 <= t < t2 (times from filename start and sample rate)"""
     fstart, fstop = pad_fullfilestr_to_start_stop(filename)
+    if nrows is None:
+        nrows = pad_num_rows(filename, columns=columns)
+
+    # row i is at fstart + i/fs; tiny tolerance so float round-off does not shift a boundary by a row
+    def _row(t):
+        return int(np.ceil(fs * (t - fstart).total_seconds() - 1e-6))
+
+    i1 = min(max(_row(t1), 0), nrows)
+    i2 = min(max(_row(t2), i1), nrows)
+    return i1, i2
+
+
+def padread_window(filename, fs, t1, t2, columns=4, out_dtype=np.float32):
+    """Return 2d numpy array of rows read from filename input where t1 <= t < t2 (only those bytes get read)"""
+    m = padmap(filename, columns=columns)
+    i1, i2 = pad_window_rows(filename, fs, t1, t2, nrows=m.shape[0], columns=columns)
+    a = np.array(m[i1:i2], dtype=out_dtype)
+    del m
+    return a
+
+
+def padread_vxyz_window(filename, fs, t1, t2, mean=None, columns=4, out_dtype=np.float32):
+    """Return padread_vxyz-like array for rows where t1 <= t < t2 (demeaned with window's mean, or given xyz mean)"""
+    a = padread_window(filename, fs, t1, t2, columns=columns, out_dtype=out_dtype)
+    demean_vecmag(a[:, 1:4], out=a[:, 0], mean=mean)
+    return a
+
 
-    # find offset on lower end of file
-    i1 = 0
-    offset_lower = (dh - fstart).total_seconds()
-    if offset_lower > 0:
-        i1 = np.int(np.ceil(fs * offset_lower))
+def padread_hourpart(filename, fs, dh, columns=4, out_dtype=np.float32, mean=None):
+    """Return 2d numpy array of float32's read from filename input where dh_lower <= t < dh_upper.
 
-    dh_upper = dh + relativedelta(hours=1)
+    Only rows in the hour get read; x, y and z are demeaned with the hour's own
+    mean, or with mean (e.g. precomputed per-file xyz mean) if given, and the
+    1st column is vecmag.
+    """
+    return padread_vxyz_window(filename, fs, dh, dh + relativedelta(hours=1), mean=mean, columns=columns,
+                               out_dtype=out_dtype)
+
+
+# sample dtypes for uncompressed AIFF/AIFC compression types, keyed by (comptype, samp_width)
+_AIFF_DTYPES = {
+    ('NONE', 1): '>i1', ('NONE', 2): '>i2', ('NONE', 4): '>i4',
+    ('twos', 1): '>i1', ('twos', 2): '>i2', ('twos', 4): '>i4',
+    ('sowt', 2): '<i2',
+}
 
-    # find offset on upper end of file
-    i2 = a.shape[0]
-    offset_upper = (fstop - dh_upper).total_seconds()
-    if offset_upper > 0:
-        i2 = np.int(np.ceil(fs * offset_upper))
+# Return byte offset of sample data (just past SSND chunk header) in AIFF/AIFC file.
+def _aiff_ssnd_offset(aiff_file):
+    """Return byte offset of sample data (just past SSND chunk header) in AIFF/AIFC file."""
+    with open(aiff_file, 'rb') as f:
+        form, size, ftype = struct.unpack('>4sL4s', f.read(12))
+        if form != 'FORM' or ftype not in ('AIFF', 'AIFC'):
+            raise ValueError('%s is not an AIFF/AIFC file' % aiff_file)
+        while True:
+            hdr = f.read(8)
+            if len(hdr) < 8:
+                raise ValueError('no SSND chunk in %s' % aiff_file)
+            ckid, cksize = struct.unpack('>4sL', hdr)
+            if ckid == 'SSND':
+                offset, block_size = struct.unpack('>LL', f.read(8))
+                return f.tell() + offset
+            f.seek(cksize + (cksize & 1), 1) # chunks are padded to even length
 
-    # print fstart, 'fstart'
-    # print dh, 'dh'
-    #
-    # print offset_lower
-    #
-    # print fstop, 'fstop'
-    # print dh_upper, 'dh_upper'
-    #
-    # print offset_upper
-    # print i1, i2
+# Return read-only memory map of frames in (uncompressed) AIFF file and its params.
+def aiffmap(aiff_file):
+    """Return read-only memory map of frames in (uncompressed) AIFF file and its params.
+
+    The map is a zero-copy view of the sound data (SSND chunk) in the file's
+    own (big-endian) byte order, with shape (num_frames,) for mono or
+    (num_frames, num_chans) otherwise.  Params are as for aiffread.
+    """
+    f = aifc.open(aiff_file, 'r')
+    params = f.getparams()
+    f.close()
+    num_chans, samp_width, sample_rate, num_frames, comp_type, comp_name = params
+    try:
+        dtype = _AIFF_DTYPES[(comp_type, samp_width)]
+    except KeyError:
+        raise ValueError('unhandled AIFF compression type %s with %d-byte samples' % (comp_type, samp_width))
+    shape = (num_frames,) if num_chans == 1 else (num_frames, num_chans)
+    if num_frames == 0:
+        return np.empty(shape, dtype=dtype), params
+    offset = _aiff_ssnd_offset(aiff_file)
+    return np.memmap(aiff_file, dtype=dtype, mode='r', offset=offset, shape=shape), params
 
-    return a[i1:i2, :]
+# Yield chunks of (at most) chunk_frames native-order frames from AIFF file.
+def iter_aiff_chunks(aiff_file, chunk_frames=65536):
+    """Yield chunks of (at most) chunk_frames native-order frames from AIFF file.
 
+    Each chunk is a new array with shape (n,) for mono or (n, num_chans), so
+    memory use stays bounded no matter how long the recording is.
+    """
+    m, params = aiffmap(aiff_file)
+    dtype = m.dtype.newbyteorder('=')
+    for i in xrange(0, m.shape[0], chunk_frames):
+        yield m[i:i + chunk_frames].astype(dtype)
+    del m
 
 # Return data loaded from aiff file.
 def aiffread(aiff_file):
     """Return data loaded from aiff file.
 
-    First output is audio data array, and ...
+    First output is audio data array (interleaved frames for multichannel), and ...
     
     Params tuple is (in this order)
     - num_chans   = number of audio channels; 1 is mono
@@ -105,14 +322,7 @@ def aiffread(aiff_file):
     - comp_type   = compression type: 'NONE'
     - comp_name   = compression name: 'not compressed'    
     """
-    data = ''
-    f = aifc.open(aiff_file, 'r')
-    params = f.getparams()
-    while True:
-        newdata = f.readframes(512)
-        if not newdata:
-            break
-        data += newdata
-    f.close()
-    arr = np.fromstring(data, np.short).byteswap()
+    m, params = aiffmap(aiff_file)
+    arr = m.astype(m.dtype.newbyteorder('=')).ravel() # one (linear time) copy to native byte order
+    del m
     return arr, params
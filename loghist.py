@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""A mergeable, fixed log-binned histogram for approximate percentiles of (vecmag) values across many files.
+
+Percentiles of vecmag over a day, month or more of data would otherwise mean keeping (and sorting) every value.  A
+LogHistogram just counts values in bins that are equally spaced in log10, so it takes fixed memory no matter how many
+values go in, histograms for different files (or days, or sensors) with the same bins add up exactly, and any
+percentile comes back with relative error of at most about one bin width (1.2% with 200 bins per decade).
+"""
+
+import os
+import numpy as np
+from scipy.io import savemat, loadmat
+
+from ugaudio.load import padmap
+from ugaudio.signal import demean_vecmag
+
+
+class LogHistogram(object):
+    """A class for a histogram with bins equally spaced in log10 from lo to hi.
+
+    Values below lo (including zeros) are counted in an underflow bin and
+    values at or above hi in an overflow bin, so the count always includes
+    every value added.  Histograms with the same lo, hi and bins_per_decade can
+    be merged (or added with +).
+
+    """
+
+    def __init__(self, lo=1.0e-7, hi=1.0e1, bins_per_decade=200):
+        if not 0 < lo < hi:
+            raise ValueError('need 0 < lo < hi for log bins (got lo=%g, hi=%g)' % (lo, hi))
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.bins_per_decade = int(bins_per_decade)
+        self._log_lo = np.log10(self.lo)
+        self.nbins = int(np.ceil(round((np.log10(self.hi) - self._log_lo) * self.bins_per_decade, 6)))
+        self.counts = np.zeros(self.nbins + 2, dtype=np.int64)  # [underflow, bins..., overflow]
+
+    def __str__(self):
+        """str(self)"""
+        return '%s with %d values in %d bins from %g to %g' % (self.__class__.__name__, self.count, self.nbins,
+                                                               self.lo, self.hi)
+
+    @property
+    def count(self):
+        """total number of values added"""
+        return int(self.counts.sum())
+
+    def edges(self):
+        """return nbins+1 bin edges"""
+        return 10.0 ** (self._log_lo + np.arange(self.nbins + 1) / float(self.bins_per_decade))
+
+    def add(self, values):
+        """add (finite) values to histogram; NaN's are ignored"""
+        v = np.asarray(values, dtype=np.float64).ravel()
+        v = v[~np.isnan(v)]
+        with np.errstate(divide='ignore'):
+            idx = np.floor((np.log10(v) - self._log_lo) * self.bins_per_decade)
+        idx = np.clip(idx, -1, self.nbins) + 1  # underflow -> 0, overflow -> nbins+1
+        self.counts += np.bincount(idx.astype(np.intp), minlength=self.nbins + 2)
+
+    def _check_compatible(self, other):
+        if (self.lo, self.hi, self.bins_per_decade) != (other.lo, other.hi, other.bins_per_decade):
+            raise ValueError('cannot merge histograms with different bins')
+
+    def merge(self, other):
+        """add counts from other (with same bins) into this histogram"""
+        self._check_compatible(other)
+        self.counts += other.counts
+        return self
+
+    def __add__(self, other):
+        """return new histogram with counts from both"""
+        self._check_compatible(other)
+        h = LogHistogram(self.lo, self.hi, self.bins_per_decade)
+        h.counts = self.counts + other.counts
+        return h
+
+    def percentiles(self, q):
+        """return approximate percentiles (q in range 0 to 100) of values added so far
+
+        Within a bin, values are taken as spread evenly in log10.  Percentiles
+        that land in underflow (overflow) bin come back as lo (hi).  NaN's
+        come back if histogram is empty.
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        n = self.count
+        if n == 0:
+            return np.nan * q
+        cum = np.cumsum(self.counts)
+        rank = np.maximum(q / 100.0 * n, 1.0e-9)  # so 0th percentile lands in first bin with values
+        i = np.searchsorted(cum, rank, side='left')
+        i = np.clip(i, 0, self.nbins + 1)
+        below = np.where(i > 0, cum[np.maximum(i - 1, 0)], 0)
+        frac = np.where(self.counts[i] > 0, (rank - below) / np.maximum(self.counts[i], 1), 0.0)
+        frac = np.clip(frac, 0.0, 1.0)
+        p = 10.0 ** (self._log_lo + (i - 1 + frac) / float(self.bins_per_decade))
+        p[i == 0] = self.lo
+        p[i == self.nbins + 1] = self.hi
+        return p
+
+    def save(self, file_name, pad_stamp=None):
+        """save histogram to mat file (with size & mtime of PAD file it came from, if given)"""
+        mdict = {'lo': self.lo, 'hi': self.hi, 'bins_per_decade': self.bins_per_decade,
+                 'counts': self.counts.astype(np.float64)}
+        if pad_stamp is not None:
+            mdict['pad_stamp'] = np.array(pad_stamp, dtype=np.float64)
+        savemat(file_name, mdict)
+
+    @classmethod
+    def load(cls, file_name):
+        """return histogram loaded from mat file written by save"""
+        m = loadmat(file_name)
+        h = cls(float(m['lo']), float(m['hi']), int(m['bins_per_decade']))
+        h.counts = np.rint(m['counts'].ravel()).astype(np.int64)
+        return h
+
+
+def pad_file_vecmag_hist(pad_file, chunk_rows=262144, **kwargs):
+    """return LogHistogram (kwargs for its bins) of demeaned vecmag for pad_file, from a memory map in chunks"""
+    h = LogHistogram(**kwargs)
+    b = padmap(pad_file)
+    if b.shape[0]:
+        mean = b[:, 1:4].mean(axis=0, dtype=np.float64)
+        for i in xrange(0, b.shape[0], chunk_rows):
+            h.add(demean_vecmag(np.array(b[i:i + chunk_rows, 1:4]), mean=mean))
+    del b
+    return h
+
+
+def vecmag_hist(pad_files, partial_dir=None, **kwargs):
+    """return LogHistogram of demeaned vecmag over pad_files, merged from per-file partials
+
+    If partial_dir is given, each file's partial histogram is kept there as a
+    mat file (named for the PAD file and the bins) and reused on later calls,
+    so e.g. percentiles over a month only need histograms for files not seen
+    before (or changed since).  A saved partial keeps size & mtime of its PAD
+    file and is only reused while they match; one with other bins never is.
+    """
+    total = LogHistogram(**kwargs)
+    bins_str = '%g_%g_%d' % (total.lo, total.hi, total.bins_per_decade)
+    for f in pad_files:
+        partial_file = None
+        if partial_dir is not None:
+            partial_file = os.path.join(partial_dir, '%s_vmhist_%s.mat' % (os.path.basename(f), bins_str))
+        st = os.stat(f)
+        stamp = (st.st_size, st.st_mtime)
+        h = None
+        if partial_file and os.path.exists(partial_file):
+            m = loadmat(partial_file, variable_names=['pad_stamp'])
+            if 'pad_stamp' in m and tuple(m['pad_stamp'].ravel()) == stamp:
+                h = LogHistogram.load(partial_file)
+                if (h.lo, h.hi, h.bins_per_decade) != (total.lo, total.hi, total.bins_per_decade):
+                    h = None
+        if h is None:
+            h = pad_file_vecmag_hist(f, **kwargs)
+            if partial_file:
+                h.save(partial_file, pad_stamp=stamp)
+        total.merge(h)
+    return total
+
+
+if __name__ == '__main__':
+
+    import glob
+    files = sorted(glob.glob('C:/temp/pad/year2020/month04/day18/sams2_accel_121f04/*121f04'))
+    h = vecmag_hist(files, partial_dir='C:/temp/vmhist')
+    print h
+    print '50th, 95th & 99.9th percentile vecmag [g]:', h.percentiles([50, 95, 99.9])
@@ -5,12 +5,38 @@ handling and audio conversion."""
 
 import os
 import re
-import aifc
 import struct
 import numpy as np
 import matplotlib.pyplot as plt
-from ugaudio.load import padread
-from ugaudio.signal import normalize, my_taper
+from collections import namedtuple, OrderedDict
+from ugaudio.load import padmap, iter_pad_chunks
+from ugaudio.signal import normalize, demean, my_taper, clip_at_third, taper_window
+from ugaudio.write import audiowrite, audiowrite_chunks
+
+# (mtime, sample rate) already parsed from header files, keyed by header filename (oldest dropped past max entries)
+_HEADER_RATES = OrderedDict()
+_HEADER_RATES_MAX = 10000
+
+# number of rows per chunk when streaming PAD data to audio
+STREAM_CHUNK_ROWS = 1048576
+
+# whole-span stats for streaming conversion; mean & peak are (4,) arrays for x, y, z & s (sum) axes
+PadStreamStats = namedtuple('PadStreamStats', ['rows', 'mean', 'peak'])
+
+# Return (N, len(axes)) array of columns for axes (e.g. 'xyzs') gathered from (N, 3) xyz array.
+def axes_columns(xyz, axes, out=None):
+    """Return (N, len(axes)) array of columns for axes (e.g. 'xyzs') gathered from (N, 3) xyz array; s is x+y+z."""
+    for ax in axes:
+        if ax not in 'xyzs':
+            raise Exception( 'unhandled axis "%s"' % ax )
+    if out is None:
+        out = np.empty((xyz.shape[0], len(axes)), dtype=xyz.dtype)
+    for i, ax in enumerate(axes):
+        if ax == 's':
+            xyz.sum(axis=1, out=out[:, i])
+        else:
+            out[:, i] = xyz[:, 'xyz'.index(ax)]
+    return out
 
 class PadFile(object):
     """A class to implement a loose interpretation for binary file conversion to audio.
@@ -94,18 +120,45 @@ class PadFile(object):
     def get_samplerate(self):
         """Attempt to parse sample rate from header file; otherwise calculate it."""
         if self.headerfile:
+            # header files do not change, so parse each one just once (unless its mtime changes)
+            mtime = os.path.getmtime(self.headerfile)
+            cached = _HEADER_RATES.get(self.headerfile)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
             with open(self.headerfile, 'r') as f:
                 contents = f.read().replace('\n', '')
                 m = re.match('.*\<SampleRate\>(.*)\</SampleRate\>.*', contents)
-                if m:
-                    return float( m.group(1) )
-                else:
-                    return None
+                rate = float( m.group(1) ) if m else None
+            _HEADER_RATES.pop(self.headerfile, None)
+            _HEADER_RATES[self.headerfile] = (mtime, rate)
+            while len(_HEADER_RATES) > _HEADER_RATES_MAX:
+                _HEADER_RATES.popitem(last=False)
+            return rate
         else:
             return self._calculate_sample_rate()
     
-    def convert(self, rate=None, axis='s', plot=False, taper=0):
-        """Convert designated axis to AIFF, and maybe plot it too."""
+    def axes_array(self, axes):
+        """Return (N, len(axes)) float32 array of demeaned data for axes (e.g. 'xyzs'), computed in one pass."""
+        for ax in axes:
+            if ax not in 'xyzs':
+                raise Exception( 'unhandled axis "%s"' % ax )
+        
+        # Map data from file and demean x, y & z columns (last 3) of one working copy in place.
+        B = padmap(self.filename)
+        xyz = np.array(B[:, -3:])
+        demean(xyz)
+        
+        # Gather requested axes as columns; s is sum(x+y+z).
+        return axes_columns(xyz, axes)
+    
+    def convert(self, rate=None, axis='s', plot=False, taper=0, multichannel=False, fmt='aiff'):
+        """Convert designated axis (or axes) to AIFF (or WAV), and maybe plot it too.
+        
+        All axes are conditioned (demean, normalize, taper, round) together in
+        one pass over the data.  Each axis gets its own mono file (e.g.
+        <filename>x.aiff), or if multichannel is True, one file gets all axes
+        as its channels (e.g. <filename>xyzs.aiff with x, y, z, s channels).
+        """
         # If not properly formatted, then return without doing anything.
         if not self.ispad:
             return
@@ -116,48 +169,109 @@ class PadFile(object):
         else:
             samplerate = rate
                 
-        # Read data from file.
-        B = padread(self.filename)
-    
-        # Demean each column.
-        M = B.mean(axis=0)
-        C = B - M[np.newaxis, :]
-       
-        # Determine desired axis or axes.
+        # Determine desired axis or axes, and get demeaned data for all of them.
         if axis == '4': axis = 'xyzs'
-        for ax in axis.lower():
-            if ax == 'x': data = C[:, -3] # x-axis is 3rd last column
-            elif ax == 'y': data = C[:, -2] # y-axis is 2nd last column
-            elif ax == 'z': data = C[:, -1] # z-axis is the last column
-            elif ax == 's': data = C[:, 1::].sum(axis=1) # sum(x+y+z)
-            else:
-                raise Exception( 'unhandled axis "%s"' % ax )
-            stub = self.filename + ax
-            
-            # Plot demeaned accel data (maybe).
-            if plot:
-                png_file = stub + '.png'
-                plt.plot(data)
+        axes = axis.lower()
+        C = self.axes_array(axes)
+        
+        # Plot demeaned accel data (maybe).
+        if plot:
+            for i, ax in enumerate(axes):
+                png_file = self.filename + ax + '.png'
+                plt.plot(C[:, i])
                 plt.savefig(png_file)
-            
-            # Normalize to range -32768:32767 (actually, use -32000:32000).
-            data = normalize(data) * 32000.0
-            
-            # Taper signal, if requested.
-            if taper > 0:
-                data = my_taper(data, samplerate, taper/1000.0)
         
-            # Data conditioning.
-            data = np.rint(data) # round to nearest integer
-            data = data.astype(np.int16) # not sure why we need this...maybe aifc assumptions
-            data = data.byteswap().newbyteorder() # need this on mac osx and linux (windows?)
+        # Normalize each column to range -32768:32767 (actually, use -32000:32000).
+        normalize(C, out=C)
+        C *= 32000.0
         
-            # Convert data to string for aifc write to work right.
-            strdata = data.tostring()
-            aiff_file = stub + '.aiff'
-            g = aifc.open(aiff_file, 'w')
-            sampwidth = 2 # this value based on data type (2 bytes in np.int16)
-            #         nchans, sampwidth, framerate, nframes, comptype, compname
-            g.setparams((1, sampwidth, samplerate, len(data), 'NONE', 'not compressed'))
-            g.writeframes(strdata)
-            g.close()
+        # Taper signal (in place), if requested.
+        if taper > 0:
+            my_taper(C, samplerate, taper/1000.0, out=C)
+        
+        # Data conditioning: round to nearest integer (in place), then 16-bit integers.
+        np.rint(C, out=C)
+        frames = C.astype(np.int16)
+        
+        # Write one file with all axes as channels, or one mono file per axis.
+        ext = '.wav' if fmt == 'wav' else '.aiff'
+        if multichannel:
+            audiowrite(self.filename + axes + ext, frames, samplerate)
+        else:
+            for i, ax in enumerate(axes):
+                audiowrite(self.filename + ax + ext, frames[:, i], samplerate)
+
+
+# Return PadStreamStats (rows, mean & peak) from one pass over PAD files in chunks.
+def pad_stream_stats(filenames, chunk_rows=STREAM_CHUNK_ROWS):
+    """Return PadStreamStats (rows, mean & peak) from one pass over PAD files in chunks.
+    
+    Peak is the largest absolute value of each demeaned axis, which is
+    max(max - mean, mean - min), so sums, minimums and maximums are all this
+    pass needs to keep.
+    """
+    rows = 0
+    sums = np.zeros(3)
+    mins = np.empty(4)
+    mins.fill(np.inf)
+    maxs = -mins
+    for chunk in iter_pad_chunks(filenames, chunk_rows):
+        xyz = chunk.data[:, -3:]
+        s = xyz.sum(axis=1)
+        rows += xyz.shape[0]
+        sums += xyz.sum(axis=0, dtype=np.float64)
+        mins = np.minimum(mins, np.append(xyz.min(axis=0), s.min()))
+        maxs = np.maximum(maxs, np.append(xyz.max(axis=0), s.max()))
+    mean = np.append(sums, sums.sum()) / max(rows, 1)
+    peak = np.maximum(maxs - mean, mean - mins)
+    return PadStreamStats(rows, mean, peak)
+
+# Convert axis (or axes) of time-ordered PAD files to one AIFF (or WAV) file with bounded memory.
+def pad_stream_convert(filenames, fname, fs, axis='s', taper=0, stats=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """Convert axis (or axes) of time-ordered PAD files to one AIFF (or WAV) file with bounded memory.
+    
+    The files are treated as one contiguous span.  Data is conditioned like
+    PadFile.convert (demean, normalize, taper, round), but chunk by chunk as it
+    goes to the file: a first pass gets the stats (see pad_stream_stats) unless
+    they are given (e.g. a max taken from header info), and the second pass
+    scales each axis to +/-32000 with its global peak.  One axis gives a mono
+    file; more (e.g. axis='xyzs') give one channel per axis.  Return number of
+    frames written.
+    """
+    if axis == '4': axis = 'xyzs'
+    axes = axis.lower()
+    cols = ['xyzs'.index(ax) for ax in axes]
+    if stats is None:
+        stats = pad_stream_stats(filenames, chunk_rows=chunk_rows)
+    peak = np.asarray(stats.peak, dtype=np.float64)[cols]
+    peak[peak == 0] = 1.0
+    scale = (32000.0 / peak).astype(np.float32)
+    mean_xyz = np.asarray(stats.mean, dtype=np.float32)[0:3]
+    
+    # number of pts to taper at each end of whole span
+    ntaper = 0
+    if taper > 0:
+        ntaper = clip_at_third(xrange(stats.rows), fs, taper/1000.0)
+    
+    def _conditioned():
+        # yield demeaned, scaled (and maybe tapered) chunks; g0 is global row of chunk's first row
+        g0 = 0
+        for chunk in iter_pad_chunks(filenames, chunk_rows):
+            xyz = chunk.data[:, -3:]
+            xyz -= mean_xyz
+            C = axes_columns(xyz, axes)
+            C *= scale
+            g1 = g0 + C.shape[0]
+            if ntaper:
+                rising, falling = taper_window(ntaper)
+                b = min(g1, ntaper)
+                if g0 < b:
+                    C[0:b-g0] *= rising[g0:b, np.newaxis]
+                a = max(g0, stats.rows - ntaper)
+                if a < g1:
+                    k = stats.rows - ntaper
+                    C[a-g0:] *= falling[a-k:g1-k, np.newaxis]
+            g0 = g1
+            yield C
+    
+    return audiowrite_chunks(fname, _conditioned(), fs, nchans=len(axes), scale=1.0, nframes=stats.rows)
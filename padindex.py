@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""A persistent (SQLite) index of PAD files and their header information.
+
+Picking the PAD files for a sensor-day otherwise means a glob over the (network) file system and then opening and
+parsing every header file, every time.  The index keeps one row per PAD file with its sensor, day, start, stop,
+sample rate, cutoff, location, size and mtime.  Bringing a day up to date is one directory listing and a stat of
+each file, and only new or changed (by size or mtime) files get their headers parsed, so selecting files is usually
+just a quick query.
+"""
+
+import os
+import re
+import glob
+import sqlite3
+import datetime
+
+from pims.utils.pimsdateutil import pad_fullfilestr_to_start_stop, datetime_to_ymd_path
+
+# regular expressions for the header fields we keep
+_HEADER_PATTERNS = [
+    ('rate',        re.compile(r'<SampleRate>\s*(.*?)\s*</SampleRate>')),
+    ('cutoff',      re.compile(r'<CutoffFreq>\s*(.*?)\s*</CutoffFreq>')),
+    ('location',    re.compile(r'<SensorCoordinateSystem[^>]*\scomment="([^"]*)"')),
+    ('data_coords', re.compile(r'<DataCoordinateSystem[^>]*\sname="([^"]*)"')),
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pad_files (
+    filename     TEXT PRIMARY KEY,
+    sensor       TEXT,
+    day          TEXT,
+    start        TEXT,
+    stop         TEXT,
+    duration     REAL,
+    rate         REAL,
+    cutoff       REAL,
+    location     TEXT,
+    data_coords  TEXT,
+    size         INTEGER,
+    mtime        REAL
+);
+CREATE INDEX IF NOT EXISTS pad_files_sensor_day ON pad_files (sensor, day, start);
+"""
+
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# name of data coordinate system for SSA (Space Station Analysis) coordinates
+SSA_COORDS = 'SSAnalysis'
+
+
+def parse_header(header_file):
+    """return dict with rate, cutoff, location & data_coords parsed from PAD header file (None for any not found)"""
+    with open(header_file, 'r') as f:
+        contents = f.read().replace('\n', '')
+    info = {}
+    for key, pat in _HEADER_PATTERNS:
+        m = pat.search(contents)
+        info[key] = m.group(1) if m else None
+    for key in ['rate', 'cutoff']:
+        if info[key] is not None:
+            info[key] = float(info[key])
+    return info
+
+
+class PadIndex(object):
+    """A class for a persistent index of PAD files kept in an SQLite database file.
+
+    Use select to get the (chronologically sorted) PAD files for a sensor-day
+    that match sample rate, cutoff, location and minimum duration; the day is
+    brought up to date with what is on disk first, with each file's size and
+    mtime checked, so only new or changed files get their headers parsed.
+
+    """
+
+    def __init__(self, db_file, pad_dir='D:/pad'):
+        self.db_file = db_file
+        self.pad_dir = pad_dir
+        self.conn = sqlite3.connect(db_file, timeout=60.0)  # other processes may be updating too
+        self.conn.executescript(_SCHEMA)
+
+    def __str__(self):
+        """str(self)"""
+        num = self.conn.execute('SELECT COUNT(*) FROM pad_files').fetchone()[0]
+        return '%s (%d PAD files under %s)' % (os.path.basename(self.db_file), num, self.pad_dir)
+
+    def close(self):
+        self.conn.close()
+
+    def _sensor_dirs(self, sensor, day):
+        """return list of sensor directories for the day"""
+        ymd_dir = datetime_to_ymd_path(day, base_dir=self.pad_dir)
+        return glob.glob('%s/*_accel_%s' % (ymd_dir, sensor))
+
+    def update_day(self, sensor, day, force=False):
+        """bring index up to date with files on disk for sensor-day; return True if any file was added, changed or gone
+
+        Each file's size and mtime are checked (a file rewritten in place need not change its directory's mtime), and
+        headers get parsed only for new or changed files (or all files, with force).
+        """
+        day_str = day.strftime('%Y-%m-%d')
+        dirs = self._sensor_dirs(sensor, day)
+
+        # what we already know about this day's files
+        known = dict(((r[0], (r[1], r[2])) for r in self.conn.execute(
+            'SELECT filename, size, mtime FROM pad_files WHERE sensor=? AND day=?', (sensor, day_str))))
+
+        on_disk, changed = set(), False
+        with self.conn:
+            for d in dirs:
+                for fname in glob.glob('%s/*%s' % (d, sensor)):
+                    on_disk.add(fname)
+                    st = os.stat(fname)
+                    if not force and known.get(fname) == (st.st_size, st.st_mtime):
+                        continue  # unchanged since last time, so no need to parse header again
+                    self._upsert(fname, sensor, day_str, st)
+                    changed = True
+            gone = [(f,) for f in known if f not in on_disk]
+            self.conn.executemany('DELETE FROM pad_files WHERE filename=?', gone)
+        return changed or bool(gone)
+
+    def _upsert(self, fname, sensor, day_str, st):
+        """insert (or replace) row for PAD file, fname"""
+        start, stop = pad_fullfilestr_to_start_stop(fname)
+        header_file = fname + '.header'
+        if os.path.exists(header_file):
+            info = parse_header(header_file)
+        else:
+            info = dict((key, None) for key, pat in _HEADER_PATTERNS)
+        self.conn.execute('INSERT OR REPLACE INTO pad_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                          (fname, sensor, day_str, start.strftime(_TIME_FORMAT), stop.strftime(_TIME_FORMAT),
+                           (stop - start).total_seconds(), info['rate'], info['cutoff'], info['location'],
+                           info['data_coords'], st.st_size, st.st_mtime))
+
+    def select(self, sensor, day, fs=None, fc=None, location=None, min_minutes=None, data_coords=None, update=True):
+        """return sorted list of PAD files for sensor-day that match (non-None) rate, cutoff, location, etc."""
+        if update:
+            self.update_day(sensor, day)
+        sql = 'SELECT filename FROM pad_files WHERE sensor=? AND day=?'
+        params = [sensor, day.strftime('%Y-%m-%d')]
+        for column, value in [('rate', fs), ('cutoff', fc), ('location', location), ('data_coords', data_coords)]:
+            if value is not None:
+                sql += ' AND %s=?' % column
+                params.append(value)
+        if min_minutes is not None:
+            sql += ' AND duration>=?'
+            params.append(60.0 * min_minutes)
+        sql += ' ORDER BY start'
+        return [r[0] for r in self.conn.execute(sql, params)]
+
+    def file_info(self, fname):
+        """return dict of indexed info for PAD file, fname (or None if not in index)"""
+        cur = self.conn.execute('SELECT * FROM pad_files WHERE filename=?', (fname,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        info = dict(zip([c[0] for c in cur.description], row))
+        for key in ['start', 'stop']:
+            info[key] = datetime.datetime.strptime(info[key], _TIME_FORMAT)
+        return info
+
+
+if __name__ == '__main__':
+
+    idx = PadIndex('C:/temp/padindex.sqlite', pad_dir='D:/pad')
+    fnames = idx.select('121f03', datetime.date(2020, 4, 5), fs=500.0, fc=200.0,
+                        location='LAB1O1, ER2, Lower Z Panel', min_minutes=5.5)
+    print idx
+    print '%d files' % len(fnames)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+"""Per-file summary statistics for PAD files, with a persistent (SQLite) cache.
+
+Exploring a month of data (e.g. a table of each file's max(abs(xyz))) otherwise means reading and demeaning every
+file, every time.  Summary stats for a file are computed from a memory map of it in bounded chunks and kept in the
+cache keyed by filename, size and mtime, so they are only computed again if the file changes.
+"""
+
+import os
+import sqlite3
+import numpy as np
+from collections import namedtuple
+
+from ugaudio.load import padmap
+from ugaudio.signal import demean_vecmag
+from ugaudio.loghist import LogHistogram
+
+# number of rows per chunk when computing stats
+STATS_CHUNK_ROWS = 262144
+
+# summary stats for one PAD file; mean, max_abs & rms are (3,) arrays for x, y & z (max_abs & rms of demeaned data)
+PadStats = namedtuple('PadStats', ['num_pts', 'mean', 'max_abs', 'rms', 'vecmag_p50', 'vecmag_p95'])
+
+_AXES = 'xyz'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pad_stats (
+    filename     TEXT PRIMARY KEY,
+    size         INTEGER,
+    mtime        REAL,
+    num_pts      INTEGER,
+    %s,
+    vecmag_p50   REAL,
+    vecmag_p95   REAL
+);
+""" % ',\n    '.join(['%s_%s REAL' % (s, ax) for s in ['mean', 'max_abs', 'rms'] for ax in _AXES])
+
+
+def compute_pad_stats(pad_file, chunk_rows=STATS_CHUNK_ROWS):
+    """return PadStats for pad_file, computed from a memory map of it in chunks
+
+    A pass over the chunks gets sums (in double precision like MATLAB would), sums of squares, minimums and maximums,
+    which is all mean, max(abs(demeaned)) and rms of demeaned data need.  Demeaned vecmag needs that mean, so a second
+    pass, over the by-then cached pages, counts it in a LogHistogram (fixed memory, no matter how big the file) for
+    the percentiles, which are good to about 1.2%.  An empty file gets all zeros.
+    """
+    b = padmap(pad_file)
+    n = b.shape[0]
+    if n == 0:
+        zeros = np.zeros(3)
+        return PadStats(0, zeros, zeros, zeros, 0.0, 0.0)
+    sums, sumsq = np.zeros(3), np.zeros(3)
+    mins, maxs = np.empty(3), np.empty(3)
+    mins.fill(np.inf)
+    maxs.fill(-np.inf)
+    for i in xrange(0, n, chunk_rows):
+        xyz = b[i:i + chunk_rows, 1:4].astype(np.float64)
+        sums += xyz.sum(axis=0)
+        sumsq += (xyz ** 2).sum(axis=0)
+        mins = np.minimum(mins, xyz.min(axis=0))
+        maxs = np.maximum(maxs, xyz.max(axis=0))
+    mean = sums / n
+    max_abs = np.maximum(maxs - mean, mean - mins)
+    rms = np.sqrt(np.maximum(sumsq / n - mean ** 2, 0.0))
+
+    h = LogHistogram()
+    for i in xrange(0, n, chunk_rows):
+        h.add(demean_vecmag(np.array(b[i:i + chunk_rows, 1:4]), mean=mean))
+    p50, p95 = h.percentiles([50, 95])
+    del b
+    return PadStats(n, mean, max_abs, rms, float(p50), float(p95))
+
+
+class PadStatsCache(object):
+    """A class for a persistent cache of PAD file summary stats kept in an SQLite database file.
+
+    Use get to fetch stats for a file; they get computed (and stored) only if
+    the cache has no entry for the file or the file's size or mtime changed
+    since they were stored.
+
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, timeout=60.0)  # other processes may be updating too
+        self.conn.executescript(_SCHEMA)
+
+    def __str__(self):
+        """str(self)"""
+        num = self.conn.execute('SELECT COUNT(*) FROM pad_stats').fetchone()[0]
+        return '%s (stats for %d PAD files)' % (os.path.basename(self.db_file), num)
+
+    def close(self):
+        self.conn.close()
+
+    def lookup(self, pad_file):
+        """return stored PadStats for pad_file if its size & mtime still match; otherwise, None"""
+        st = os.stat(pad_file)
+        row = self.conn.execute('SELECT * FROM pad_stats WHERE filename=? AND size=? AND mtime=?',
+                                (pad_file, st.st_size, st.st_mtime)).fetchone()
+        if row is None:
+            return None
+        vals = row[4:-2]
+        return PadStats(row[3], np.array(vals[0:3]), np.array(vals[3:6]), np.array(vals[6:9]), row[-2], row[-1])
+
+    def store(self, pad_file, stats):
+        """store (or replace) stats for pad_file"""
+        st = os.stat(pad_file)
+        vals = [pad_file, st.st_size, st.st_mtime, stats.num_pts]
+        vals += list(stats.mean) + list(stats.max_abs) + list(stats.rms) + [stats.vecmag_p50, stats.vecmag_p95]
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO pad_stats VALUES (%s)' % ', '.join(['?'] * len(vals)), vals)
+
+    def get(self, pad_file):
+        """return PadStats for pad_file, from cache if still valid; otherwise, compute and store them"""
+        stats = self.lookup(pad_file)
+        if stats is None:
+            stats = compute_pad_stats(pad_file)
+            self.store(pad_file, stats)
+        return stats
+
+
+def pad_stats(pad_file, cache=None):
+    """return PadStats for pad_file, using cache (a PadStatsCache) if given"""
+    if cache is None:
+        return compute_pad_stats(pad_file)
+    return cache.get(pad_file)
+
+
+if __name__ == '__main__':
+
+    import sys
+    cache = PadStatsCache('C:/temp/padstats.sqlite')
+    for f in sys.argv[1:]:
+        s = cache.get(f)
+        print '%s %9d pts, max(abs(xyz)) [mg] %9.3f %9.3f %9.3f' % ((os.path.basename(f), s.num_pts) +
+                                                                   tuple(1.0e3 * s.max_abs))
+    print cache
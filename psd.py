@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""A PSD engine set up once per (fs, nfft, window, overlap, detrend) and shared by all PSD work.
+
+Computing Welch periodograms file after file means building the same window, scaling factor and frequencies over and
+over for thousands of files.  A PsdEngine holds those, takes segments as strided views (no copies), and runs batched
+real FFTs over stacks of segments.  Use psd_engine to get the (cached) engine for a given set of parameters.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy.signal import get_window, detrend as _scipy_detrend
+
+# engines already set up, keyed by (fs, nfft, window key, noverlap, detrend)
+_ENGINES = {}
+
+# default max number of segments per rfft call (bounds temporary memory)
+DEFAULT_BATCH = 8
+
+
+class PsdEngine(object):
+    """A class to compute one-sided PSD (density) periodograms of fixed-length segments.
+
+    Periodograms match those of scipy's welch for the same parameters: window
+    is periodic (e.g. 'hann'), noverlap defaults to half of nfft, and each
+    segment gets detrend of 'constant' (demean), 'linear' or False (none).
+    Segments are taken along the first axis of 1d or 2d (samples by axes)
+    inputs, so each column gets its own periodogram.  Window can be a name
+    or (name, params) tuple for get_window, or an array of nfft values.
+
+    """
+
+    def __init__(self, fs, nfft, window='hann', noverlap=None, detrend='constant'):
+        if detrend not in ('constant', 'linear', False):
+            raise ValueError('unhandled detrend "%s" (use constant, linear or False)' % detrend)
+        self.fs = fs
+        self.nfft = nfft
+        self.window = window
+        self.noverlap = nfft // 2 if noverlap is None else noverlap
+        if not 0 <= self.noverlap < nfft:
+            raise ValueError('noverlap (%d) must be at least zero and less than nfft (%d)' % (self.noverlap, nfft))
+        self.detrend = detrend
+        self.step = nfft - self.noverlap
+
+        # window, density scaling and frequencies are computed just once here
+        if isinstance(window, (basestring, tuple)):
+            self.win = get_window(window, nfft)
+        else:
+            self.win = np.asarray(window, dtype=np.float64)
+            if self.win.shape != (nfft,):
+                raise ValueError('window array must be 1d with nfft (%d) values' % nfft)
+        self.scale = 1.0 / (fs * (self.win ** 2).sum())
+        self.freqs = np.fft.rfftfreq(nfft, 1.0 / fs)
+
+    def __str__(self):
+        """str(self)"""
+        return '%s(fs=%s, nfft=%d, window=%s, noverlap=%d, detrend=%s)' % (self.__class__.__name__, self.fs,
+                                                                          self.nfft, self.window, self.noverlap,
+                                                                          self.detrend)
+
+    def num_segments(self, n):
+        """return number of (overlapping) segments that fit in n samples"""
+        return 0 if n < self.nfft else (n - self.nfft) // self.step + 1
+
+    def segments(self, x, numsegs=None):
+        """return strided view of first numsegs (default all that fit) segments of x, shape (numsegs, nfft[, ncols])"""
+        if numsegs is None:
+            numsegs = self.num_segments(x.shape[0])
+        shape = (numsegs, self.nfft) + x.shape[1:]
+        strides = (self.step * x.strides[0],) + x.strides
+        return as_strided(x, shape=shape, strides=strides)
+
+    def periodograms(self, segs):
+        """return float64 periodograms, shape (numsegs, nfreq[, ncols]), for stack of segments (one rfft call)"""
+        s = np.array(segs, dtype=np.float64)
+        if self.detrend == 'constant':
+            s -= s.mean(axis=1)[:, np.newaxis]
+        elif self.detrend == 'linear':
+            s = _scipy_detrend(s, axis=1, type='linear')
+        s *= self.win.reshape((1, -1) + (1,) * (s.ndim - 2))
+
+        X = np.fft.rfft(s, axis=1)
+        P = X.real ** 2 + X.imag ** 2
+        P *= self.scale
+        if self.nfft % 2:
+            P[:, 1:] *= 2
+        else:
+            P[:, 1:-1] *= 2
+        return P
+
+    def iter_periodograms(self, segs, batch=DEFAULT_BATCH):
+        """yield periodograms for batches of (at most batch) segments from segs"""
+        for i in xrange(0, segs.shape[0], batch):
+            yield self.periodograms(segs[i:i + batch])
+
+    def psd(self, x, batch=DEFAULT_BATCH):
+        """return frequencies and PSD (average of periodograms of all segments, like welch) of x"""
+        count = self.num_segments(x.shape[0])
+        if count == 0:
+            raise ValueError('%d pts is not enough for even one segment of length %d' % (x.shape[0], self.nfft))
+        total = np.zeros((self.freqs.size,) + x.shape[1:])
+        for P in self.iter_periodograms(self.segments(x), batch=batch):
+            total += P.sum(axis=0)
+        return self.freqs, total / count
+
+
+def _window_key(window):
+    """return hashable cache key for window (name, (name, params) tuple or array of values)"""
+    if isinstance(window, (basestring, tuple)):
+        return window
+    return ('array', np.asarray(window, dtype=np.float64).tostring())
+
+
+def psd_engine(fs, nfft, window='hann', noverlap=None, detrend='constant'):
+    """return (cached) PsdEngine for the given parameters"""
+    key = (float(fs), nfft, _window_key(window), nfft // 2 if noverlap is None else noverlap, detrend)
+    if key not in _ENGINES:
+        _ENGINES[key] = PsdEngine(fs, nfft, window=window, noverlap=noverlap, detrend=detrend)
+    return _ENGINES[key]
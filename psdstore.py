@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+
+"""An on-disk store of daily PSD sums, one array file per sensor-month, with an (SQLite) index.
+
+With one psdsum mat file per sensor-day, an average over months means hundreds of loadmat calls and a sum in Python.
+Here, each sensor-month for a given set of PSD parameters is one .npy array of shape (days in month, nfreq, 4) with
+the PSD sum for day d in row d-1, so the sum over a run of days is one sliced read (from a memory map, optionally) of
+each month's array.  The index holds what the arrays do not: deltaf and PSD parameters for each series, plus segment
+count and provenance (the files in each day's sum, with size and mtime) for each sensor-day.
+
+Each series also keeps rollups: per year, one array with the PSD sum for the year, for each month and for each week
+(days 1-7, 8-14, 15-21 and 22-28) of each month.  These get updated whenever a day is put, so the sum over any date
+range is a handful of pre-summed blocks (whole years, then whole months, then whole weeks) plus at most a few days at
+either end, instead of a read of every day in the range.
+
+Array files are not in SQLite, so writes to them (and reads of them for a sum) happen under the store's lock, an
+immediate SQLite transaction, which lets any number of processes put days in the same store.
+"""
+
+import os
+import sqlite3
+import datetime
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from ugaudio.spectral_average_calc import PsdAccumulator, PSDSUM_VERSION
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id        INTEGER PRIMARY KEY,
+    sensor    TEXT,
+    fs        REAL,
+    nfft      INTEGER,
+    noverlap  INTEGER,
+    detrend   TEXT,
+    nfreq     INTEGER,
+    deltaf    REAL,
+    UNIQUE (sensor, fs, nfft, noverlap, detrend)
+);
+CREATE TABLE IF NOT EXISTS days (
+    series_id INTEGER,
+    day       TEXT,
+    count     INTEGER,
+    PRIMARY KEY (series_id, day)
+);
+CREATE TABLE IF NOT EXISTS sources (
+    series_id INTEGER,
+    day       TEXT,
+    filename  TEXT,
+    size      INTEGER,
+    mtime     REAL
+);
+CREATE INDEX IF NOT EXISTS sources_day ON sources (series_id, day);
+CREATE TABLE IF NOT EXISTS stale_months (
+    series_id INTEGER,
+    year      INTEGER,
+    month     INTEGER,
+    PRIMARY KEY (series_id, year, month)
+);
+"""
+
+# weeks are days 1-7, 8-14, 15-21 & 22-28 of each month (days 29-31 are only in month and year sums)
+_WEEK_DAYS = 7
+_WEEKS_PER_MONTH = 4
+
+# rows of a year's rollup array: year sum, then 12 month sums, then 4 week sums for each month
+_ROLLUP_ROWS = 1 + 12 + 12 * _WEEKS_PER_MONTH
+
+
+def _days_in_month(year, month):
+    """return number of days in month"""
+    if month == 12:
+        return 31
+    return (datetime.date(year, month + 1, 1) - datetime.date(year, month, 1)).days
+
+
+def _as_date(day):
+    """return datetime.date for day (a date, datetime or pandas Timestamp)"""
+    return datetime.date(day.year, day.month, day.day)
+
+
+def _week_row(month, week):
+    """return row of a year's rollup array for week (0 to 3) of month"""
+    return 13 + _WEEKS_PER_MONTH * (month - 1) + week
+
+
+def _sum_runs(m, rows):
+    """return sum over rows (sorted indexes) of array m, with one sliced sum for each run of consecutive rows"""
+    total = np.zeros(m.shape[1:])
+    i = 0
+    while i < len(rows):
+        j = i
+        while j + 1 < len(rows) and rows[j + 1] == rows[j] + 1:
+            j += 1
+        total += m[rows[i]:rows[j] + 1].sum(axis=0)
+        i = j + 1
+    return total
+
+
+class PsdStore(object):
+    """A class for a store of daily PSD sums (one PsdAccumulator per sensor-day) kept under root_dir.
+
+    A series is a sensor with one set of PSD parameters (fs, nfft, noverlap
+    and detrend).  Its arrays are root_dir/sensor/FS_NFFT_NOVERLAP_DETREND/
+    YYYY-MM_psdsum.npy, each created all zeros (sparse, so days not yet put
+    take no disk space), and the index is root_dir/psdstore.sqlite.  A day
+    counts as in the store only once its index entry is written, which
+    happens after its row is flushed to the array file, so an interrupted put
+    leaves the day out rather than half in.
+
+    Rollups for each year are in YYYY_rollup.npy next to the month arrays.
+    A put marks the day's month stale in the same transaction as its index
+    entry, then (in another transaction) updates the week, month and year
+    sums for all stale months of that year and clears their marks; a month
+    still marked stale (e.g. after an interrupted put) gets its rollups
+    rebuilt from its days before they get used.
+
+    Each put and sum_range holds the store's lock (an immediate SQLite
+    transaction) while it reads or writes array files, so other processes
+    with the same store wait for it (up to 60 seconds) instead of creating,
+    writing or rolling up the same array at the same time.
+
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        if not os.path.exists(root_dir):
+            os.makedirs(root_dir)
+        self.db_file = os.path.join(root_dir, 'psdstore.sqlite')
+        # other processes may be updating too; autocommit, so transactions are just the ones _lock begins
+        self.conn = sqlite3.connect(self.db_file, timeout=60.0, isolation_level=None)
+        self.conn.executescript(_SCHEMA)
+
+    def __str__(self):
+        """str(self)"""
+        num_series = self.conn.execute('SELECT COUNT(*) FROM series').fetchone()[0]
+        num_days = self.conn.execute('SELECT COUNT(*) FROM days').fetchone()[0]
+        return '%s (%d sensor-days in %d series)' % (self.root_dir, num_days, num_series)
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _lock(self):
+        """hold store's lock (immediate transaction, committed at the end or rolled back on error) for with block"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def _series(self, sensor, pa, create=False):
+        """return (id, nfreq, deltaf) for series of sensor with accumulator pa's parameters, or None if not in store
+
+        With create, a series not in store yet gets added (caller holds lock).
+        """
+        fs, nfft, noverlap, detrend = pa.params()
+        key = (sensor, float(fs), nfft, noverlap, detrend or 'none')
+        sql = 'SELECT id, nfreq, deltaf FROM series WHERE sensor=? AND fs=? AND nfft=? AND noverlap=? AND detrend=?'
+        row = self.conn.execute(sql, key).fetchone()
+        if row is None and create:
+            freqs = pa.engine.freqs
+            self.conn.execute('INSERT INTO series (sensor, fs, nfft, noverlap, detrend, nfreq, deltaf) '
+                              'VALUES (?, ?, ?, ?, ?, ?, ?)', key + (freqs.size, freqs[1]))
+            row = self.conn.execute(sql, key).fetchone()
+        return row
+
+    def month_file(self, sensor, pa, year, month):
+        """return name of array file for sensor-month with accumulator pa's parameters"""
+        fs, nfft, noverlap, detrend = pa.params()
+        series_dir = '%s_%d_%d_%s' % (str(float(fs)).replace('.', 'p'), nfft, noverlap, detrend or 'none')
+        return os.path.join(self.root_dir, sensor, series_dir, '%4d-%02d_psdsum.npy' % (year, month))
+
+    def _month_array(self, sensor, pa, year, month, nfreq, mode='r'):
+        """return memory map of sensor-month array (created all zeros if mode is 'r+' and it does not exist yet)"""
+        fname = self.month_file(sensor, pa, year, month)
+        if mode == 'r+' and not os.path.exists(fname):
+            dname = os.path.dirname(fname)
+            if not os.path.exists(dname):
+                os.makedirs(dname)
+            shape = (_days_in_month(year, month), nfreq, 4)
+            return np.lib.format.open_memmap(fname, mode='w+', dtype=np.float64, shape=shape)
+        return np.load(fname, mmap_mode=mode)
+
+    def rollup_file(self, sensor, pa, year):
+        """return name of rollup array file for sensor-year with accumulator pa's parameters"""
+        return os.path.join(os.path.dirname(self.month_file(sensor, pa, year, 1)), '%4d_rollup.npy' % year)
+
+    def _day_rows(self, series_id, year, month):
+        """return sorted list of rows (day of month minus one) for days of sensor-month in store"""
+        rows = self.conn.execute('SELECT day FROM days WHERE series_id=? AND day>=? AND day<=? ORDER BY day',
+                                 (series_id, '%4d-%02d-01' % (year, month), '%4d-%02d-31' % (year, month)))
+        return [int(d[8:10]) - 1 for d, in rows]
+
+    def _stale_months(self, series_id, year):
+        """return sorted list of months of year whose rollups are marked stale"""
+        rows = self.conn.execute('SELECT month FROM stale_months WHERE series_id=? AND year=? ORDER BY month',
+                                 (series_id, year))
+        return [month for month, in rows]
+
+    def _update_rollups(self, sensor, pa, series, year):
+        """recompute week, month and year sums in rollup array for stale months of year; clear marks (under lock)"""
+        series_id, nfreq, deltaf = series
+        fname = self.rollup_file(sensor, pa, year)
+        if os.path.exists(fname):
+            r = np.load(fname, mmap_mode='r+')
+            months = self._stale_months(series_id, year)
+        else:
+            # new rollup array needs all of its sums; it gets renamed into place once they are all there
+            r = np.lib.format.open_memmap(fname + '.tmp', mode='w+', dtype=np.float64, shape=(_ROLLUP_ROWS, nfreq, 4))
+            months = range(1, 13)
+        for month in months:
+            rows = self._day_rows(series_id, year, month)
+            if not rows:
+                r[month] = 0.0
+                r[_week_row(month, 0):_week_row(month, _WEEKS_PER_MONTH)] = 0.0
+                continue
+            m = self._month_array(sensor, pa, year, month, nfreq)
+            r[month] = _sum_runs(m, [i for i in rows if i >= _WEEK_DAYS * _WEEKS_PER_MONTH])
+            for w in xrange(_WEEKS_PER_MONTH):
+                r[_week_row(month, w)] = _sum_runs(m, [i for i in rows if i // _WEEK_DAYS == w])
+                r[month] += r[_week_row(month, w)]
+            del m
+        r[0] = r[1:13].sum(axis=0)
+        r.flush()
+        del r
+        if not os.path.exists(fname):
+            os.rename(fname + '.tmp', fname)
+        self.conn.execute('DELETE FROM stale_months WHERE series_id=? AND year=?', (series_id, year))
+
+    def put(self, sensor, day, pa):
+        """store (or replace) accumulator pa (its PSD sum, count and sources) for sensor on day"""
+        if pa.psd is None:
+            raise ValueError('no PSD sum to store for %s on %s' % (sensor, day))
+        if pa.version != PSDSUM_VERSION:
+            raise ValueError('cannot store psdsum format version %d for %s on %s (store has version %d)' %
+                             (pa.version, sensor, day, PSDSUM_VERSION))
+        day = _as_date(day)
+        day_str = str(day)
+        with self._lock():
+            series = self._series(sensor, pa, create=True)
+            series_id, nfreq, deltaf = series
+            m = self._month_array(sensor, pa, day.year, day.month, nfreq, mode='r+')
+            m[day.day - 1] = pa.psd
+            m.flush()
+            del m
+            self.conn.execute('INSERT OR REPLACE INTO stale_months VALUES (?, ?, ?)',
+                              (series_id, day.year, day.month))
+            self.conn.execute('INSERT OR REPLACE INTO days VALUES (?, ?, ?)', (series_id, day_str, pa.count))
+            self.conn.execute('DELETE FROM sources WHERE series_id=? AND day=?', (series_id, day_str))
+            self.conn.executemany('INSERT INTO sources VALUES (?, ?, ?, ?, ?)',
+                                  [(series_id, day_str, bname, size, mtime)
+                                   for bname, (size, mtime) in pa.sources.items()])
+        with self._lock():
+            self._update_rollups(sensor, pa, series, day.year)
+
+    def _template(self, fs, nfft, noverlap, detrend):
+        """return empty accumulator with the given PSD parameters"""
+        return PsdAccumulator(fs, nperseg=nfft, noverlap=noverlap, detrend=detrend)
+
+    def days(self, sensor, day_start, day_stop, fs, nfft, noverlap=None, detrend='constant'):
+        """return OrderedDict of day -> segment count for days in store from day_start to day_stop (inclusive)"""
+        row = self._series(sensor, self._template(fs, nfft, noverlap, detrend))
+        if row is None:
+            return OrderedDict()
+        rows = self.conn.execute('SELECT day, count FROM days WHERE series_id=? AND day>=? AND day<=? ORDER BY day',
+                                 (row[0], str(_as_date(day_start)), str(_as_date(day_stop)))).fetchall()
+        return OrderedDict((datetime.datetime.strptime(d, '%Y-%m-%d').date(), c) for d, c in rows)
+
+    def _add_sources(self, pa, series_id, day_start, day_stop):
+        """add index's sources for days from day_start to day_stop to accumulator pa"""
+        rows = self.conn.execute('SELECT filename, size, mtime FROM sources WHERE series_id=? AND day>=? AND day<=? '
+                                 'ORDER BY day, rowid', (series_id, str(day_start), str(day_stop)))
+        for bname, size, mtime in rows:
+            pa.sources[bname] = (size, mtime)
+
+    def get(self, sensor, day, fs, nfft, noverlap=None, detrend='constant'):
+        """return accumulator stored for sensor on day, or None if that day is not in store"""
+        return self.sum_range(sensor, day, day, fs, nfft, noverlap=noverlap, detrend=detrend)
+
+    def sum_range(self, sensor, day_start, day_stop, fs, nfft, noverlap=None, detrend='constant', mmap=True,
+                  rollups=True):
+        """return accumulator with sum of days in store from day_start to day_stop (inclusive), or None if none are
+
+        With rollups, whole years, months and weeks in the range come from pre-summed blocks and only the days left
+        over at either end come from month arrays; without, each run of consecutive days is one sliced sum over a
+        month's array.  Arrays are read through memory maps if mmap is True (otherwise each one is loaded whole).
+        """
+        day_start, day_stop = _as_date(day_start), _as_date(day_stop)
+        pa = self._template(fs, nfft, noverlap, detrend)
+        with self._lock():  # rollups may need an update, and no put may write arrays while they are read
+            series = self._series(sensor, pa)
+            days = self.days(sensor, day_start, day_stop, fs, nfft, noverlap=noverlap, detrend=detrend)
+            if series is None or not days:
+                return None
+            series_id, nfreq, deltaf = series
+            pa.psd = np.zeros((nfreq, 4))
+            pa.f = pa.engine.freqs
+            mode = 'r' if mmap else None
+
+            # group days in store by month
+            months = OrderedDict()
+            for d in days:
+                months.setdefault((d.year, d.month), []).append(d.day - 1)
+
+            rollup = {}  # year -> rollup array, for years with pre-summed blocks in use
+            for (year, month), rows in months.items():
+                if rollups and year not in rollup:
+                    if self._stale_months(series_id, year) or not os.path.exists(self.rollup_file(sensor, pa, year)):
+                        self._update_rollups(sensor, pa, series, year)
+                    rollup[year] = np.load(self.rollup_file(sensor, pa, year), mmap_mode=mode)
+                    if day_start <= datetime.date(year, 1, 1) and datetime.date(year, 12, 31) <= day_stop:
+                        pa.psd += rollup[year][0]
+                if rollups and day_start <= datetime.date(year, 1, 1) and datetime.date(year, 12, 31) <= day_stop:
+                    continue  # whole year already in sum
+                d1 = day_start.day if (year, month) == (day_start.year, day_start.month) else 1
+                d2 = day_stop.day if (year, month) == (day_stop.year, day_stop.month) else _days_in_month(year, month)
+                if rollups and d1 == 1 and d2 == _days_in_month(year, month):
+                    pa.psd += rollup[year][month]
+                    continue
+                if rollups:
+                    for w in xrange(_WEEKS_PER_MONTH):
+                        if d1 <= w * _WEEK_DAYS + 1 and (w + 1) * _WEEK_DAYS <= d2:
+                            pa.psd += rollup[year][_week_row(month, w)]
+                            rows = [i for i in rows if i // _WEEK_DAYS != w]
+                if rows:
+                    m = self._month_array(sensor, pa, year, month, nfreq, mode=mode)
+                    pa.psd += _sum_runs(m, rows)
+                    del m
+            del rollup
+            pa.update_rss()
+            pa.count = sum(days.values())
+            self._add_sources(pa, series_id, day_start, day_stop)
+            return pa
+
+def import_psdsum_files(store, sensor, mat_files):
+    """put daily psdsum mat files (named like 2020-04-14_121f08_500p0_32768_psdsum.mat) in store; return count"""
+    count = 0
+    for mat_file in mat_files:
+        day = datetime.datetime.strptime(os.path.basename(mat_file)[0:10], '%Y-%m-%d').date()
+        store.put(sensor, day, PsdAccumulator.load_psdsum_matfile(mat_file))
+        count += 1
+    return count
+
+
+if __name__ == '__main__':
+
+    import glob
+    store = PsdStore('C:/temp/psdstore')
+    mat_files = sorted(glob.glob('C:/temp/psdsum/year2020/month04/*_121f08_500p0_32768_psdsum.mat'))
+    print import_psdsum_files(store, '121f08', mat_files), 'days imported'
+    print store
+    pa = store.sum_range('121f08', datetime.date(2020, 4, 1), datetime.date(2020, 4, 30), 500.0, 32768)
+    print '%d segments from %d files' % (pa.count, len(pa.sources))
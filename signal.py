@@ -5,13 +5,69 @@ import warnings
 import numpy as np
 from scipy.signal import hann
 
+# Cache of (rising, falling) taper window halves keyed by number of taper pts.
+_TAPER_WINDOWS = {}
+
 # Return amplitude normalized version of input signal.
-def normalize(a):
-    """Return amplitude normalized version of input signal."""
-    sf = max(abs(a))
-    if sf == 0:
-        return a
-    return a / sf
+def normalize(a, out=None):
+    """Return amplitude normalized version of input signal.
+    
+    For a 2d input, each column is normalized on its own.  If out is given
+    (it can be the input itself), the result goes there instead of into a new
+    array.
+    """
+    a = np.asarray(a)
+    
+    # max(abs(a)) without making an abs copy of the signal
+    sf = np.maximum(a.max(axis=0), -a.min(axis=0))
+    if np.ndim(sf) == 0:
+        if sf == 0:
+            if out is None:
+                return a
+            out[...] = a
+            return out
+    else:
+        sf[sf == 0] = 1 # leave all-zero columns alone
+    if out is None:
+        return a / sf
+    return np.divide(a, sf, out=out)
+
+# Demean columns of 2d array in place; return (double precision) mean that was removed.
+def demean(a, mean=None):
+    """Demean columns of 2d array in place; return (double precision) mean that was removed.
+    
+    The mean is accumulated in double precision (like MATLAB would) even for a
+    float32 array, so demeaning is not coarse.  If mean is given, that is what
+    gets removed instead (e.g. precomputed per-file or NaN-aware mean).
+    """
+    if mean is None:
+        mean = a.mean(axis=0, dtype=np.float64)
+    else:
+        mean = np.asarray(mean, dtype=np.float64)
+    a -= mean
+    return mean
+
+# Return vector magnitude of rows of (N, 3) array, into out if given.
+def vecmag(xyz, out=None):
+    """Return vector magnitude of rows of (N, 3) array, into out if given.
+    
+    Sum of squares is one einsum reduction (no squared copies of the columns),
+    then sqrt is done in place.
+    """
+    if out is None:
+        out = np.empty(xyz.shape[0], dtype=np.result_type(xyz, np.float32))
+    np.einsum('ij,ij->i', xyz, xyz, out=out)
+    return np.sqrt(out, out=out)
+
+# Demean (N, 3) xyz array in place and return its vector magnitude (into out, if given).
+def demean_vecmag(xyz, out=None, mean=None):
+    """Demean (N, 3) xyz array in place and return its vector magnitude (into out, if given).
+    
+    This is the one demean-plus-vecmag recipe for all readers; see demean and
+    vecmag.
+    """
+    demean(xyz, mean=mean)
+    return vecmag(xyz, out=out)
 
 # Return numpts (desired = fs * t); but no more than one-third signal duration.
 def clip_at_third(sig, fs, t):
@@ -29,23 +85,55 @@ def clip_at_third(sig, fs, t):
     #print Ndesired, Nactual, len(sig), third
     return Nactual
 
+# Return (rising, falling) halves of hann window for tapering N pts at each end.
+def taper_window(N):
+    """Return (rising, falling) halves of hann window for tapering N pts at each end.
+    
+    Windows are computed once for each taper length (which is what a given
+    sample rate and taper duration boil down to) and cached read-only.
+    """
+    if N not in _TAPER_WINDOWS:
+        w = hann(2*N+1)
+        rising, falling = w[0:N], w[len(w)-N:]
+        rising.flags.writeable = False
+        falling.flags.writeable = False
+        _TAPER_WINDOWS[N] = (rising, falling)
+    return _TAPER_WINDOWS[N]
+
 # Return tapered copy of input signal; taper first & last t seconds.
-def my_taper(a, fs, t):
-    """Return tapered copy of input signal; taper first & last t seconds."""
+def my_taper(a, fs, t, out=None):
+    """Return tapered copy of input signal; taper first & last t seconds.
+    
+    For a 2d input, each column is tapered (along the first axis).  If out is
+    given (it can be the input itself), the tapering is done there instead of
+    in a new copy.
+    """
     # number of pts to taper (at most, one-third of signal)
     N = clip_at_third(a, fs, t)
     
-    # use portion of hann (w) to do the tapering
-    w = hann(2*N+1)
+    # taper both ends of signal copy (leave input alone), unless out was given
+    if out is None:
+        b = np.array(a, dtype=np.result_type(a, np.float32)) # integer signal gets float copy
+    else:
+        b = out
+        if b is not a:
+            b[...] = a
+    if N == 0:
+        return b
     
-    # taper both ends of signal copy (leave input alone)
-    b = a.copy()
-    b[0:N] *= w[0:N]
-    b[-N:] *= w[-N:]
+    # use (cached) portions of hann to do the tapering, shaped to broadcast over columns
+    rising, falling = taper_window(N)
+    shape = (-1,) + (1,) * (b.ndim - 1)
+    b[0:N] *= rising.reshape(shape)
+    b[-N:] *= falling.reshape(shape)
     return b
 
 # Return time array derived from sample rate and length of input signal.
-def timearray(y, fs):
+def timearray(y, fs, out=None):
     """Return time array derived from sample rate and length of input signal."""
-    T = len(y) / float(fs) # total time of the signal
-    return np.linspace(0, T, len(y), endpoint=False)
+    n = len(y)
+    if out is None:
+        out = np.empty(n)
+    out[:] = np.arange(n)
+    out /= float(fs)
+    return out
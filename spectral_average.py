@@ -11,7 +11,7 @@ import numpy as np
 from inputs import argparser
 from spectral_average_defaults import LOCATIONS
 from spectral_average_defaults import LOGDIR, DEFAULT_RATE, DEFAULT_CUTOFF, DEFAULT_START, DEFAULT_SENSORS, DEFAULT_OUTDIR
-from spectral_average_calc import spec_avg_date_range
+from spectral_average_batch import spec_avg_tasks, spec_avg_schedule, exit_code
 
 
 def get_logger(log_file):
@@ -74,9 +74,6 @@ def main():
     # get input arguments
     args = get_inputs(module_logger)
 
-    print args
-    raise SystemExit
-
     # for convenience in call below, let's rename args here
     pad_dir = args.paddir
     out_dir = args.outdir
@@ -86,19 +83,19 @@ def main():
 
     nfiles = args.nfiles
 
-    # iterate over sensors
-    daily_running_tallies = []
-    for sensor in args.sensors:
-        location = LOCATIONS[sensor]
-        drt = spec_avg_date_range(sensor, location, day_start, day_stop, nfft, fs, fc, num_files=nfiles,
-                                  pad_dir=pad_dir, out_dir=out_dir, do_plot=False)
-        daily_running_tallies.append(drt)
+    # expand sensors x days into tasks and run them on pool of workers (skipping days already done)
+    tasks = spec_avg_tasks(args.sensors, day_start, day_stop, locations=LOCATIONS)
+    module_logger.info('scheduling %d sensor-day tasks on %d workers' % (len(tasks), args.jobs))
+    results = spec_avg_schedule(tasks, nfft, fs, fc, num_files=nfiles, pad_dir=pad_dir, out_dir=out_dir,
+                                workers=args.jobs, timeout=args.timeout, force=args.force, update=args.update,
+                                index_file=args.index)
 
-    # iterate over daily running (spec avg) tallies
-    for drt in daily_running_tallies:
-        print drt
+    # summarize what became of each task
+    for r in results:
+        module_logger.info('%s %s: %s (%.1f sec)' % (r.task.sensor, r.task.day, r.status, r.seconds))
 
-    return 0  # return zero for success, which is typical Linux command line behavior
+    # return zero for success, which is typical Linux command line behavior (1 if any sensor-day did not get done)
+    return exit_code(results)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""Schedule spectral average work for many sensors and days on a bounded pool of worker processes.
+
+Each (sensor, day) pair is one task.  A task whose daily psdsum file already exists is skipped (that file is the
+task's checkpoint), so rerunning a big batch only does the work that is missing.  A day with no qualifying PAD files
+has no psdsum file, so an empty marker file is its checkpoint instead.  In update mode such tasks run anyway, but only
+fold in PAD files that their psdsum file does not already contain.  Each task runs in its own process,
+so one that runs longer than the timeout can be killed without affecting the others.
+"""
+
+import os
+import sys
+import time
+import logging
+import pandas as pd
+from collections import namedtuple, deque
+from multiprocessing import Process
+
+from spectral_average_defaults import LOCATIONS
+from spectral_average_calc import spec_avg_one_day, psdsum_filename
+
+# create logger
+module_logger = logging.getLogger('ugaudio.batch')
+
+# one sensor-day of spectral average work
+SpecAvgTask = namedtuple('SpecAvgTask', ['sensor', 'location', 'day'])
+
+# what became of a task
+SpecAvgResult = namedtuple('SpecAvgResult', ['task', 'status', 'seconds'])
+
+# exit code of a task process for a day with no qualifying PAD files (so no PSD)
+EMPTY_EXIT_CODE = 3
+
+
+def spec_avg_tasks(sensors, day_start, day_stop, locations=LOCATIONS):
+    """return list of tasks, one for each sensor for each day from day_start to day_stop (inclusive)"""
+    dr = pd.date_range(day_start, day_stop, freq='1D')
+    return [SpecAvgTask(sensor, locations[sensor], d.date()) for sensor in sensors for d in dr]
+
+
+def task_psdsum_file(task, nfft, fs, out_dir):
+    """return psdsum (checkpoint) file name for task"""
+    d = task.day
+    return psdsum_filename(task.sensor, d.year, d.month, d.day, fs, nfft, out_dir=out_dir)
+
+
+def task_empty_file(task, nfft, fs, out_dir):
+    """return empty marker (checkpoint) file name for task whose day has no qualifying PAD files"""
+    return task_psdsum_file(task, nfft, fs, out_dir) + '.empty'
+
+
+def _run_task(task, nfft, fs, fc, num_files, pad_dir, out_dir, incremental, index_file):
+    """run one task (in its own worker process); exit with EMPTY_EXIT_CODE after marking day with no PSD as empty"""
+    d = task.day
+    prt = spec_avg_one_day(task.sensor, d.year, d.month, d.day, nfft, fs, fc, task.location, num_files=num_files,
+                           pad_dir=pad_dir, out_dir=out_dir, incremental=incremental, index_file=index_file)
+    empty_file = task_empty_file(task, nfft, fs, out_dir)
+    if prt.pa.psd is not None:
+        if os.path.exists(empty_file):
+            os.remove(empty_file)  # day has data now
+        return
+    if not os.path.exists(os.path.dirname(empty_file)):
+        os.makedirs(os.path.dirname(empty_file))
+    open(empty_file, 'w').close()
+    sys.exit(EMPTY_EXIT_CODE)
+
+
+def spec_avg_schedule(tasks, nfft, fs, fc, num_files=None, pad_dir='d:/pad', out_dir='c:/temp/psdsum', workers=2,
+                      timeout=None, force=False, update=False, index_file=None, poll=0.5, run_task=_run_task):
+    """run tasks on at most workers processes at a time and return list of SpecAvgResult's in task order
+
+    A task is skipped if its psdsum (or empty marker) file exists, unless update is True (fold in only new PAD files)
+    or force is True (recompute whole day).  A task still running after timeout seconds is terminated.  Status for
+    each task is one of: skipped, done, empty (no qualifying PAD files), failed or timeout.  If index_file is given,
+    PAD files are selected from that (SQLite) index.  Each task runs run_task with the same args as _run_task.
+    """
+    results = {}
+    queue = deque()
+    for task in tasks:
+        if not (force or update) and (os.path.exists(task_psdsum_file(task, nfft, fs, out_dir)) or
+                                      os.path.exists(task_empty_file(task, nfft, fs, out_dir))):
+            module_logger.info('skipping %s %s (psdsum or empty marker file exists)' % (task.sensor, task.day))
+            results[task] = SpecAvgResult(task, 'skipped', 0.0)
+        else:
+            queue.append(task)
+
+    running = {}  # task -> (process, start time)
+    try:
+        while queue or running:
+
+            # keep pool of workers full
+            while queue and len(running) < workers:
+                task = queue.popleft()
+                p = Process(target=run_task, args=(task, nfft, fs, fc, num_files, pad_dir, out_dir, not force,
+                                                   index_file))
+                p.start()
+                running[task] = (p, time.time())
+                module_logger.debug('started %s %s' % (task.sensor, task.day))
+
+            time.sleep(poll)
+
+            # collect finished tasks and kill ones that ran out of time
+            for task, (p, t0) in running.items():
+                seconds = time.time() - t0
+                if not p.is_alive():
+                    p.join()
+                    status = {0: 'done', EMPTY_EXIT_CODE: 'empty'}.get(p.exitcode, 'failed')
+                elif timeout is not None and seconds > timeout:
+                    p.terminate()
+                    p.join()
+                    status = 'timeout'
+                else:
+                    continue
+                del running[task]
+                results[task] = SpecAvgResult(task, status, seconds)
+                module_logger.info('%s %s %s after %.1f seconds' % (task.sensor, task.day, status, seconds))
+
+    except KeyboardInterrupt:
+        module_logger.warning('user pressed ctrl-c, so terminating %d running tasks' % len(running))
+        for p, t0 in running.values():
+            p.terminate()
+            p.join()
+        raise
+
+    return [results[task] for task in tasks if task in results]
+
+
+def exit_code(results):
+    """return exit code for results of spec_avg_schedule: 1 if any task failed or timed out, otherwise zero (an empty
+    day is not a failure)"""
+    return 1 if any(r.status in ('failed', 'timeout') for r in results) else 0
+
+
+if __name__ == '__main__':
+
+    import datetime
+    logging.basicConfig(level=logging.INFO)
+
+    tasks = spec_avg_tasks(['121f03', '121f08'], datetime.date(2020, 4, 5), datetime.date(2020, 4, 9))
+    for r in spec_avg_schedule(tasks, 32768, 500.0, 200.0, pad_dir='D:/pad', out_dir='c:/temp/psdsum', workers=4,
+                               timeout=3600):
+        print r.task.sensor, r.task.day, r.status, '%.1f' % r.seconds
@@ -4,15 +4,30 @@ import datetime
 import glob
 import os.path
 import numpy as np
+from collections import OrderedDict
+from itertools import imap
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
 import pandas as pd
 import matplotlib.pyplot as plt
-from scipy.signal import welch
-from scipy.io import savemat
-from ugaudio.load import padread
+from scipy.io import savemat, loadmat
+from ugaudio.load import padmap, pad_runs, pad_num_rows
+from ugaudio.psd import psd_engine
+from ugaudio.padindex import PadIndex, SSA_COORDS
 from pims.utils.pimsdateutil import datetime_to_ymd_path
 from pims.files.filter_pipeline import FileFilterPipeline, MinDurMinutesPad, HeaderMatchesRateCutoffLocSsaPad
 from pims.files.utils import mkdir_p
 
+# psdsum file format: 1 (files with no version) has sum of per-file average PSDs and count of files; 2 has sum of
+# per-segment periodograms and count of segments, plus PSD parameters and sources
+PSDSUM_VERSION = 2
+
+
+def default_max_gap(fs):
+    """return largest gap (seconds) between PAD files that segments may span (two sample periods, plus 2 ms of slack
+    for millisecond times in PAD filenames)"""
+    return 2.0 / fs + 0.002
+
 
 class PsdAccumulator(object):
     """A class to accumulate PSDs for spectral averaging.
@@ -20,65 +35,200 @@ class PsdAccumulator(object):
     This class will calculate a running sum of PSDs and keep
     count of how many to average when done accumulating.
 
+    Data can be appended in chunks of any length.  Welch segments (Hann window,
+    noverlap defaults to 50% and detrend to constant, like scipy's welch
+    defaults; detrend can also be linear or False) are taken as strided views
+    of the data, and samples that do not yet fill a segment are
+    carried over to the next append, so nothing is trimmed or lost at chunk (or
+    file) boundaries; use break_tail where data is not contiguous (e.g. a
+    gap between files).  The first 3 columns of the psd attribute are sums of
+    per-segment x, y and z periodograms and count is the number of segments in
+    those sums, so accumulators (or saved psdsum partials) with the same fs,
+    nperseg, noverlap and detrend merge exactly, each weighted by its number
+    of segments.  The 4th column is RSS(x, y, z) of the sums, so it averages
+    to RSS of the average PSD.
+
+    Saved psdsum files have a format version (see PSDSUM_VERSION).  Files
+    from before versions were saved load as version 1 (sum of per-file
+    averages, count of files), which only merge with other version 1 sums.
+
+    The sources attribute maps basename of each input file in the sum to its
+    (size, mtime), so a saved psdsum product knows what it already contains.
+
     """
 
-    def __init__(self, fs, nperseg=32768):
+    def __init__(self, fs, nperseg=32768, batch=8, noverlap=None, detrend='constant'):
         self.fs = fs
         self.nperseg = nperseg
+        self.noverlap = nperseg // 2 if noverlap is None else noverlap
+        self.detrend = detrend
+        self.batch = batch  # max num segments per rfft call (bounds temporary memory)
         self.f, self.psd = None, None
         self.count = 0
+        self.version = PSDSUM_VERSION
+        self.sources = OrderedDict()  # basename -> (size, mtime) for each input file in the sum
 
-    def append(self, txyz, verbose=False):
-        """compute array of PSDs from acceleration vs. time value input array, append & increment"""
+        # window, density scaling and frequencies come from (cached) engine shared by all accumulators like this one
+        self.engine = psd_engine(fs, nperseg, noverlap=self.noverlap, detrend=detrend)
+        self._step = self.engine.step
 
-        # delete first (time) column
-        xyz = np.delete(txyz, 0, axis=1)
+        # samples carried over from previous append (not enough yet for another segment)
+        self._tail = np.empty((0, 3))
 
-        # calculate how many segments we can fit into data length
-        N = xyz.shape[0]
-        numsegs = N // self.nperseg
-        numpts = self.nperseg * numsegs
+        # for a partial from one file (see file_psd_partial): its first nperseg - 1 samples, num rows & first segment
+        self.head, self.num_rows, self.phase = None, 0, 0
 
-        # complain about not enough data for at least one segment and early return
-        if verbose:
-            if numsegs < 1:
-                print '%d pts is not enough even one segment of length %d' % (N, self.nperseg)
-                return
-            else:
-                print 'numsegs = %d, nperseg = %d, numpts = %d' % (numsegs, self.nperseg, numpts)
+    def _add_segments(self, xyz, numsegs):
+        """add periodograms for first numsegs (overlapping) segments of xyz to running sum"""
 
-        # increment counter
-        self.count += 1
+        # strided view of segments, shape is (numsegs, nperseg, 3), no data copied here
+        segs = self.engine.segments(xyz, numsegs)
 
-        # now do actual trim (resize) here
-        xyz = np.resize(xyz, (numpts, 3))
+        if self.psd is None:
+            self.psd = np.zeros((self.engine.freqs.size, 4))
+            self.f = self.engine.freqs
 
-        # compute PSD for each column (each axis)
-        f, Pxx = welch(xyz, self.fs, nperseg=self.nperseg, axis=0)
+        # one-sided periodograms for a batch of segments (all axes) per rfft call, summed for x, y & z
+        for P in self.engine.iter_periodograms(segs, batch=self.batch):
+            self.psd[:, 0:3] += P.sum(axis=0)
 
-        # calculate overall PSD
-        v = np.array(np.sqrt(Pxx[:, 0] ** 2 + Pxx[:, 1] ** 2 + Pxx[:, 2] ** 2))  # RSS(Pxx,Pyy,Pzz)
+        self.count += numsegs
+        self.update_rss()
 
-        # append RSS as 4th column
-        Pxx = np.append(Pxx, np.reshape(v, (Pxx.shape[0], -1)), axis=1)
+    def update_rss(self):
+        """set 4th column of PSD sum to RSS(Pxx,Pyy,Pzz) of x, y & z sums (e.g. after summing psd arrays directly)"""
+        self.psd[:, 3] = np.sqrt((self.psd[:, 0:3] ** 2).sum(axis=1))
 
+    def break_tail(self):
+        """drop samples carried from previous append, so next append starts a new run of segments (e.g. after a gap)"""
+        self._tail = np.empty((0, 3))
+
+    def append(self, txyz, verbose=False):
+        """compute PSDs of segments from acceleration vs. time value input array, append & increment"""
+
+        # skip first (time) column without copying
+        self._append_xyz(txyz[:, 1:4], verbose=verbose)
+
+    def _append_xyz(self, xyz, verbose=False):
+        """compute PSDs of segments from x, y & z acceleration input array, append & increment"""
+
+        # calculate how many segments we can fit into carried tail plus new data
+        m, N = self._tail.shape[0], xyz.shape[0]
+        total = m + N
+        numsegs = 0 if total < self.nperseg else (total - self.nperseg) // self._step + 1
+
+        if verbose:
+            print 'numsegs = %d, nperseg = %d, carried = %d, new = %d' % (numsegs, self.nperseg, m, N)
+
+        # segments that start in carried tail get stitched to just enough of the new data
+        nstitch = min(numsegs, -(-m // self._step))
+        if nstitch > 0:
+            need = (nstitch - 1) * self._step + self.nperseg - m
+            self._add_segments(np.concatenate((self._tail, xyz[:need])), nstitch)
+
+        # the rest of the segments are views straight into the new data
+        if numsegs > nstitch:
+            self._add_segments(xyz[nstitch * self._step - m:], numsegs - nstitch)
+
+        # carry over samples from where next segment would start
+        next_start = numsegs * self._step
+        if next_start >= m:
+            self._tail = np.array(xyz[next_start - m:], dtype=np.float64)
+        else:
+            self._tail = np.concatenate((self._tail[next_start:], xyz))
+
+    def stitch(self, other):
+        """add partial accumulator other, for the file right after data already in this one, into this one (in place)
+
+        Segments that start in the carried tail get finished with the head of other's file, then other's sum (the
+        segments that fit in its file on the same grid) is merged and its tail is carried on.  A file too short for
+        any of its own segments just gets appended whole.
+        """
+        if other.phase != -self._tail.shape[0] % self._step:
+            raise ValueError('partial starts segments %d samples into its file, but carried tail needs them %d in' %
+                             (other.phase, -self._tail.shape[0] % self._step))
+        self._append_xyz(other.head)
+        if other.head.shape[0] < other.num_rows:
+            self._tail = other._tail
+        return self.merge(other)
+
+    def params(self):
+        """return (fs, nperseg, noverlap, detrend) that PSD sum depends on"""
+        return self.fs, self.nperseg, self.noverlap, self.detrend
+
+    def merge(self, other):
+        """add other accumulator's PSD sum and count into this one (in place) and return this one"""
+        if other.params() != self.params():
+            raise ValueError('cannot merge PSDs with fs, nperseg, noverlap, detrend = %s into PSDs with %s' %
+                             (other.params(), self.params()))
+        if other.version != self.version:
+            raise ValueError('cannot merge psdsum format version %d into version %d' % (other.version, self.version))
+        self.sources.update(other.sources)
+        if other.psd is None:
+            return self
         if self.psd is None:
-            self.psd = Pxx
+            self.psd = other.psd.copy()
+            self.f = other.f
         else:
-            self.psd += Pxx
-
-        if self.count == 1:
-            self.f = f
+            self.psd += other.psd
+            if self.version >= 2:
+                self.update_rss()
+        self.count += other.count
+        return self
+
+    def __add__(self, other):
+        """return new accumulator with PSD sum and count of both (carried tails are not combined)"""
+        total = PsdAccumulator(self.fs, nperseg=self.nperseg, batch=self.batch, noverlap=self.noverlap,
+                               detrend=self.detrend)
+        total.version = self.version
+        return total.merge(self).merge(other)
 
     def spectral_avg(self):
         return self.psd / self.count
 
+    def add_source(self, fname):
+        """note that data from file fname is in the sum"""
+        st = os.stat(fname)
+        self.sources[os.path.basename(fname)] = (st.st_size, st.st_mtime)
+
     def save_psdsum_matfile(self, file_name):
         mdict = {'deltaf': self.f[1],
               'psd': self.psd,
-              'count': self.count
+              'count': self.count,
+              'version': self.version,
+              'fs': self.fs,
+              'nperseg': self.nperseg,
+              'noverlap': self.noverlap,
+              'detrend': self.detrend or 'none',
+              'files': '\n'.join(self.sources.keys()),
+              'sizes': np.array([v[0] for v in self.sources.values()], dtype=np.float64),
+              'mtimes': np.array([v[1] for v in self.sources.values()], dtype=np.float64),
               }
-        savemat(file_name, mdict)
+        # write to temp file, then rename, so an interrupted save never leaves a (truncated) psdsum file behind
+        tmp_name = file_name + '.tmp'
+        savemat(tmp_name, mdict, appendmat=False)
+        if os.name == 'nt' and os.path.exists(file_name):
+            os.remove(file_name)  # rename will not replace existing file on Windows (on POSIX it does, atomically)
+        os.rename(tmp_name, file_name)
+
+    @classmethod
+    def load_psdsum_matfile(cls, file_name):
+        """return accumulator with PSD sum, count and sources from psdsum file (carried tail is not saved)"""
+        m = loadmat(file_name)
+        psd = m['psd']
+        deltaf = m['deltaf'][0][0]
+        nperseg = int(m['nperseg'][0][0]) if 'nperseg' in m else 2 * (psd.shape[0] - 1)
+        fs = m['fs'][0][0] if 'fs' in m else deltaf * nperseg
+        noverlap = int(m['noverlap'][0][0]) if 'noverlap' in m else None
+        detrend = str(m['detrend'][0]) if 'detrend' in m else 'constant'
+        pa = cls(fs, nperseg=nperseg, noverlap=noverlap, detrend=False if detrend == 'none' else detrend)
+        pa.psd, pa.count, pa.f = psd, int(m['count'][0][0]), pa.engine.freqs
+        pa.version = int(m['version'][0][0]) if 'version' in m else 1
+        if 'files' in m and m['files'].size > 0:
+            names = str(m['files'][0]).split('\n')
+            sizes, mtimes = m['sizes'].ravel(), m['mtimes'].ravel()
+            pa.sources = OrderedDict((n, (int(sz), mt)) for n, sz, mt in zip(names, sizes, mtimes))
+        return pa
 
     def pdf_plot(self):
         spec_avg = self.spectral_avg()
@@ -93,62 +243,200 @@ class PsdRunningTally(object):
 
     This class will orchestrate a running tally of PSDs given information on PAD files to be considered.
 
+    Files (in time order) are taken in time-contiguous runs: segments may span
+    the boundary between files in a run, but a gap of more than max_gap
+    seconds (default from default_max_gap) between one file's stop and the
+    next file's start, parsed from PAD filenames, starts a new run.
+
     """
 
-    def __init__(self, pad_files, pa):
+    def __init__(self, pad_files, pa, max_gap=None):
         self.pad_files = pad_files
         self.pa = pa
-
-    def run(self):
-        file_count = 0
-        print '\nBEGIN'
-        for fname in self.pad_files:
-            file_count += 1
-            a = padread(fname)
-            a[:, 1:4] = a[:, 1:4] - a[:, 1:4].mean(axis=0)  # demean x, y and z columns
-            self.pa.append(a)
-            print file_count, os.path.basename(fname)
+        self.max_gap = default_max_gap(pa.fs) if max_gap is None else max_gap
+
+    def _jobs(self):
+        """return (fname, fs, nperseg, noverlap, detrend, phase) jobs for files, and indexes of jobs that start runs
+
+        Phase is where the first segment of a file starts on the segment grid of its run (offset by rows of the files
+        before it in the run).
+        """
+        jobs, run_starts = [], set()
+        for run in pad_runs(self.pad_files, self.max_gap):
+            run_starts.add(len(jobs))
+            offset = 0
+            for fname in run:
+                jobs.append((fname,) + self.pa.params() + (-offset % self.pa.engine.step,))
+                offset += pad_num_rows(fname)
+        return jobs, run_starts
+
+    def run(self, workers=None, pool='thread'):
+        """do running tally serially (default) or, if workers is given, in parallel using a pool of workers
+
+        Each file gets a partial accumulator (see file_psd_partial), in this process or in a pool of 'thread' or
+        'process' workers, and partials are stitched together in file order, so segments span file boundaries in a
+        run and result is bit-for-bit the same no matter how many workers (if any) are used.
+        """
+        if workers is None:
+            p = None
+        elif pool == 'thread':
+            p = ThreadPool(workers)  # numpy's fft releases the GIL
+        elif pool == 'process':
+            p = Pool(workers)
+        else:
+            raise ValueError('unhandled pool "%s" (use thread or process)' % pool)
+        jobs, run_starts = self._jobs()
+        print '\nBEGIN' if p is None else '\nBEGIN (%d %s workers)' % (workers, pool)
+        try:
+            # imap gives partials back in file order, so stitch order does not depend on which worker finishes first
+            partials = imap(file_psd_partial, jobs) if p is None else p.imap(file_psd_partial, jobs)
+            for i, partial in enumerate(partials):
+                if i in run_starts:
+                    self.pa.break_tail()  # segments do not span gaps
+                self.pa.stitch(partial)
+                print i + 1, os.path.basename(jobs[i][0])
+        finally:
+            if p is not None:
+                p.terminate()
+        self.pa.break_tail()
         print 'END'
 
 
-def spec_avg_one_day(sensor, y, m, d, nfft, fs, fc, location, minMinutes=5.5, num_files=None, pad_dir='D:/pad',
-                     out_dir='C:/temp/psdsum'):
+def file_psd_partial(job):
+    """return partial PsdAccumulator for one PAD file given (fname, fs, nperseg, noverlap, detrend, phase) job
 
-    # create PSD accumulator object
-    pa = PsdAccumulator(fs, nperseg=nfft)
+    Partial has sum of segments that start phase samples into the file (and every step after that) and fit in it,
+    plus what stitch needs to join it to files before and after it: head (first nperseg - 1 samples), number of rows
+    and carried tail.  Runs in pool worker (or in this process for a serial run).
+
+    With detrend False, x, y and z get the (float64) mean of the whole file subtracted, as the serial run did before
+    segments got detrended, one chunk at a time so no demeaned copy of the file is needed.
+    """
+    fname, fs, nperseg, noverlap, detrend, phase = job
+    pa = PsdAccumulator(fs, nperseg=nperseg, noverlap=noverlap, detrend=detrend)
+
+    # map (not read) file; each segment gets detrended (if detrend is set), so no demeaned copy needed here
+    a = padmap(fname)
+    if detrend is False:
+        offset = np.r_[0.0, a[:, 1:4].mean(axis=0, dtype=np.float64)]
+        chunk = 64 * nperseg
+        for i in xrange(phase, a.shape[0], chunk):
+            pa.append(a[i:i + chunk] - offset)
+    else:
+        offset = np.zeros(4)
+        pa.append(a[phase:])
+    pa.head, pa.num_rows, pa.phase = a[:nperseg - 1, 1:4] - offset[1:4], a.shape[0], phase
+    pa.add_source(fname)
+    return pa
+
+
+def psdsum_filename(sensor, y, m, d, fs, nfft, out_dir='C:/temp/psdsum'):
+    """return daily psdsum file name (e.g. "C:/temp/psdsum/year2020/month04/2020-04-07_121f03_500p0_32768_psdsum.mat")"""
+    fs_str = str(fs).replace('.', 'p')
+    psdsum_bname = '%4d-%02d-%02d_%s_%s_%d_psdsum.mat' % (y, m, d, sensor, fs_str, nfft)
+    return os.path.join(out_dir, 'year%d' % y, 'month%02d' % m, psdsum_bname)
+
+
+def merge_psdsum_files(file_names):
+    """return accumulator with exact (segment-weighted) sum of psdsum partials in file_names (e.g. days of a week)"""
+    total = None
+    for file_name in file_names:
+        pa = PsdAccumulator.load_psdsum_matfile(file_name)
+        total = pa if total is None else total.merge(pa)
+    return total
 
-    # get a list of qualifying PAD files to consider
-    ffp = FileFilterPipeline(MinDurMinutesPad(minMinutes), HeaderMatchesRateCutoffLocSsaPad(fs, fc, location))
-    print ffp
 
-    ymd_dir = datetime_to_ymd_path(datetime.date(y, m, d), base_dir=pad_dir)
-    glob_pat = '%s/*_accel_%s/*%s' % (ymd_dir, sensor, sensor)
-    fnames = glob.glob(glob_pat)
+def new_sources(pa, fnames):
+    """return list of fnames not yet in accumulator's sum, or None if any file in its sum was changed or removed"""
+    current = OrderedDict((os.path.basename(f), f) for f in fnames)
+    for bname, (size, mtime) in pa.sources.items():
+        if bname not in current:
+            return None
+        st = os.stat(current[bname])
+        if (st.st_size, st.st_mtime) != (size, mtime):
+            return None
+    return [f for bname, f in current.items() if bname not in pa.sources]
 
-    print glob_pat
-    print 'we have %d files before filtering' % len(fnames),
-    filt_fnames = list(ffp(fnames))
-    print 'and %d files after filtering' % len(filt_fnames)
+
+def spec_avg_one_day(sensor, y, m, d, nfft, fs, fc, location, minMinutes=5.5, num_files=None, pad_dir='D:/pad',
+                     out_dir='C:/temp/psdsum', workers=None, incremental=False, index_file=None, noverlap=None,
+                     detrend='constant', store=None):
+
+    # create PSD accumulator object
+    pa = PsdAccumulator(fs, nperseg=nfft, noverlap=noverlap, detrend=detrend)
+
+    # get a list of qualifying PAD files to consider (chronological, so segments can span consecutive files)
+    if index_file is not None:
+        idx = PadIndex(index_file, pad_dir=pad_dir)
+        filt_fnames = idx.select(sensor, datetime.date(y, m, d), fs=fs, fc=fc, location=location,
+                                 min_minutes=minMinutes, data_coords=SSA_COORDS)
+        idx.close()
+        print 'we have %d files from %s' % (len(filt_fnames), index_file)
+    else:
+        ffp = FileFilterPipeline(MinDurMinutesPad(minMinutes), HeaderMatchesRateCutoffLocSsaPad(fs, fc, location))
+        print ffp
+
+        ymd_dir = datetime_to_ymd_path(datetime.date(y, m, d), base_dir=pad_dir)
+        glob_pat = '%s/*_accel_%s/*%s' % (ymd_dir, sensor, sensor)
+        fnames = sorted(glob.glob(glob_pat))
+
+        print glob_pat
+        print 'we have %d files before filtering' % len(fnames),
+        filt_fnames = list(ffp(fnames))
+        print 'and %d files after filtering' % len(filt_fnames)
 
     if num_files is None:
         num_files = len(filt_fnames)
     print 'NOTE: We are SKIPPING some for testing, so we only have %d files now\n' % num_files
     fnames = filt_fnames[0:num_files]
 
+    # psdsum file (e.g. "C:\temp\psdsum\year2020\month04\2020-04-07_121f03_500p0_32768_psdsum.mat")
+    psdsum_file = psdsum_filename(sensor, y, m, d, fs, pa.nperseg, out_dir=out_dir)
+
+    # with a PsdStore, day's PSD sum goes there (not in a psdsum file)
+    prev = None
+    if store is not None:
+        if incremental:
+            prev = store.get(sensor, datetime.date(y, m, d), fs, pa.nperseg, noverlap=pa.noverlap, detrend=detrend)
+        prev_name = '%s for %s on %4d-%02d-%02d' % (os.path.basename(store.root_dir), sensor, y, m, d)
+    elif incremental and os.path.exists(psdsum_file):
+        prev = PsdAccumulator.load_psdsum_matfile(psdsum_file)
+        prev_name = os.path.basename(psdsum_file)
+
+    # if existing PSD sum still matches the files it was made from, then just fold in files it does not have (a sum
+    # in an older format or with no sources or other PSD parameters cannot be added to, so whole day gets recomputed)
+    if prev is not None:
+        todo = None
+        if prev.version != PSDSUM_VERSION or not prev.sources or prev.params() != pa.params():
+            print '%s has old format (or no sources or other PSD parameters), so recompute whole day' % prev_name
+        else:
+            todo = new_sources(prev, fnames)
+            if todo is None:
+                print 'inputs changed since %s, so recompute whole day' % prev_name
+            elif not todo:
+                print '%s is up to date with %d files' % (prev_name, len(fnames))
+                return PsdRunningTally([], prev)
+            else:
+                print 'folding %d new files into %s' % (len(todo), prev_name)
+                pa, fnames = prev, todo  # carried tail is not saved, so segments do not span old and new files
+
     # create object for PSD running tally
     prt = PsdRunningTally(fnames, pa)
 
     # do running tally
-    prt.run()
-
-    # save pdf plot (e.g. "C:\temp\psdsum\year2020\month04\2020-04-07_121f03_500p0_32768_psdsum.mat")
-    fs_str = str(fs).replace('.', 'p')
-    psdsum_bname = '%4d-%02d-%02d_%s_%s_%d_psdsum.mat' % (y, m, d, sensor, fs_str, pa.nperseg)
-    psdsum_dname = os.path.join(out_dir, 'year%d' % y, 'month%02d' % m)
-    if not os.path.exists(psdsum_dname):
-        mkdir_p(psdsum_dname)
-    psdsum_file = os.path.join(psdsum_dname, psdsum_bname)
-    prt.pa.save_psdsum_matfile(psdsum_file)
+    prt.run(workers=workers)
+
+    # save PSD sum in store or psdsum file
+    if store is not None:
+        if prt.pa.psd is not None:
+            store.put(sensor, datetime.date(y, m, d), prt.pa)
+    elif prt.pa.psd is not None:
+        psdsum_dname = os.path.dirname(psdsum_file)
+        if not os.path.exists(psdsum_dname):
+            mkdir_p(psdsum_dname)
+        prt.pa.save_psdsum_matfile(psdsum_file)
+    else:
+        print 'no PSD for %s on %4d-%02d-%02d (no qualifying files), so no psdsum file saved' % (sensor, y, m, d)
 
     # # create pdf plot
     # prt.pa.pdf_plot()
@@ -157,13 +445,15 @@ def spec_avg_one_day(sensor, y, m, d, nfft, fs, fc, location, minMinutes=5.5, nu
 
 
 def spec_avg_date_range(sensor, location, day_start, day_stop, nfft, fs, fc, num_files=None, pad_dir='d:/pad',
-                        out_dir='c:/temp/psdsum', do_plot=True):
+                        out_dir='c:/temp/psdsum', do_plot=True, workers=None, incremental=False, index_file=None,
+                        noverlap=None, detrend='constant', store=None):
     dr = pd.date_range(day_start, day_stop, freq='1D')
     daily_running_tallies = []
     for d in dr:
         yr, mo, da = d.year, d.month, d.day
         prt = spec_avg_one_day(sensor, yr, mo, da, nfft, fs, fc, location, num_files=num_files, pad_dir=pad_dir,
-                               out_dir=out_dir)
+                               out_dir=out_dir, workers=workers, incremental=incremental, index_file=index_file,
+                               noverlap=noverlap, detrend=detrend, store=store)
         if do_plot:
             prt.pa.pdf_plot()
         daily_running_tallies.append(prt)
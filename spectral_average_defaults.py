@@ -27,3 +27,6 @@ DEFAULT_SENSORS = [k for k in LOCATIONS.keys()]
 DEFAULT_SENSORS.sort()
 DEFAULT_NFILES = None
 DEFAULT_PLOTRANGEPCT = 90.0
+DEFAULT_JOBS = 2  # num worker processes for sensor-day tasks
+DEFAULT_TIMEOUT = None  # seconds before a sensor-day task gets killed (None for no timeout)
+DEFAULT_INDEX = None  # SQLite PAD index file (None to glob and parse headers every time)
@@ -6,54 +6,159 @@ import os.path
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from scipy.io import loadmat
+from multiprocessing import Pool
 
 from spectral_average_defaults import DEFAULT_OUTDIR, DEFAULT_NFFT, DEFAULT_PLOTRANGEPCT, LOCATIONS
+from ugaudio.spectral_average_calc import PsdAccumulator
 from pims.utils.pimsdateutil import datetime_to_ymd_path
 
+# max points per trace after decimation (about what a page-wide plot can show)
+DEFAULT_MAX_POINTS = 2000
+
+_TRACES = [('x', 'X-Axis', 'red'), ('y', 'Y-Axis', 'green'), ('z', 'Z-Axis', 'blue'), ('v', 'RSS(X,Y,Z)', 'black')]
+
+# reusable figure for PSD plots in this (worker) process
+_FIGURE = None
+
+
+def decimate_psd(psd_xyzv, deltaf, xlim=None, max_points=DEFAULT_MAX_POINTS):
+    """return (f, psd) for bins within xlim with at most max_points per column (min & max of each block of bins)
+
+    Both f and psd are (points, columns), since the min and max of a block are at different bins for each column.  On
+    a log axis, a trace drawn from these looks the same as one drawn from every bin.
+    """
+    n, ncols = psd_xyzv.shape
+    i1, i2 = 0, n
+    if xlim is not None:
+        i1 = min(max(int(np.floor(xlim[0] / deltaf)), 0), n - 1)
+        i2 = max(min(int(np.ceil(xlim[1] / deltaf)) + 1, n), i1 + 1)
+    p = psd_xyzv[i1:i2]
+    step = -(-2 * p.shape[0] // max_points)  # two points (min & max) per block
+    if step <= 1:
+        f = deltaf * np.arange(i1, i2)
+        return np.repeat(f[:, np.newaxis], ncols, axis=1), np.array(p)
+    nb = -(-p.shape[0] // step)
+    blocks = np.pad(p, ((0, nb * step - p.shape[0]), (0, 0)), mode='edge').reshape((nb, step, ncols))
+    idx = np.sort(np.stack([blocks.argmin(axis=1), blocks.argmax(axis=1)], axis=1), axis=1)
+    idx = np.minimum(idx + step * np.arange(nb)[:, np.newaxis, np.newaxis], p.shape[0] - 1).reshape((2 * nb, ncols))
+    return deltaf * (i1 + idx), p[idx, np.arange(ncols)]
+
+
+class PsdFigure(object):
+    """A class for one reusable figure of x, y, z and RSS PSD traces, saved to one file after another.
+
+    The figure, axes, line artists and Nfft note get made just once; each
+    save only updates their data, labels and limits, so rendering many
+    PSDs makes no new figures (and memory stays flat).  Call close when
+    done with it.
+
+    """
+
+    def __init__(self, figsize=(11, 8.5)):
+        self.fig = plt.figure(figsize=figsize)
+        self.ax = self.fig.add_subplot(111)
+        self.lines = {}
+        for c, label, color in _TRACES:
+            self.lines[c], = self.ax.plot([], [], label=label, color=color)
+        self.ax.set_yscale('log')
+        self.ax.set_xlabel('Frequency [Hz]')
+        self.ax.set_ylabel('PSD [g**2/Hz]')
+        self.ax.grid(True)
+        self.note = self.ax.annotate('', xy=(0.94, 0.98), xycoords="axes fraction", va="center", ha="center",
+                                     bbox=dict(boxstyle="round", fc="w"))
+        self._legend_axs = None
+
+    def __str__(self):
+        """str(self)"""
+        return '%s (%s)' % (self.__class__.__name__, self.note.get_text() or 'nothing drawn yet')
+
+    def close(self):
+        plt.close(self.fig)
+
+    def save(self, pdf_file, f, psd, title, nfft, axs='xyzv', xlim=[0, 200], ylim=[1e-14, 1e-2]):
+        """draw traces (f & psd columns, e.g. from decimate_psd) for axs and save figure to pdf_file"""
+        axs = axs.lower()
+        for k, (c, label, color) in enumerate(_TRACES):
+            line = self.lines[c]
+            line.set_visible(c in axs and k < psd.shape[1])
+            if line.get_visible():
+                line.set_data(f[:, k], psd[:, k])
+            else:
+                line.set_data([], [])
+        if axs != self._legend_axs:
+            shown = [self.lines[c] for c, label, color in _TRACES if self.lines[c].get_visible()]
+            self.ax.legend(handles=shown, loc='upper center', bbox_to_anchor=(0.5, 1.0), ncol=len(shown),
+                           fancybox=True, shadow=True)
+            self._legend_axs = axs
+        self.ax.set_ylim(ylim)
+        self.ax.set_xlim(xlim)
+        self.ax.set_title(title, fontsize=12)
+        self.note.set_text('Nfft = %d' % nfft)
+        self.fig.savefig(pdf_file)
 
-def plot_psd_xyz(pdf_file, psd_xyzv, deltaf, sensor, fs, fc, location, nfft, axs='xyzv', xlim=[0, 200], ylim=[1e-14, 1e-2]):
-    """plot PSDs for x-, y- & z-axis overlay or 3-panel"""
 
-    # create frequency vector based on deltaf
-    N = psd_xyzv.shape[0]
-    f = np.arange(0, N * deltaf, deltaf)
+def psd_plot_job(pdf_file, psd_xyzv, deltaf, sensor, fs, location, nfft, axs='xyzv', xlim=[0, 200],
+                 ylim=[1e-14, 1e-2], max_points=DEFAULT_MAX_POINTS):
+    """return job for render_psd_plots, with PSD traces already decimated to max_points within xlim"""
+    f, psd = decimate_psd(psd_xyzv, deltaf, xlim=xlim, max_points=max_points)
+    title = r'%s at %s (fs = %.1f sa/sec, $\Delta f$ = %.3f Hz)' % (sensor, location, fs, deltaf)
+    return pdf_file, f, psd, title, nfft, axs, xlim, ylim
 
-    # create figure and axes objects
-    fig = plt.figure(figsize=(11, 8.5))
-    ax = plt.subplot(111)
 
-    axs = axs.lower()
-    c = 0
-    if 'x' in axs: linex, = ax.semilogy(f, psd_xyzv[:, 0], label='X-Axis', color='red'); c += 1
-    if 'y' in axs: liney, = ax.semilogy(f, psd_xyzv[:, 1], label='Y-Axis', color='green'); c += 1
-    if 'z' in axs: linez, = ax.semilogy(f, psd_xyzv[:, 2], label='Z-Axis', color='blue'); c += 1
-    if 'v' in axs: linev, = ax.semilogy(f, psd_xyzv[:, 3], label='RSS(X,Y,Z)', color='black'); c += 1
+def _init_worker():
+    """use non-interactive (Agg) backend in plot worker process"""
+    plt.switch_backend('Agg')
 
-    plt.ylim(ylim)
-    plt.xlim(xlim)
-    plt.xlabel('Frequency [Hz]')
-    plt.ylabel('PSD [g**2/Hz]')
-    plt.grid(True)
 
-    plt.title(r'%s at %s (fs = %.1f sa/sec, $\Delta f$ = %.3f Hz)' % (sensor, location, fs, deltaf), fontsize=12)
+def render_psd_job(job):
+    """save PSD plot for job (from psd_plot_job) using this process's reusable figure; return its file name"""
+    global _FIGURE
+    if _FIGURE is None:
+        _FIGURE = PsdFigure()
+    _FIGURE.save(*job)
+    return job[0]
 
-    ax.legend(loc='upper center', bbox_to_anchor=(0.5, 1.0), ncol=c, fancybox=True, shadow=True)
 
-    an1 = ax.annotate('Nfft = %d' % nfft, xy=(0.94, 0.98), xycoords="axes fraction",
-                      va="center", ha="center",
-                      bbox=dict(boxstyle="round", fc="w"))
+def render_psd_plots(jobs, workers=None):
+    """save PSD plots for jobs serially on one reusable figure or, if workers is given, on a pool of Agg processes
 
-    plt.savefig(pdf_file)
+    Each worker process keeps its own reusable figure.  Returns list of files saved, in job order.
+    """
+    if workers is None:
+        fig = PsdFigure()
+        try:
+            for job in jobs:
+                fig.save(*job)
+        finally:
+            fig.close()
+        return [job[0] for job in jobs]
+    p = Pool(workers, initializer=_init_worker)
+    try:
+        return p.map(render_psd_job, jobs)
+    finally:
+        p.terminate()
+
+
+def plot_psd_xyz(pdf_file, psd_xyzv, deltaf, sensor, fs, fc, location, nfft, axs='xyzv', xlim=[0, 200], ylim=[1e-14, 1e-2]):
+    """plot PSDs for x-, y- & z-axis overlay or 3-panel"""
+    render_psd_plots([psd_plot_job(pdf_file, psd_xyzv, deltaf, sensor, fs, location, nfft, axs=axs, xlim=xlim,
+                                   ylim=ylim)])
 
 
 def spec_avg_date_range_plot(sensor, location, day_start, day_stop, nfft, fs, fc,
                              out_dir=DEFAULT_OUTDIR,
                              axs='xyz',
                              xlim=[0, 200],
-                             ylim=[1e-14, 1e-2]):
+                             ylim=[1e-14, 1e-2],
+                             store=None,
+                             noverlap=None,
+                             detrend='constant',
+                             workers=None):
     dr = pd.date_range(day_start, day_stop, freq='1D')
     fs_str = str(fs).replace('.', 'p')
+    if store is not None:
+        return spec_avg_store_plot(store, sensor, location, dr, nfft, fs, fc, out_dir=out_dir, axs=axs, xlim=xlim,
+                                   ylim=ylim, noverlap=noverlap, detrend=detrend, workers=workers)
     mat_files = []
     for d in dr:
         yr, mo, da = d.year, d.month, d.day
@@ -78,33 +183,55 @@ def spec_avg_date_range_plot(sensor, location, day_start, day_stop, nfft, fs, fc
         print 'did NOT get %.1f%% of files expecting (only got %.1f%%), so abort' % (DEFAULT_PLOTRANGEPCT, pct_files)
         return
 
-    # get average of daily psdsum files
-    mat_dict = loadmat(mat_files[0])
-    psd_sum = mat_dict['psd']
-    psd_count = mat_dict['count'][0][0]
-    deltaf = mat_dict['deltaf'][0][0]
+    # get average of daily psdsum files (daily plot jobs hold decimated traces, not whole PSDs)
+    total, jobs = None, []
+    for f in mat_files:
+        pa = PsdAccumulator.load_psdsum_matfile(f)
+        jobs.append(psd_plot_job(f.replace('psdsum.mat', 'psdavg.pdf'), pa.spectral_avg(), pa.f[1], sensor, fs,
+                                 location, nfft, axs='xyz', xlim=xlim, ylim=ylim))
+        total = pa if total is None else total.merge(pa)  # raises if psdsum format versions differ
 
-    plot_psd_xyz(mat_files[0].replace('psdsum.mat', 'psdavg.pdf'), psd_sum / psd_count, deltaf, sensor, fs, fc,
-                 location, nfft, axs='xyz',
-                 xlim=xlim, ylim=ylim)
+    psd_xyzv, deltaf = total.spectral_avg(), total.f[1]
+    jobs.append(psd_plot_job(pdf_file, psd_xyzv, deltaf, sensor, fs, location, nfft, axs=axs, xlim=xlim, ylim=ylim))
+    render_psd_plots(jobs, workers=workers)
 
-    # print psd_count,
-    # print psd_sum[3][1],
-    for f in mat_files[1:]:
-        m = loadmat(f)
-        this_psd, this_count = m['psd'], m['count'][0][0]
-        psd_sum += this_psd
-        psd_count += this_count
-        plot_psd_xyz(f.replace('psdsum.mat', 'psdavg.pdf'), this_psd / this_count, deltaf, sensor, fs, fc, location,
-                     nfft, axs='xyz',
-                     xlim=xlim, ylim=ylim)
-        # print psd_count,
-        # print psd_sum[3][1],
+def spec_avg_store_plot(store, sensor, location, dr, nfft, fs, fc, out_dir=DEFAULT_OUTDIR, axs='xyz', xlim=[0, 200],
+                        ylim=[1e-14, 1e-2], noverlap=None, detrend='constant', workers=None):
+    """plot daily and ensemble PSDs for days in date range dr from PsdStore (ensemble is one sliced sum)"""
+    fs_str = str(fs).replace('.', 'p')
+    day_start, day_stop = dr[0], dr[-1]
+    days = store.days(sensor, day_start, day_stop, fs, nfft, noverlap=noverlap, detrend=detrend)
+
+    # verify we have min pct of days to be worth plot effort
+    pct_files = 100.0 * len(days) / len(dr)
+    if pct_files >= DEFAULT_PLOTRANGEPCT:
+        print 'got %.1f%% of days (more than %.1f%% min), so proceed' % (pct_files, DEFAULT_PLOTRANGEPCT)
+    else:
+        print 'did NOT get %.1f%% of days expecting (only got %.1f%%), so abort' % (DEFAULT_PLOTRANGEPCT, pct_files)
+        return
 
-    # print psd_sum[3][1] / psd_count
+    # daily plots
+    jobs = []
+    for d in days:
+        pa = store.get(sensor, d, fs, nfft, noverlap=noverlap, detrend=detrend)
+        ym_path = os.path.dirname(datetime_to_ymd_path(d, base_dir=out_dir))
+        if not os.path.exists(ym_path):
+            os.makedirs(ym_path)
+        pdf_bname = '%4d-%02d-%02d_%s_%s_%d_psdavg.pdf' % (d.year, d.month, d.day, sensor, fs_str, nfft)
+        jobs.append(psd_plot_job(os.path.join(ym_path, pdf_bname), pa.spectral_avg(), pa.f[1], sensor, fs, location,
+                                 nfft, axs='xyz', xlim=xlim, ylim=ylim))
 
-    psd_xyzv = psd_sum / psd_count
-    plot_psd_xyz(pdf_file, psd_xyzv, deltaf, sensor, fs, fc, location, nfft, axs=axs, xlim=xlim, ylim=ylim)
+    # ensemble plot
+    pa = store.sum_range(sensor, day_start, day_stop, fs, nfft, noverlap=noverlap, detrend=detrend)
+    pdf_bname = '%4d-%02d-%02d_%4d-%02d-%02d_%s_%s_%d_psdavg.pdf' % (day_start.year, day_start.month, day_start.day,
+                                                                     day_stop.year, day_stop.month, day_stop.day,
+                                                                     sensor, fs_str, nfft)
+    ym_path = os.path.dirname(datetime_to_ymd_path(day_start, base_dir=out_dir))
+    if not os.path.exists(ym_path):
+        os.makedirs(ym_path)
+    jobs.append(psd_plot_job(os.path.join(ym_path, pdf_bname), pa.spectral_avg(), pa.f[1], sensor, fs, location, nfft,
+                             axs=axs, xlim=xlim, ylim=ylim))
+    render_psd_plots(jobs, workers=workers)
 
 
 if __name__ == "__main__":
@@ -125,4 +252,5 @@ if __name__ == "__main__":
                                  axs='xyz',
                                  xlim=[0.0, 3.0],
                                  ylim=[1e-14, 1e-2],
+                                 workers=4,
                                  )
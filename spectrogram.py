@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+"""Spectrograms (PSD vs. time) built one time slice at a time and kept in an append-only store on disk.
+
+Each time slice (one PAD file, or a fixed span like an hour) gets its own average PSD for x, y, z and RSS(x,y,z), which
+becomes one row of a (time, frequency, axis) float32 array in the store.  Rows are appended to a raw binary file (like
+PAD data), so days or weeks of slices never need to be in memory, and images are rendered from a memory map of the
+store, decimated a block of rows at a time.
+"""
+
+import os
+import datetime
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from collections import namedtuple
+from scipy.io import savemat, loadmat
+
+from ugaudio.load import padmap
+from ugaudio.psd import psd_engine
+from ugaudio.spectral_average_calc import PsdAccumulator
+from pims.utils.pimsdateutil import pad_fullfilestr_to_start_stop
+
+# one time slice of a spectrogram: start & stop (datetimes) and accumulator with its PSD sum
+PsdSlice = namedtuple('PsdSlice', ['start', 'stop', 'pa'])
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _epoch_seconds(t):
+    """return seconds since epoch for datetime t"""
+    return (t - _EPOCH).total_seconds()
+
+
+def _from_epoch(sec):
+    """return datetime for seconds since epoch"""
+    return _EPOCH + datetime.timedelta(seconds=float(sec))
+
+
+def _slice_pieces(fname, nrows, fs, slice_seconds):
+    """yield (slice start, row1, row2, data stop) for rows of PAD file in each fixed-length time slice
+
+    Times are epoch seconds; data stop is the time just after row2 - 1, so less than slice end if the file ends first.
+    """
+    t0 = _epoch_seconds(pad_fullfilestr_to_start_stop(fname)[0])
+    i = 0
+    while i < nrows:
+        k = np.floor((t0 + i / fs) / slice_seconds)
+        # first row at or after next slice boundary (tiny tolerance for float round-off)
+        i2 = int(np.ceil(((k + 1) * slice_seconds - t0) * fs - 1e-6))
+        i2 = min(max(i2, i + 1), nrows)
+        yield k * slice_seconds, i, i2, t0 + i2 / fs
+        i = i2
+
+
+def _time_edges(starts, stops):
+    """return (edges, rows) for image blocks with start & stop times (numbers), with a blank row (None) for each gap
+
+    Edges go up by block, so a block that starts before the previous one stops is drawn from that stop.
+    """
+    edges, rows = [starts[0]], []
+    for r in xrange(len(starts)):
+        if starts[r] > edges[-1]:
+            edges.append(starts[r])
+            rows.append(None)  # gap between blocks
+        edges.append(max(stops[r], edges[-1]))
+        rows.append(r)
+    return np.array(edges), rows
+
+
+def iter_psd_slices(pad_files, fs, nfft, slice_seconds=None, noverlap=None, detrend='constant'):
+    """yield PsdSlice for each time slice of (chronological) pad_files; one per file if slice_seconds is None
+
+    Segments do not span file boundaries (files may have gaps between them), and with slice_seconds they do not span
+    slice boundaries either.  Slices without even one full segment are not yielded.  A slice stops where its data
+    does, so a slice only partly filled (so far) by pad_files stops before the end of its span.
+    """
+    cur_key, cur = None, None
+    for fname in pad_files:
+        m = padmap(fname)
+        if slice_seconds is None:
+            fstart, fstop = pad_fullfilestr_to_start_stop(fname)
+            pieces = [(fname, 0, m.shape[0], None)]
+        else:
+            pieces = _slice_pieces(fname, m.shape[0], fs, slice_seconds)
+        for key, i1, i2, data_stop in pieces:
+            if key != cur_key:
+                if cur is not None and cur.pa.count:
+                    yield cur
+                pa = PsdAccumulator(fs, nperseg=nfft, noverlap=noverlap, detrend=detrend)
+                if slice_seconds is None:
+                    cur = PsdSlice(fstart, fstop, pa)
+                else:
+                    cur = PsdSlice(_from_epoch(key), None, pa)
+                cur_key = key
+            if slice_seconds is not None:
+                cur = cur._replace(stop=_from_epoch(min(data_stop, key + slice_seconds)))
+            cur.pa.append(m[i1:i2])
+            cur.pa.break_tail()  # segments do not span file (or slice) boundaries
+            cur.pa.add_source(fname)
+        del m
+    if cur is not None and cur.pa.count:
+        yield cur
+
+
+class SpectrogramStore(object):
+    """A class for an append-only, on-disk spectrogram (one average PSD row per time slice).
+
+    The store is a directory with
+    - meta.mat   = fs, nfft, noverlap & detrend (all rows share them)
+    - psd.f32    = raw float32 rows, each nfreq x 4 (x, y, z & RSS columns)
+    - slices.f64 = raw float64 rows of (start, stop, num segments), times in
+                   seconds since 1970-01-01
+
+    Use append to add slices (in time order), psd_map and slice_map for
+    read-only memory maps, and render to plot a decimated image.
+
+    """
+
+    def __init__(self, store_dir, fs=None, nfft=None, noverlap=None, detrend='constant'):
+        self.store_dir = store_dir
+        self._meta_file = os.path.join(store_dir, 'meta.mat')
+        self._psd_file = os.path.join(store_dir, 'psd.f32')
+        self._slices_file = os.path.join(store_dir, 'slices.f64')
+        if os.path.exists(self._meta_file):
+            m = loadmat(self._meta_file)
+            self.fs, self.nfft = float(m['fs'][0][0]), int(m['nfft'][0][0])
+            self.noverlap, self.detrend = int(m['noverlap'][0][0]), str(m['detrend'][0])
+            if self.detrend == 'none':
+                self.detrend = False
+            if fs is not None and (fs, nfft) != (self.fs, self.nfft):
+                raise ValueError('store %s has fs = %s, nfft = %d (not %s, %s)' % (store_dir, self.fs, self.nfft,
+                                                                                 fs, nfft))
+        else:
+            if fs is None or nfft is None:
+                raise ValueError('new store %s needs fs and nfft' % store_dir)
+            self.fs, self.nfft, self.detrend = float(fs), nfft, detrend
+            self.noverlap = nfft // 2 if noverlap is None else noverlap
+            if not os.path.exists(store_dir):
+                os.makedirs(store_dir)
+            savemat(self._meta_file, {'fs': self.fs, 'nfft': self.nfft, 'noverlap': self.noverlap,
+                                      'detrend': self.detrend or 'none'}, appendmat=False)
+        self.freqs = psd_engine(self.fs, self.nfft, noverlap=self.noverlap, detrend=self.detrend).freqs
+
+    def __str__(self):
+        """str(self)"""
+        return '%s (%d slices, %d freqs)' % (self.store_dir, self.num_slices, self.freqs.size)
+
+    @property
+    def num_slices(self):
+        """number of complete slices in store (a partly written last row, if any, is ignored)"""
+        if not os.path.exists(self._slices_file):
+            return 0
+        n_slices = os.path.getsize(self._slices_file) // (3 * 8)
+        n_psd = os.path.getsize(self._psd_file) // (self.freqs.size * 4 * 4)
+        return min(n_slices, n_psd)
+
+    def last_slice(self):
+        """return (start, stop) datetimes of last slice in store, or None if store is empty"""
+        n = self.num_slices
+        if n == 0:
+            return None
+        start, stop = self.slice_map()[n - 1, :2]
+        return _from_epoch(start), _from_epoch(stop)
+
+    def last_stop(self):
+        """return stop time (datetime) of last slice in store, or None if store is empty"""
+        last = self.last_slice()
+        return None if last is None else last[1]
+
+    def append(self, psd_slice, replace_last=False):
+        """append PsdSlice (its average PSD) as next row of store, or put it in place of last row if replace_last"""
+        pa = psd_slice.pa
+        if (pa.fs, pa.nperseg, pa.noverlap, pa.detrend) != (self.fs, self.nfft, self.noverlap, self.detrend):
+            raise ValueError('slice PSD parameters %s do not match store' % (pa.params(),))
+        n = self.num_slices
+        if replace_last:
+            if n == 0:
+                raise ValueError('no last slice to replace in store %s' % self.store_dir)
+            n -= 1
+        row = np.array([_epoch_seconds(psd_slice.start), _epoch_seconds(psd_slice.stop), pa.count])
+        # truncate slice row first (so a replaced row is never counted half written), then data row before slice row
+        for fname, nbytes in [(self._slices_file, n * 3 * 8), (self._psd_file, n * self.freqs.size * 4 * 4)]:
+            with open(fname, 'ab') as f:
+                f.truncate(nbytes)
+        with open(self._psd_file, 'ab') as f:
+            pa.spectral_avg().astype(np.float32).tofile(f)
+        with open(self._slices_file, 'ab') as f:
+            row.tofile(f)
+
+    def slice_map(self):
+        """return read-only (num_slices, 3) memory map of slice start, stop & num segments"""
+        return np.memmap(self._slices_file, dtype=np.float64, mode='r', shape=(self.num_slices, 3))
+
+    def psd_map(self):
+        """return read-only (num_slices, nfreq, 4) memory map of slice PSDs"""
+        return np.memmap(self._psd_file, dtype=np.float32, mode='r', shape=(self.num_slices, self.freqs.size, 4))
+
+    def decimated(self, column=3, max_times=1000, max_freqs=1000, fmin=None, fmax=None):
+        """return (starts, stops, freqs, image) with image of column averaged down to at most max_times by max_freqs
+
+        Image rows are blocks of slices (read one block at a time from the memory map) and columns are groups of
+        frequency bins from fmin to fmax.  Starts and stops are datetimes of first slice start and last slice stop for
+        each block.
+        """
+        n = self.num_slices
+        if n == 0:
+            raise ValueError('no slices in store %s' % self.store_dir)
+        f = self.freqs
+        j1 = 0 if fmin is None else np.searchsorted(f, fmin)
+        j2 = f.size if fmax is None else np.searchsorted(f, fmax, side='right')
+        if fmin is not None and fmax is not None and fmin > fmax:
+            raise ValueError('fmin = %g is greater than fmax = %g' % (fmin, fmax))
+        if j2 <= j1:
+            raise ValueError('no frequency bins from fmin = %s to fmax = %s (bins are %g to %g Hz)' % (fmin, fmax,
+                                                                                                     f[0], f[-1]))
+        tstep = -(-n // max_times)
+        fstep = -(-(j2 - j1) // max_freqs)
+        nf = (j2 - j1) // fstep
+        j2 = j1 + nf * fstep
+        m, s = self.psd_map(), self.slice_map()
+        image = np.empty((-(-n // tstep), nf), dtype=np.float32)
+        for r, i in enumerate(xrange(0, n, tstep)):
+            block = m[i:i + tstep, j1:j2, column].mean(axis=0)
+            image[r] = block.reshape((nf, fstep)).mean(axis=1)
+        starts = [_from_epoch(t) for t in s[::tstep, 0]]
+        stops = [_from_epoch(t) for t in s[tstep - 1::tstep, 1]]
+        if len(stops) < len(starts):
+            stops.append(_from_epoch(s[n - 1, 1]))  # last block is short
+        freqs = f[j1:j2].reshape((nf, fstep)).mean(axis=1)
+        del m, s
+        return starts, stops, freqs, image
+
+    def render(self, png_file, column=3, max_times=1000, max_freqs=1000, fmin=None, fmax=None, clim=None, title=None):
+        """save decimated spectrogram image (10*log10 of PSD) of column (0=x, 1=y, 2=z, 3=RSS) to png_file
+
+        Each block of slices is drawn from its real start to stop time, so gaps between slices are left blank.
+        """
+        starts, stops, freqs, image = self.decimated(column=column, max_times=max_times, max_freqs=max_freqs,
+                                                     fmin=fmin, fmax=fmax)
+        t, rows = _time_edges(mdates.date2num(starts), mdates.date2num(stops))
+        db = np.ma.masked_all((len(rows), freqs.size))
+        with np.errstate(divide='ignore'):
+            for i, r in enumerate(rows):
+                if r is not None:
+                    db[i] = 10.0 * np.log10(image[r])
+        w = freqs[1] - freqs[0] if freqs.size > 1 else self.freqs[1]
+        fig = plt.figure(figsize=(11, 8.5))
+        ax = fig.add_subplot(111)
+        im = ax.pcolormesh(t, np.r_[freqs - w / 2, freqs[-1] + w / 2], db.T)
+        if clim is not None:
+            im.set_clim(clim)
+        ax.xaxis_date()
+        fig.autofmt_xdate()
+        ax.set_xlabel('GMT')
+        ax.set_ylabel('Frequency [Hz]')
+        cb = fig.colorbar(im, ax=ax)
+        cb.set_label('PSD [dB re g**2/Hz]')
+        if title:
+            ax.set_title(title)
+        fig.savefig(png_file)
+        plt.close(fig)
+        return image.shape
+
+
+def build_spectrogram(pad_files, store, slice_seconds=None):
+    """append slices for (chronological) pad_files to SpectrogramStore, skipping time already in store; return count
+
+    The last slice in store may have been only partly filled by an earlier run, so it is computed again (from files
+    that reach into it) and replaced if it now has more data.  Count includes a replaced slice.
+    """
+    last = store.last_slice()
+    if last is not None:
+        last_start, last_stop = [_epoch_seconds(t) for t in last]
+        pad_files = [f for f in pad_files if _epoch_seconds(pad_fullfilestr_to_start_stop(f)[1]) > last_start]
+    count = 0
+    for psd_slice in iter_psd_slices(pad_files, store.fs, store.nfft, slice_seconds=slice_seconds,
+                                     noverlap=store.noverlap, detrend=store.detrend):
+        replace = False
+        if last is not None:
+            start, stop = _epoch_seconds(psd_slice.start), _epoch_seconds(psd_slice.stop)
+            if start < last_stop:
+                # tiny tolerance for float round-off of times in store
+                if abs(start - last_start) > 1e-3 or stop <= last_stop + 1e-3:
+                    continue  # slice in store already
+                replace = True  # last slice in store grew
+        store.append(psd_slice, replace_last=replace)
+        count += 1
+    return count
+
+
+if __name__ == '__main__':
+
+    import glob
+    pad_files = sorted(glob.glob('C:/temp/pad/year2020/month04/day18/sams2_accel_121f04/*121f04'))
+    store = SpectrogramStore('C:/temp/spgram/121f04', fs=500.0, nfft=4096)
+    print build_spectrogram(pad_files, store, slice_seconds=600), 'new slices'
+    print store
+    store.render('C:/temp/spgram/121f04.png', fmax=200.0, title='121f04 RSS(X,Y,Z)')
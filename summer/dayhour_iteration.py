@@ -1,87 +1,213 @@
 #!/usr/bin/env python
 
+"""Walk PAD data one hour at a time, forward or in reverse, across file boundaries and gaps.
+
+For each hour, the files that overlap it are kept in a deque.  Files stay in the deque as long as they can still overlap
+an hour to come, so a file that spans an hour boundary is used for both hours without reopening it, and only the rows
+for the hour get read from each file (see padread_window).  Each hour's data is a (v, x, y, z) array with one row for
+every sample time in the hour; rows with no data (gaps) are NaN.
+
+Hours are assembled in a background thread that runs a few hours ahead of the consumer, and the next day's files get
+listed at high noon, so by the time the walk crosses midnight the next day's file list and first hour are in hand.
+"""
+
+import sys
+import threading
 import numpy as np
 import pandas as pd
-from collections import deque
+from Queue import Queue, Empty, Full
+from collections import deque, namedtuple
 from dateutil import parser
 from dateutil.relativedelta import relativedelta
 
-
-# i4 = pd.Interval(0, 1, closed='both')
-# i5 = pd.Interval(1, 2, closed='left')
-# print(i4)
-# print(i5)
-# print(i4.overlaps(i5))
-# raise SystemExit
-
-# a = np.arange(12).reshape(3, 4)
-# min_values = np.nanmin(a, axis=0)
-# max_values = np.nanmax(a, axis=0)
-# std_values = np.nanstd(a, axis=0)
-#
-# min_str = '{:.2f},{:.2f},{:.2f}'.format(*min_values)
-# max_str = '{:.2f},{:.2f},{:.2f}'.format(*max_values)
-# std_str = '{:.2f},{:.2f},{:.2f}'.format(*std_values)
-# print('%s,%s,%s' % (min_str, max_str, std_str))
-#
-# raise SystemExit
-
-
-def simple_demo_fwd():
-
-    start_str = '2019-02-01'
-    stop_str = '2019-02-03'
-
-    # FIXME sort each day's files list before extending deque
-
-    # get files for all of start_str's PREVIOUS day
-    start_day = parser.parse(start_str).replace(hour=0, minute=0, second=0, microsecond=0)
-    prev_day = start_day - relativedelta(days=1)
-    print(prev_day.strftime('%Y-%m-%d'), '<< get prev_day files before iteration begins')
-
-    # get files for all of start_str's day
-    print(start_day.strftime('%Y-%m-%d'), '<< get start_day files before iteration begins')
-
-    # iterate from start_str's day/hour up to, but excluding stop_str's day/hour
-    dhr = pd.date_range(start_str, stop_str, freq='1H')
-    for dh in dhr[:-1]:
-
-        # if it's high noon, then get list of matching files for next day and extend deque
-        if dh.hour == 12:
-            next_day = dh.replace(hour=0) + relativedelta(days=1)
-            print(next_day.strftime('%Y-%m-%d'), '<< high noon, so extend deque with this next day files')
-
-        # iterate over deque, popping only files that overlap Interval from dh:dh+relativedelta(hours=1)
-        print(dh.strftime('%Y-%m-%d/%H'), 'extracted (v,x,y,z) data from files for this dh')
-
-
-def simple_demo_rev():
+from pims.utils.pimsdateutil import pad_fullfilestr_to_start_stop
+from ugaudio.load import padread_window
+from ugaudio.signal import demean_vecmag
+
+# one hour of data: hour start, (rows, 4) array of v, x, y, z (NaN in gaps) and number of rows with data
+HourData = namedtuple('HourData', ['dh', 'data', 'count'])
+
+_ONE_HOUR = relativedelta(hours=1)
+
+
+def hour_array(pieces, fs, mean=None):
+    """return (v, x, y, z) array for an hour from pieces, which is a list of (first row in hour, txyz rows)
+
+    Rows not covered by any piece are NaN.  The x, y and z columns are demeaned with the hour's own mean (over rows
+    with data), or with mean (xyz) if given, and the v column is vector magnitude.
+    """
+    nrows = int(round(3600 * fs))
+    a = np.empty((nrows, 4), dtype=np.float32)
+    a.fill(np.nan)
+    count = 0
+    for row, b in pieces:
+        n = min(b.shape[0], nrows - row)
+        if n <= 0:
+            continue
+        a[row:row + n, 1:4] = b[:n, 1:4]
+        count += n
+    xyz = a[:, 1:4]
+    if count:
+        if mean is None:
+            mean = np.nanmean(xyz, axis=0, dtype=np.float64)
+        demean_vecmag(xyz, out=a[:, 0], mean=mean)
+    return a, count
+
+
+class DayHourIterator(object):
+    """A class to iterate over hours of PAD data, yielding a HourData for each hour.
+
+    The day_files input is a callable that returns the list of PAD files for a
+    given day (e.g. a PadIndex select or a glob with filtering), all with
+    sample rate fs.  Hours start at start (floored to the hour) and go up to,
+    but do not include, stop; if reverse is True, they go from the last hour
+    down to the first.  Hours without any data are skipped unless skip_empty
+    is False.  Up to prefetch hours are assembled ahead of the consumer in a
+    background thread (zero does it all in the consumer's thread).
+
+    """
+
+    def __init__(self, day_files, start, stop, fs, reverse=False, skip_empty=True, prefetch=2, mean=None):
+        self.day_files = day_files
+        self.fs = fs
+        self.reverse = reverse
+        self.skip_empty = skip_empty
+        self.prefetch = prefetch
+        self.mean = mean
+        start = pd.Timestamp(start).floor('H').to_pydatetime()
+        stop = pd.Timestamp(stop).to_pydatetime()
+        self.hours = [dh.to_pydatetime() for dh in pd.date_range(start, stop, freq='1H', closed='left')]
+        if reverse:
+            self.hours.reverse()
+
+    def __str__(self):
+        """str(self)"""
+        if not self.hours:
+            return '%s (no hours)' % self.__class__.__name__
+        return '%s from %s to %s (%d hours, %s)' % (self.__class__.__name__, self.hours[0], self.hours[-1],
+                                                    len(self.hours), 'reverse' if self.reverse else 'forward')
+
+    def _walk(self):
+        """yield HourData for each hour in order (in caller's thread)"""
+        files = deque()  # (start, stop, filename), in the order the walk will need them
+        loaded = set()
+
+        def _extend(day):
+            # add day's files to deque once, in walk order
+            if day in loaded:
+                return
+            loaded.add(day)
+            spans = sorted([pad_fullfilestr_to_start_stop(f) + (f,) for f in self.day_files(day)],
+                           reverse=self.reverse)
+            files.extend(spans)
+
+        for dh in self.hours:
+            day = dh.date()
+
+            # files for hour can start on day before (or, walking in reverse, that day is the next one we need)
+            if self.reverse:
+                _extend(day)
+                _extend(day - relativedelta(days=1))
+            else:
+                _extend(day - relativedelta(days=1))
+                _extend(day)
+
+            # if it's high noon, then list the files the next day of the walk will need too
+            if dh.hour == 12:
+                _extend(day - relativedelta(days=2) if self.reverse else day + relativedelta(days=1))
+
+            # pop files that cannot overlap this hour (or any hour after it in the walk)
+            dh_upper = dh + _ONE_HOUR
+            while files and (files[0][0] >= dh_upper if self.reverse else files[0][1] <= dh):
+                files.popleft()
+
+            # read just the rows for this hour from each file that overlaps it
+            pieces = []
+            for fstart, fstop, fname in files:
+                if not self.reverse and fstart >= dh_upper:
+                    break  # sorted by start, so no more files overlap this hour
+                if fstart >= dh_upper or fstop <= dh:
+                    continue
+                b = padread_window(fname, self.fs, dh, dh_upper)
+                if b.shape[0]:
+                    # row in hour for first row read (file's first row, or first one at or after dh)
+                    offset = self.fs * (fstart - dh).total_seconds()
+                    i1 = max(int(np.ceil(-offset - 1e-6)), 0)
+                    pieces.append((int(round(offset + i1)), b))
+
+            a, count = hour_array(pieces, self.fs, mean=self.mean)
+            if count or not self.skip_empty:
+                yield HourData(dh, a, count)
+
+    def _produce(self, queue, done):
+        """put ('hour', HourData) items from walk on queue (in background thread); then ('end', exception info)"""
+        def _put(item):
+            # put item on queue, unless consumer is done; return False if it is
+            while not done.is_set():
+                try:
+                    queue.put(item, timeout=0.5)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        exc_info = None
+        try:
+            for hd in self._walk():
+                if not _put(('hour', hd)):
+                    return
+        except Exception:
+            exc_info = sys.exc_info()
+        _put(('end', exc_info))
+
+    def __iter__(self):
+        if not self.prefetch:
+            for hd in self._walk():
+                yield hd
+            return
+        queue = Queue(maxsize=self.prefetch)
+        done = threading.Event()
+        t = threading.Thread(target=self._produce, args=(queue, done))
+        t.daemon = True
+        t.start()
+        try:
+            while True:
+                kind, item = queue.get()
+                if kind == 'end':
+                    if item is not None:
+                        raise item[0], item[1], item[2]
+                    break
+                yield item
+        finally:
+            # let producer know consumer is done (e.g. it broke out early), then drain so it is not stuck on put
+            done.set()
+            try:
+                while True:
+                    queue.get_nowait()
+            except Empty:
+                pass
+            t.join()
+
+
+def simple_demo(reverse=False):
+
+    import glob
+    from pims.utils.pimsdateutil import datetime_to_ymd_path
 
     start_str = '2019-02-01'
     stop_str = '2019-02-03'
 
-    # FIXME reverse sort each day's files list before extending deque
-
-    # get files for all of stop_str's day
-    stop_day = parser.parse(stop_str).replace(hour=0, minute=0, second=0, microsecond=0)
-    prev_day = stop_day - relativedelta(days=1)
-    print(stop_day.strftime('%Y-%m-%d'), '<< get stop_day files before iteration begins')
-
-    # get files for all of start_str's day
-    print(prev_day.strftime('%Y-%m-%d'), '<< get prev_day files before iteration begins')
-
-    # iterate down from last dh of prev_day's day/hour down to, and including start_str's day/hour
-    dhr = pd.date_range(start_str, stop_str, freq='1H')[:-1]
-    for dh in dhr[::-1]:  # fancy indexing gets us the reversed chronological ordering
-
-        # if it's high noon, then get list of matching files for prior day and extend deque
-        if dh.hour == 12:
-            prior_day = dh.replace(hour=0) - relativedelta(days=1)
-            print(prior_day.strftime('%Y-%m-%d'), '<< high noon, so extend deque with prior day files')
+    def day_files(day):
+        ymd_dir = datetime_to_ymd_path(day, base_dir='/misc/yoda/pub/pad')
+        return glob.glob('%s/*_accel_121f03/*121f03' % ymd_dir)
 
-        # iterate over deque, popping only files that overlap Interval from dh:dh+relativedelta(hours=1)
-        print(dh.strftime('%Y-%m-%d/%H'), 'extracted (v,x,y,z) data from files for this dh')
+    dhi = DayHourIterator(day_files, parser.parse(start_str), parser.parse(stop_str), 500.0, reverse=reverse)
+    print(str(dhi))
+    for hd in dhi:
+        v = hd.data[:, 0]
+        print('%s %7d rows, vecmag rms %.3e' % (hd.dh.strftime('%Y-%m-%d/%H'), hd.count,
+                                                np.sqrt(np.nanmean(v ** 2))))
 
 
 if __name__ == '__main__':
-    simple_demo_rev()
+    simple_demo(reverse=True)
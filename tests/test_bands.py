@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+import os
+import time
+import shutil
+import unittest
+import tempfile
+import numpy as np
+from ugaudio.spectral_average_calc import PsdAccumulator
+from ugaudio.bands import band_edges, band_power, BandSpectrum, psdsum_bands, band_filename
+
+class BandsTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.bands.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        np.random.seed(9)
+        self.deltaf = 500.0 / 4096
+        self.psd = 10.0 ** np.random.uniform(-10, -8, (2049, 4))
+
+    def test_band_edges(self):
+        """
+        Test octave and third-octave bands are contiguous with nominal centers.
+        """
+        centers, lo, hi = band_edges(1.0, 1000.0, kind='third')
+        self.assertEqual(centers.size, 31)
+        np.testing.assert_allclose(centers[[0, 10, 30]], [1.0, 10.0, 1000.0])
+        np.testing.assert_allclose(lo[1:], hi[:-1])
+        np.testing.assert_allclose(hi / lo, 10.0 ** 0.1)
+        centers, lo, hi = band_edges(1.0, 1000.0, kind='octave')
+        self.assertEqual(centers.size, 11)
+        np.testing.assert_allclose(hi / lo, 10.0 ** 0.3)
+        self.assertRaises(ValueError, band_edges, 1.0, 10.0, kind='log')
+
+    def test_band_power(self):
+        """
+        Test band powers add up to integral of PSD and flat PSD stays flat.
+        """
+        n = self.psd.shape[0]
+        power = band_power(self.psd, self.deltaf, np.array([-0.5 * self.deltaf]), np.array([(n - 0.5) * self.deltaf]))
+        np.testing.assert_allclose(power[0], self.psd.sum(axis=0) * self.deltaf, rtol=1e-12)
+        bs = BandSpectrum(self.psd, self.deltaf)
+        np.testing.assert_allclose((bs.grms ** 2).sum(axis=0),
+                                   band_power(self.psd, self.deltaf, bs.lo[:1], bs.hi[-1:])[0], rtol=1e-12)
+        bs = BandSpectrum(np.ones((n, 4)) * 1e-9, self.deltaf, kind='log', bands_per_decade=20)
+        np.testing.assert_allclose(bs.psd, 1e-9, rtol=1e-9)
+        self.assertTrue(bs.centers[0] >= self.deltaf and bs.centers[-1] <= 250.0)
+
+    def test_psdsum_bands(self):
+        """
+        Test band products for psdsum file get cached next to it and reused.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        pa = PsdAccumulator(500.0, nperseg=256)
+        pa.append(np.random.randn(5000, 4))
+        psdsum_file = os.path.join(tmp_dir, '2020-04-14_121f08_500p0_256_psdsum.mat')
+        pa.save_psdsum_matfile(psdsum_file)
+
+        bs = psdsum_bands(psdsum_file, kind='octave')
+        band_file = band_filename(psdsum_file, kind='octave')
+        self.assertTrue(band_file.endswith('2020-04-14_121f08_500p0_256_octave_bands.mat'))
+        mtime = os.path.getmtime(band_file)
+        time.sleep(0.01)
+        cached = psdsum_bands(psdsum_file, kind='octave')
+        self.assertEqual(os.path.getmtime(band_file), mtime)
+        self.assertEqual((cached.kind, cached.count), ('octave', pa.count))
+        np.testing.assert_allclose(cached.psd, bs.psd, rtol=1e-12)
+        np.testing.assert_allclose(cached.total_grms(), bs.total_grms(), rtol=1e-12)
+
+        # RSS column grms is from sum of x, y & z band powers
+        np.testing.assert_allclose(bs.grms[:, 3] ** 2, (bs.grms[:, 0:3] ** 2).sum(axis=1), rtol=1e-12)
+
+        # psdsum file rewritten with same mtime (coarse filesystem) still gets new bands
+        st = os.stat(psdsum_file)
+        pa.append(np.random.randn(5000, 4))
+        pa.save_psdsum_matfile(psdsum_file)
+        os.utime(psdsum_file, (st.st_atime, st.st_mtime))
+        os.utime(band_file, (st.st_atime, st.st_mtime + 10))
+        self.assertEqual(psdsum_bands(psdsum_file, kind='octave').count, pa.count)
+        self.assertEqual(BandSpectrum.load(band_file).count, pa.count)
+
+        csv_file = os.path.join(tmp_dir, 'bands.csv')
+        bs.save_csv(csv_file)
+        table = np.loadtxt(csv_file, delimiter=',', skiprows=1)
+        self.assertEqual(table.shape, (bs.centers.size, 11))
+        shutil.rmtree(tmp_dir)
+
+def suite():
+    return unittest.makeSuite(BandsTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
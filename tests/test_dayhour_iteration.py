@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import datetime
+import unittest
+import tempfile
+import numpy as np
+from ugaudio.create import padwrite
+from ugaudio.summer.dayhour_iteration import DayHourIterator
+
+class DayHourIterationTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.summer.dayhour_iteration.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        # at 1 sa/sec: file spanning top of hour 1, another in middle of hour 1, and one on next day
+        self.tmp_dir = tempfile.mkdtemp()
+        self.day_files = {}
+        for b, n in [('2020_04_18_00_59_00.000+2020_04_18_01_01_00.000.121f02', 120),
+                     ('2020_04_18_01_30_00.000+2020_04_18_01_31_00.000.121f02', 60),
+                     ('2020_04_19_00_00_00.000+2020_04_19_00_01_00.000.121f02', 60)]:
+            fname = os.path.join(self.tmp_dir, b)
+            x = np.arange(n, dtype=np.float32)
+            padwrite(x, 2 * x, 3 * x, 1.0, fname)
+            day = datetime.date(int(b[0:4]), int(b[5:7]), int(b[8:10]))
+            self.day_files.setdefault(day, []).append(fname)
+
+    def tearDown(self):
+        """
+        Clean up after tests.
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def _hours(self, **kwargs):
+        dhi = DayHourIterator(lambda day: self.day_files.get(day, []), datetime.datetime(2020, 4, 18),
+                              datetime.datetime(2020, 4, 19, 2), 1.0, mean=[0, 0, 0], **kwargs)
+        return list(dhi)
+
+    def test_forward(self):
+        """
+        Test hours in forward order, across file boundary and with gaps.
+        """
+        hours = self._hours()
+        self.assertEqual([hd.dh for hd in hours], [datetime.datetime(2020, 4, 18, 0), datetime.datetime(2020, 4, 18, 1),
+                                                   datetime.datetime(2020, 4, 19, 0)])
+        self.assertEqual([hd.count for hd in hours], [60, 120, 60])
+
+        # first file's rows are split across hours 0 and 1
+        a0, a1 = hours[0].data, hours[1].data
+        self.assertEqual(a0.shape, (3600, 4))
+        np.testing.assert_array_equal(a0[3540:, 1], np.arange(60))
+        np.testing.assert_array_equal(a1[0:60, 1], np.arange(60, 120))
+        np.testing.assert_array_equal(a1[1800:1860, 3], 3 * np.arange(60))
+        np.testing.assert_allclose(a1[0:60, 0], np.sqrt(14) * np.arange(60, 120), rtol=1e-6)
+
+        # gaps are NaN
+        self.assertTrue(np.all(np.isnan(a0[0:3540])))
+        self.assertTrue(np.all(np.isnan(a1[60:1800])))
+        self.assertTrue(np.all(np.isnan(a1[1860:])))
+
+    def test_reverse_and_no_prefetch(self):
+        """
+        Test hours in reverse order match forward ones, with or without prefetch thread.
+        """
+        forward = self._hours(prefetch=0)
+        reverse = self._hours(reverse=True)
+        self.assertEqual([hd.dh for hd in reverse], [hd.dh for hd in forward][::-1])
+        for f, r in zip(forward, reverse[::-1]):
+            np.testing.assert_array_equal(f.data, r.data)
+
+        # empty hours too, if asked for
+        self.assertEqual(len(self._hours(skip_empty=False)), 26)
+
+def suite():
+    return unittest.makeSuite(DayHourIterationTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
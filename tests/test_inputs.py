@@ -4,7 +4,7 @@ import os
 import sys
 import unittest
 import tempfile
-from ugaudio.inputs import parse_args
+from ugaudio.inputs import parse_args, parse_inputs
 
 class InputsTestCase(unittest.TestCase):
     """
@@ -102,6 +102,33 @@ class InputsTestCase(unittest.TestCase):
                     self.assertEqual(taper, t)
                     self.assertEqual(len(files), 1)    
 
+    def test_jobs(self):
+        """
+        Test jobs (number of worker processes) argument.
+        """
+        # default is one file at a time
+        sys.argv[1:] = [self.filename]
+        args = parse_inputs()
+        self.assertEqual(args.j, 1)
+
+        # more than one at a time
+        sys.argv[1:] = ['-j', '4', self.filename, self.filename]
+        args = parse_inputs()
+        self.assertEqual(args.j, 4)
+        self.assertEqual(len(args.files), 2)
+
+        # zero workers is not valid
+        with open(os.devnull, 'wb') as null:
+            _stderr, _stdout = sys.stderr, sys.stdout
+            sys.stdout = sys.stderr = null
+            try:
+                with self.assertRaises(SystemExit) as cm:
+                    sys.argv[1:] = ['-j', '0', self.filename]
+                    parse_inputs()
+                self.assertEqual(cm.exception.code, 1)
+            finally:
+                sys.stderr, sys.stdout = _stderr, _stdout
+
 def suite():
     return unittest.makeSuite(InputsTestCase, 'test')
 
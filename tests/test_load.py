@@ -1,12 +1,16 @@
 #!/usr/bin/env python
 
 import os
+import shutil
+import datetime
 import unittest
 import tempfile
 import numpy as np
 from ugaudio.pad import PadFile
-from ugaudio.load import padread, aiffread
-from ugaudio.create import AlternateIntegers, padwrite
+from ugaudio.load import padread, padmap, iter_pad_chunks, aiffread, aiffmap, iter_aiff_chunks
+from ugaudio.load import padread_window, padread_hourpart, build_day_array
+from ugaudio.write import audiowrite
+from ugaudio.create import AlternateIntegers, padwrite, write_rogue_pad_file
 
 # Test suite for ugaudio.create.
 class LoadTestCase(unittest.TestCase):
@@ -46,6 +50,128 @@ class LoadTestCase(unittest.TestCase):
                                         1.06823947e-02, -4.05408442e-03],
                                         decimal=6) 
 
+    def test_padmap(self):
+        """
+        Test padmap function gives read-only view with same values as padread.
+        """
+        rogue_file_object = tempfile.NamedTemporaryFile(delete=False)
+        rogue_filename = rogue_file_object.name
+        write_rogue_pad_file(rogue_filename)
+        rogue_file_object.close()
+
+        arr = padmap(rogue_filename)
+        
+        # verify shape and values match what padread gives
+        self.assertEqual(arr.shape, (9, 4))
+        np.testing.assert_array_equal(arr, padread(rogue_filename))
+        
+        # verify we cannot write to it
+        with self.assertRaises(ValueError):
+            arr[0, 1] = 0.0
+
+        del arr
+
+        # empty file gives no rows, a partial row is an error
+        with open(rogue_filename, 'wb') as f:
+            pass
+        self.assertEqual(padmap(rogue_filename).shape, (0, 4))
+        with open(rogue_filename, 'wb') as f:
+            np.zeros(6, dtype=np.float32).tofile(f)
+        with self.assertRaises(ValueError):
+            padmap(rogue_filename)
+        os.remove(rogue_filename)
+
+    def test_iter_pad_chunks(self):
+        """
+        Test iter_pad_chunks function across file boundaries and gaps.
+        """
+        # three 9-row files, the last one after a 1-minute gap
+        tmp_dir = tempfile.mkdtemp()
+        fnames = [os.path.join(tmp_dir, b) for b in [
+            '2020_04_18_00_00_00.000+2020_04_18_00_00_09.000.121f02',
+            '2020_04_18_00_00_09.000+2020_04_18_00_00_18.000.121f02',
+            '2020_04_18_00_01_18.000+2020_04_18_00_01_27.000.121f02']]
+        for f in fnames:
+            write_rogue_pad_file(f)
+        rogue = padread(fnames[0])
+
+        # without max_gap, it's just one long run of 27 rows
+        chunks = list(iter_pad_chunks(fnames, 5, overlap_rows=1))
+        self.assertEqual([c.data.shape[0] for c in chunks], [5, 5, 5, 5, 5, 5, 3])
+        self.assertEqual([c.new_run for c in chunks], [True] + [False] * 6)
+        np.testing.assert_array_equal(chunks[1].data[0], chunks[0].data[-1])
+        np.testing.assert_array_equal(np.vstack([chunks[0].data] + [c.data[1:] for c in chunks[1:]]),
+                                      np.vstack([rogue] * 3))
+
+        # 2nd & 3rd chunks start in 1st file, 4th chunk starts in 2nd file
+        self.assertEqual((chunks[1].filename, chunks[1].row), (fnames[0], 4))
+        self.assertEqual((chunks[2].filename, chunks[2].row), (fnames[0], 8))
+        self.assertEqual((chunks[3].filename, chunks[3].row), (fnames[1], 3))
+
+        # with max_gap, the 3rd file starts a new run
+        chunks = list(iter_pad_chunks(fnames, 5, overlap_rows=1, fs=1.0, max_gap=1.0))
+        self.assertEqual([c.data.shape[0] for c in chunks], [5, 5, 5, 5, 2, 5, 5])
+        self.assertEqual([c.new_run for c in chunks], [True, False, False, False, False, True, False])
+        self.assertEqual(chunks[5].filename, fnames[2])
+        self.assertEqual(chunks[5].start, datetime.datetime(2020, 4, 18, 0, 1, 18))
+        self.assertEqual(chunks[3].start, datetime.datetime(2020, 4, 18, 0, 0, 12))
+
+        shutil.rmtree(tmp_dir)
+
+    def test_padread_window(self):
+        """
+        Test padread_window and padread_hourpart functions.
+        """
+        # 9-row file at 1 sa/sec that starts 4 seconds before the hour
+        tmp_dir = tempfile.mkdtemp()
+        fname = os.path.join(tmp_dir, '2020_04_18_00_59_56.000+2020_04_18_01_00_05.000.121f02')
+        write_rogue_pad_file(fname)
+        rogue = padread(fname)
+        t0 = datetime.datetime(2020, 4, 18, 0, 59, 56)
+        sec = datetime.timedelta(seconds=1)
+
+        # window in middle, and windows hanging off either end of file
+        np.testing.assert_array_equal(padread_window(fname, 1.0, t0 + 2 * sec, t0 + 5 * sec), rogue[2:5])
+        np.testing.assert_array_equal(padread_window(fname, 1.0, t0 - 9 * sec, t0 + 3 * sec), rogue[0:3])
+        np.testing.assert_array_equal(padread_window(fname, 1.0, t0 + 7 * sec, t0 + 99 * sec), rogue[7:])
+        self.assertEqual(padread_window(fname, 1.0, t0 + 20 * sec, t0 + 30 * sec).shape, (0, 4))
+
+        # hour part is last 5 rows, demeaned with their own mean and vecmag in 1st column
+        hour = padread_hourpart(fname, 1.0, datetime.datetime(2020, 4, 18, 1, 0, 0))
+        xyz = rogue[4:, 1:4] - rogue[4:, 1:4].mean(axis=0)
+        np.testing.assert_allclose(hour[:, 1:4], xyz, atol=1e-5)
+        np.testing.assert_allclose(hour[:, 0], np.sqrt((xyz ** 2).sum(axis=1)), atol=1e-5)
+
+        # previous hour is first 4 rows
+        hour = padread_hourpart(fname, 1.0, datetime.datetime(2020, 4, 18, 0, 0, 0), mean=[0, 0, 0])
+        np.testing.assert_array_equal(hour[:, 1:4], rogue[0:4, 1:4])
+        shutil.rmtree(tmp_dir)
+
+    def test_build_day_array(self):
+        """
+        Test build_day_array function, in memory and memory-mapped.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        fnames = [os.path.join(tmp_dir, 'test%d.pad' % i) for i in range(3)]
+        for i, f in enumerate(fnames):
+            x = np.arange(10 * (i + 1), dtype=np.float32)
+            padwrite(x, 2 * x + i, -x, 1.0, f)
+        for mmap_file in [None, os.path.join(tmp_dir, 'day.f32')]:
+            arr = build_day_array(fnames, mmap_file=mmap_file)
+            self.assertEqual(arr.shape, (60, 5))
+            self.assertEqual(arr.dtype, np.float32)
+            r = 0
+            for f in fnames:
+                b = padread(f)
+                n = b.shape[0]
+                xyz = b[:, 1:4] - b[:, 1:4].mean(axis=0)
+                np.testing.assert_array_equal(arr[r:r + n, 0], b[:, 0])
+                np.testing.assert_allclose(arr[r:r + n, 1:4], xyz, atol=1e-5)
+                np.testing.assert_allclose(arr[r:r + n, 4], np.sqrt((xyz ** 2).sum(axis=1)), atol=1e-5)
+                r += n
+            del arr
+        shutil.rmtree(tmp_dir)
+
     def test_aiffread(self):
         """
         Test aiffread function.
@@ -66,6 +192,34 @@ class LoadTestCase(unittest.TestCase):
         np.testing.assert_array_equal(arr[0:3], [-323, -147,  328])  
         np.testing.assert_array_equal(arr[-3:], [  18, 1033, 3690]) 
 
+    def test_aiffmap(self):
+        """
+        Test aiffmap and iter_aiff_chunks functions with AIFF & AIFC, mono & multichannel files.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        frames = np.arange(-300, 300, dtype=np.int16).reshape((-1, 3)) * 100
+        for ext in ['.aiff', '.aifc']:
+            for x in [frames, frames[:, 0]]:
+                aiff_file = os.path.join(tmp_dir, 'test' + ext)
+                audiowrite(aiff_file, x, 1234.0)
+                
+                # zero-copy, read-only map has frames as rows
+                m, params = aiffmap(aiff_file)
+                self.assertEqual(m.shape, x.shape)
+                self.assertEqual(params[2], 1234.0)
+                np.testing.assert_array_equal(m, x)
+                with self.assertRaises(ValueError):
+                    m[0] = 0
+                del m
+                
+                # chunks put back together match, and so does aiffread (flat)
+                chunks = list(iter_aiff_chunks(aiff_file, chunk_frames=64))
+                self.assertEqual([len(c) for c in chunks], [64, 64, 64, 8])
+                np.testing.assert_array_equal(np.concatenate(chunks), x)
+                arr, params = aiffread(aiff_file)
+                np.testing.assert_array_equal(arr, x.ravel())
+        shutil.rmtree(tmp_dir)
+
 def suite():
     return unittest.makeSuite(LoadTestCase, 'test')
 
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import unittest
+import tempfile
+import numpy as np
+from ugaudio.create import padwrite
+from ugaudio.loghist import LogHistogram, pad_file_vecmag_hist, vecmag_hist
+
+class LogHistogramTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.loghist.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        np.random.seed(42)
+        self.values = 10.0 ** np.random.uniform(-6, -1, 100000)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """
+        Clean up after tests.
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def test_percentiles(self):
+        """
+        Test approximate percentiles are within a bin width of exact ones.
+        """
+        h = LogHistogram()
+        h.add(self.values)
+        self.assertEqual(h.count, len(self.values))
+        q = [0, 50, 95, 99.9, 100]
+        np.testing.assert_allclose(h.percentiles(q), np.percentile(self.values, q), rtol=0.012)
+
+        # out-of-range values & NaN's
+        h.add([0.0, 1.0e-9, 1.0e3, np.nan])
+        self.assertEqual(h.count, len(self.values) + 3)
+        self.assertEqual(h.counts[0], 2)
+        self.assertEqual(h.counts[-1], 1)
+        self.assertTrue(np.all(np.isnan(LogHistogram().percentiles([50, 95]))))
+
+    def test_merge(self):
+        """
+        Test merged partials match one histogram of everything, and save/load.
+        """
+        whole = LogHistogram()
+        whole.add(self.values)
+        parts = [LogHistogram() for i in range(3)]
+        for i, part in enumerate(parts):
+            part.add(self.values[i::3])
+        merged = parts[0] + parts[1]
+        merged.merge(parts[2])
+        np.testing.assert_array_equal(merged.counts, whole.counts)
+        with self.assertRaises(ValueError):
+            merged.merge(LogHistogram(bins_per_decade=10))
+
+        mat_file = os.path.join(self.tmp_dir, 'hist.mat')
+        merged.save(mat_file)
+        np.testing.assert_array_equal(LogHistogram.load(mat_file).counts, whole.counts)
+
+    def test_vecmag_hist(self):
+        """
+        Test vecmag histogram over PAD files, with reused per-file partials.
+        """
+        pad_files = []
+        for i in range(2):
+            f = os.path.join(self.tmp_dir, 'test%d.pad' % i)
+            x = np.sin(np.arange(1000) * (i + 1) / 10.0)
+            padwrite(x, 0 * x, 0 * x, 100.0, f)
+            pad_files.append(f)
+        h0 = pad_file_vecmag_hist(pad_files[0], chunk_rows=99)
+        v = np.abs(np.sin(np.arange(1000) / 10.0) - np.sin(np.arange(1000) / 10.0).mean())
+        np.testing.assert_allclose(h0.percentiles([50, 95]), np.percentile(v, [50, 95]), rtol=0.012)
+
+        partial_dir = os.path.join(self.tmp_dir, 'partials')
+        os.mkdir(partial_dir)
+        h = vecmag_hist(pad_files, partial_dir=partial_dir)
+        self.assertEqual(h.count, 2000)
+        self.assertEqual(len(os.listdir(partial_dir)), 2)
+        np.testing.assert_array_equal(vecmag_hist(pad_files, partial_dir=partial_dir).counts, h.counts)
+
+        # other bins get their own partials (never the ones saved above)
+        h10 = vecmag_hist(pad_files, partial_dir=partial_dir, lo=1e-4, hi=1e1, bins_per_decade=10)
+        self.assertEqual((h10.count, h10.nbins), (2000, 50))
+        self.assertEqual(len(os.listdir(partial_dir)), 4)
+
+        # a PAD file rewritten (same size, older mtime) gets its partial computed again
+        padwrite(np.ones(1000), np.zeros(1000), np.zeros(1000), 100.0, pad_files[1])
+        os.utime(pad_files[1], (1000000000, 1000000000))
+        h = vecmag_hist(pad_files, partial_dir=partial_dir)
+        self.assertEqual(h.count, 2000)
+        np.testing.assert_array_equal(h.counts, h0.counts + pad_file_vecmag_hist(pad_files[1]).counts)
+
+def suite():
+    return unittest.makeSuite(LogHistogramTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
@@ -7,7 +7,8 @@ import numpy as np
 from numpy.testing import assert_array_equal
 import tempfile
 from ugaudio.create import write_chirp_pad, write_rogue_pad_file
-from ugaudio.pad import PadFile
+from ugaudio import pad
+from ugaudio.pad import PadFile, pad_stream_convert
 from ugaudio.load import aiffread
 
 class PadTestCase(unittest.TestCase):
@@ -82,6 +83,30 @@ class PadTestCase(unittest.TestCase):
         # test it's got dummy sample rate
         self.assertEqual( good_pad_file.samplerate, self.dummyrate )
 
+    def test_header_rate_cache(self):
+        """
+        Tests header sample rates are parsed again after a header changes, and the cache stays bounded.
+        """
+        # rewritten header (new mtime) gets parsed again, replacing its old entry
+        self.assertEqual( PadFile(self.pad_filename).samplerate, self.dummyrate )
+        with open(self.pad_header_filename, 'w') as hf:
+            hf.write("<SampleRate>500.0</SampleRate>")
+        mtime = int(os.path.getmtime(self.pad_header_filename)) + 10
+        os.utime(self.pad_header_filename, (mtime, mtime))
+        self.assertEqual( PadFile(self.pad_filename).samplerate, 500.0 )
+        self.assertEqual( pad._HEADER_RATES[self.pad_header_filename], (mtime, 500.0) )
+
+        # oldest entries get dropped past max entries
+        max_entries = pad._HEADER_RATES_MAX
+        pad._HEADER_RATES_MAX = 1
+        try:
+            pad._HEADER_RATES['other.header'] = (0.0, 1.0)
+            os.utime(self.pad_header_filename, (mtime + 1, mtime + 1))
+            self.assertEqual( PadFile(self.pad_filename).samplerate, 500.0 )
+            self.assertEqual( list(pad._HEADER_RATES.keys()), [self.pad_header_filename] )
+        finally:
+            pad._HEADER_RATES_MAX = max_entries
+
     def test_get_samplerate_without_header_file(self):
         """
         Tests the get_samplerate method using _reckon_rate.
@@ -127,6 +152,42 @@ class PadTestCase(unittest.TestCase):
         f.close()
         self.assertEqual(new_rate, aiff_rate)
         
+    def test_convert_multichannel(self):
+        """
+        Tests the convert method writing all axes to one multichannel file.
+        """
+        rogue_pad_file = PadFile(self.rogue_filename)
+        rogue_pad_file.convert(axis='4')
+        rogue_pad_file.convert(axis='4', multichannel=True)
+        
+        # get array from multichannel aiff file (frames are interleaved x, y, z, s)
+        aiff_file = rogue_pad_file.filename + 'xyzs.aiff'
+        f = aifc.open(aiff_file, 'r')
+        self.assertEqual(f.getnchannels(), 4)
+        f.close()
+        xyzs, params = aiffread(aiff_file)
+        xyzs = np.reshape(xyzs, (-1, 4))
+        
+        # each channel matches its mono file
+        for i, ax in enumerate('xyzs'):
+            mono, params = aiffread(rogue_pad_file.filename + ax + '.aiff')
+            assert_array_equal(xyzs[:, i], mono)
+
+    def test_pad_stream_convert(self):
+        """
+        Tests streaming conversion (in small chunks) matches the convert method.
+        """
+        rogue_pad_file = PadFile(self.rogue_filename)
+        for taper in [0, 3000]:
+            rogue_pad_file.convert(axis='4', taper=taper, multichannel=True)
+            expected, params = aiffread(rogue_pad_file.filename + 'xyzs.aiff')
+            stream_file = rogue_pad_file.filename + 'stream.aiff'
+            num = pad_stream_convert([self.rogue_filename], stream_file, 1.0, axis='4', taper=taper, chunk_rows=2)
+            self.assertEqual(num, len(expected) // 4)
+            actual, params = aiffread(stream_file)
+            assert_array_equal(actual, expected)
+            os.remove(stream_file)
+
 def suite():
     return unittest.makeSuite(PadTestCase, 'test')
 
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import os
+import time
+import shutil
+import datetime
+import unittest
+import tempfile
+from ugaudio.create import write_rogue_pad_file
+from ugaudio.padindex import PadIndex, parse_header
+
+_HEADER = """<?xml version="1.0" encoding="US-ASCII"?>
+<sams2_accel>
+    <SensorID>121f03</SensorID>
+    <SampleRate>%.1f</SampleRate>
+    <CutoffFreq>200.0</CutoffFreq>
+    <SensorCoordinateSystem name="121f03" r="0.0" p="0.0" w="0.0" x="0.0" y="0.0" z="0.0" comment="LAB1O1, ER2, Lower Z Panel" time="01-Jan-2020,00:00:00.000"/>
+    <DataCoordinateSystem name="SSAnalysis" r="0.0" p="0.0" w="0.0" x="0.0" y="0.0" z="0.0" comment="Space Station Analysis" time="01-Jan-2020,00:00:00.000"/>
+</sams2_accel>
+"""
+
+# Test suite for ugaudio.padindex.
+class PadIndexTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.padindex.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        # PAD directory tree with 3 files for one sensor-day (one at 250 sa/sec, one short)
+        self.pad_dir = tempfile.mkdtemp()
+        self.day = datetime.date(2020, 4, 5)
+        self.sensor_dir = os.path.join(self.pad_dir, 'year2020', 'month04', 'day05', 'sams2_accel_121f03')
+        os.makedirs(self.sensor_dir)
+        self.fnames = []
+        for bname, rate in [('2020_04_05_00_10_00.000+2020_04_05_00_20_00.000.121f03', 500.0),
+                            ('2020_04_05_00_00_00.000+2020_04_05_00_10_00.000.121f03', 500.0),
+                            ('2020_04_05_00_20_00.000+2020_04_05_00_30_00.000.121f03', 250.0),
+                            ('2020_04_05_00_30_00.000+2020_04_05_00_31_00.000.121f03', 500.0)]:
+            fname = os.path.join(self.sensor_dir, bname)
+            write_rogue_pad_file(fname)
+            with open(fname + '.header', 'w') as f:
+                f.write(_HEADER % rate)
+            self.fnames.append(fname)
+        self.db_file = os.path.join(self.pad_dir, 'padindex.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.pad_dir)
+
+    def test_parse_header(self):
+        """
+        Test parse_header function.
+        """
+        info = parse_header(self.fnames[0] + '.header')
+        self.assertEqual(info['rate'], 500.0)
+        self.assertEqual(info['cutoff'], 200.0)
+        self.assertEqual(info['location'], 'LAB1O1, ER2, Lower Z Panel')
+        self.assertEqual(info['data_coords'], 'SSAnalysis')
+
+    def test_select(self):
+        """
+        Test PadIndex select (and incremental update).
+        """
+        idx = PadIndex(self.db_file, pad_dir=self.pad_dir)
+
+        # sorted by start time, filtered by rate and duration
+        fnames = idx.select('121f03', self.day, fs=500.0, fc=200.0, location='LAB1O1, ER2, Lower Z Panel',
+                            min_minutes=5.5, data_coords='SSAnalysis')
+        self.assertEqual(fnames, [self.fnames[1], self.fnames[0]])
+        self.assertEqual(len(idx.select('121f03', self.day)), 4)
+        self.assertEqual(idx.file_info(self.fnames[2])['rate'], 250.0)
+
+        # no change on disk, so nothing to update
+        self.assertFalse(idx.update_day('121f03', self.day))
+
+        # file rewritten in place (directory mtime unchanged) gets its row updated
+        dir_mtime = os.path.getmtime(self.sensor_dir)
+        time.sleep(0.01)
+        with open(self.fnames[1], 'ab') as f:
+            f.write(b'\0' * 16)
+        with open(self.fnames[1] + '.header', 'w') as f:
+            f.write(_HEADER % 250.0)
+        os.utime(self.sensor_dir, (dir_mtime, dir_mtime))
+        self.assertEqual(idx.select('121f03', self.day, fs=500.0, min_minutes=5.5), [self.fnames[0]])
+        self.assertEqual(idx.file_info(self.fnames[1])['size'], os.path.getsize(self.fnames[1]))
+        idx.close()
+
+        # index persists and picks up a removed file
+        time.sleep(0.01)
+        os.remove(self.fnames[0])
+        os.utime(self.sensor_dir, None)
+        idx = PadIndex(self.db_file, pad_dir=self.pad_dir)
+        self.assertEqual(idx.select('121f03', self.day, fs=500.0, min_minutes=5.5), [])
+        self.assertEqual(len(idx.select('121f03', self.day)), 3)
+        idx.close()
+
+def suite():
+    return unittest.makeSuite(PadIndexTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import unittest
+import tempfile
+import numpy as np
+from ugaudio.create import padwrite
+from ugaudio.load import padread
+from ugaudio.padstats import compute_pad_stats, PadStatsCache
+
+class PadStatsTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.padstats.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pad_file = os.path.join(self.tmp_dir, 'test.pad')
+        t = np.arange(1000) / 100.0
+        padwrite(1 + np.sin(t), 2 * np.cos(3 * t), np.sin(t) ** 3 - 5, 100.0, self.pad_file)
+
+    def tearDown(self):
+        """
+        Clean up after tests.
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def test_compute_pad_stats(self):
+        """
+        Test chunked stats match ones from whole (demeaned) file.
+        """
+        b = padread(self.pad_file, out_dtype=np.float64)
+        xyz = b[:, 1:4] - b[:, 1:4].mean(axis=0)
+        v = np.sqrt((xyz ** 2).sum(axis=1))
+        s = compute_pad_stats(self.pad_file, chunk_rows=77)
+        self.assertEqual(s.num_pts, 1000)
+        np.testing.assert_allclose(s.mean, b[:, 1:4].mean(axis=0))
+        np.testing.assert_allclose(s.max_abs, np.abs(xyz).max(axis=0))
+        np.testing.assert_allclose(s.rms, np.sqrt((xyz ** 2).mean(axis=0)), rtol=1e-6)
+        np.testing.assert_allclose([s.vecmag_p50, s.vecmag_p95], np.percentile(v, [50, 95]), rtol=0.012)
+
+    def test_empty_file(self):
+        """
+        Test stats for an empty file are all zeros.
+        """
+        open(self.pad_file, 'wb').close()
+        s = compute_pad_stats(self.pad_file)
+        self.assertEqual(s.num_pts, 0)
+        np.testing.assert_array_equal(s.rms, np.zeros(3))
+        self.assertEqual((s.vecmag_p50, s.vecmag_p95), (0.0, 0.0))
+
+    def test_cache(self):
+        """
+        Test cached stats are reused until file changes.
+        """
+        cache = PadStatsCache(os.path.join(self.tmp_dir, 'stats.sqlite'))
+        self.assertIsNone(cache.lookup(self.pad_file))
+        s1 = cache.get(self.pad_file)
+        s2 = cache.lookup(self.pad_file)
+        self.assertEqual(s2.num_pts, s1.num_pts)
+        for a, b in zip(s1[1:], s2[1:]):
+            np.testing.assert_array_equal(a, b)
+
+        # a changed file is not found in cache, so its stats get computed again
+        padwrite(np.ones(10), np.ones(10), np.ones(10), 100.0, self.pad_file)
+        st = os.stat(self.pad_file)
+        os.utime(self.pad_file, (st.st_atime, st.st_mtime + 10))
+        self.assertIsNone(cache.lookup(self.pad_file))
+        self.assertEqual(cache.get(self.pad_file).num_pts, 10)
+        cache.close()
+
+def suite():
+    return unittest.makeSuite(PadStatsTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy as np
+from scipy.signal import welch
+from ugaudio.psd import psd_engine
+
+class PsdEngineTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.psd.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        np.random.seed(7)
+        self.fs = 500.0
+        self.xyz = np.random.randn(5000, 3).astype(np.float32) + np.linspace(0, 3, 5000)[:, np.newaxis]
+
+    def test_psd_matches_welch(self):
+        """
+        Test engine PSD matches scipy's welch for various overlaps and detrends.
+        """
+        for noverlap in [None, 0, 192]:
+            for detrend in ['constant', 'linear', False]:
+                engine = psd_engine(self.fs, 256, noverlap=noverlap, detrend=detrend)
+                f, Pxx = engine.psd(self.xyz, batch=5)
+                fw, Pw = welch(self.xyz.astype(np.float64), self.fs, nperseg=256, noverlap=noverlap,
+                               detrend=detrend, axis=0)
+                np.testing.assert_allclose(f, fw)
+                np.testing.assert_allclose(Pxx, Pw, rtol=1e-10)
+
+    def test_cache(self):
+        """
+        Test engines are set up once per parameter set.
+        """
+        self.assertIs(psd_engine(self.fs, 256), psd_engine(500, 256, noverlap=128))
+        self.assertIsNot(psd_engine(self.fs, 256), psd_engine(self.fs, 256, detrend='linear'))
+        with self.assertRaises(ValueError):
+            psd_engine(self.fs, 256, noverlap=256)
+
+    def test_window(self):
+        """
+        Test engine takes window as name, (name, params) tuple or array, and caches by window values.
+        """
+        win = np.hanning(258)[1:-1]
+        engine = psd_engine(self.fs, 256, window=win)
+        self.assertIs(engine, psd_engine(self.fs, 256, window=list(win)))
+        self.assertIsNot(engine, psd_engine(self.fs, 256))
+        for window in [win, ('tukey', 0.25)]:
+            f, Pxx = psd_engine(self.fs, 256, window=window).psd(self.xyz)
+            fw, Pw = welch(self.xyz.astype(np.float64), self.fs, window=window, nperseg=256, axis=0)
+            np.testing.assert_allclose(Pxx, Pw, rtol=1e-10)
+        with self.assertRaises(ValueError):
+            psd_engine(self.fs, 256, window=win[:-1])
+
+def suite():
+    return unittest.makeSuite(PsdEngineTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
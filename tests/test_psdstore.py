@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import datetime
+import unittest
+import tempfile
+import numpy as np
+from multiprocessing import Process
+from ugaudio.spectral_average_calc import PsdAccumulator
+from ugaudio.psdstore import PsdStore, import_psdsum_files
+
+def _random_day_psd(i, fs=100.0, nfft=64):
+    """
+    Return accumulator for a random (but repeatable, from i) day.
+    """
+    pa = PsdAccumulator(fs, nperseg=nfft)
+    pa.append(np.random.RandomState(i).randn(300 + i, 4))
+    return pa
+
+def _put_days(root_dir, days):
+    """
+    Put random days in store (in its own process).
+    """
+    store = PsdStore(root_dir)
+    for d in days:
+        store.put('121f03', d, _random_day_psd(d.toordinal()))
+    store.close()
+
+class PsdStoreTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.psdstore.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        np.random.seed(5)
+        self.fs, self.nfft = 100.0, 64
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = PsdStore(os.path.join(self.tmp_dir, 'store'))
+
+    def tearDown(self):
+        """
+        Clean up after tests.
+        """
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _day_psd(self, i, npts=1000):
+        """
+        Return accumulator for a random day, with one (fake) source file.
+        """
+        pa = PsdAccumulator(self.fs, nperseg=self.nfft)
+        pa.append(np.random.randn(npts, 4))
+        fname = os.path.join(self.tmp_dir, 'file%d.pad' % i)
+        open(fname, 'wb').close()
+        pa.add_source(fname)
+        return pa
+
+    def test_sum_range(self):
+        """
+        Test sum over days that span months (with gaps) matches merged accumulators.
+        """
+        days = [datetime.date(2020, 3, 30), datetime.date(2020, 3, 31), datetime.date(2020, 4, 2),
+                datetime.date(2020, 4, 3)]
+        total = PsdAccumulator(self.fs, nperseg=self.nfft)
+        for i, d in enumerate(days):
+            pa = self._day_psd(i, npts=1000 + 100 * i)
+            self.store.put('121f03', d, pa)
+            total.merge(pa)
+
+        for mmap in [True, False]:
+            pa = self.store.sum_range('121f03', days[0], days[-1], self.fs, self.nfft, mmap=mmap)
+            self.assertEqual(pa.count, total.count)
+            np.testing.assert_allclose(pa.psd, total.psd, rtol=1e-12)
+            self.assertEqual(list(pa.sources.keys()), list(total.sources.keys()))
+
+        self.assertEqual(list(self.store.days('121f03', days[0], days[-1], self.fs, self.nfft).keys()), days)
+        self.assertTrue(self.store.get('121f03', datetime.date(2020, 4, 1), self.fs, self.nfft) is None)
+        self.assertTrue(self.store.get('121f03', days[0], self.fs, self.nfft, noverlap=0) is None)
+        self.assertTrue(os.path.exists(self.store.month_file('121f03', total, 2020, 4)))
+
+    def test_rollups(self):
+        """
+        Test sums from rollups (weeks, months, years) match day-by-day sums, also after a day is replaced.
+        """
+        days = [datetime.date(2019, 12, 30) + datetime.timedelta(days=i) for i in range(0, 400, 3)]
+        for i, d in enumerate(days):
+            self.store.put('121f03', d, self._day_psd(i, npts=200 + 10 * (i % 7)))
+        self.store.put('121f03', days[20], self._day_psd(999, npts=500))
+
+        for start, stop in [(datetime.date(2019, 12, 1), datetime.date(2021, 2, 1)),
+                            (datetime.date(2020, 1, 1), datetime.date(2020, 12, 31)),
+                            (datetime.date(2020, 2, 3), datetime.date(2020, 5, 22)),
+                            (datetime.date(2020, 3, 8), datetime.date(2020, 3, 21))]:
+            pa = self.store.sum_range('121f03', start, stop, self.fs, self.nfft)
+            expected = self.store.sum_range('121f03', start, stop, self.fs, self.nfft, rollups=False)
+            self.assertEqual(pa.count, expected.count)
+            self.assertEqual(pa.sources, expected.sources)
+            np.testing.assert_allclose(pa.psd, expected.psd, rtol=1e-12)
+
+        # stale (or missing) rollups get rebuilt before use
+        pa = self.store.sum_range('121f03', datetime.date(2020, 1, 1), datetime.date(2020, 12, 31), self.fs, self.nfft)
+        os.remove(self.store.rollup_file('121f03', pa, 2020))
+        again = self.store.sum_range('121f03', datetime.date(2020, 1, 1), datetime.date(2020, 12, 31), self.fs,
+                                     self.nfft)
+        np.testing.assert_allclose(again.psd, pa.psd, rtol=1e-12)
+
+    def test_put_replaces_day(self):
+        """
+        Test putting a day again replaces its sum, count and sources.
+        """
+        d = datetime.date(2020, 4, 14)
+        self.store.put('121f08', d, self._day_psd(0))
+        pa2 = self._day_psd(1, npts=2000)
+        self.store.put('121f08', d, pa2)
+        pa = self.store.get('121f08', d, self.fs, self.nfft)
+        self.assertEqual(pa.count, pa2.count)
+        np.testing.assert_allclose(pa.psd, pa2.psd, rtol=1e-12)
+        self.assertEqual(list(pa.sources.keys()), ['file1.pad'])
+
+    def test_import_psdsum_files(self):
+        """
+        Test daily psdsum mat files go into store intact.
+        """
+        pa = self._day_psd(0)
+        mat_file = os.path.join(self.tmp_dir, '2020-04-14_121f08_100p0_64_psdsum.mat')
+        pa.save_psdsum_matfile(mat_file)
+        self.assertEqual(import_psdsum_files(self.store, '121f08', [mat_file]), 1)
+        got = self.store.get('121f08', datetime.date(2020, 4, 14), self.fs, self.nfft)
+        self.assertEqual(got.count, pa.count)
+        np.testing.assert_allclose(got.psd, pa.psd, rtol=1e-12)
+        self.assertEqual(got.sources, pa.sources)
+
+    def test_concurrent_puts(self):
+        """
+        Test days put by several processes at once (same month and rollup arrays) all end up in store and rollups.
+        """
+        days = [datetime.date(2020, 5, 27) + datetime.timedelta(days=i) for i in range(6)]
+        procs = [Process(target=_put_days, args=(self.store.root_dir, days[i::2])) for i in range(2)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        self.assertEqual([p.exitcode for p in procs], [0] * 2)
+
+        total = PsdAccumulator(self.fs, nperseg=self.nfft)
+        for d in days:
+            total.merge(_random_day_psd(d.toordinal()))
+        for rollups in [True, False]:
+            pa = self.store.sum_range('121f03', days[0], days[-1], self.fs, self.nfft, rollups=rollups)
+            self.assertEqual(pa.count, total.count)
+            np.testing.assert_allclose(pa.psd, total.psd, rtol=1e-12)
+        pa = self.store.sum_range('121f03', datetime.date(2020, 5, 1), datetime.date(2020, 5, 31), self.fs, self.nfft)
+        self.assertEqual(pa.count, sum(_random_day_psd(d.toordinal()).count for d in days if d.month == 5))
+        self.assertEqual(self.store.conn.execute('SELECT COUNT(*) FROM stale_months').fetchone()[0], 0)
+
+def suite():
+    return unittest.makeSuite(PsdStoreTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
@@ -4,7 +4,8 @@ import unittest
 import warnings
 import numpy as np
 from ugaudio.signal import normalize
-from ugaudio.signal import clip_at_third, my_taper, timearray
+from ugaudio.signal import clip_at_third, my_taper, timearray, taper_window
+from ugaudio.signal import demean, vecmag, demean_vecmag
 #from ugaudio.signal import speed_scale, stretch, pitch_shift
 from ugaudio.create import AlternateIntegers
 
@@ -95,6 +96,60 @@ class SignalTestCase(unittest.TestCase):
             self.assertLess( np.abs(tapered[ Nmidtaper]),       51 )
             self.assertLess( np.abs(tapered[-Nmidtaper]),       51 )
 
+    def test_in_place(self):
+        """
+        Tests normalize, my_taper and timearray with out argument.
+        """
+        # each column of 2d input is normalized on its own; all-zero column is left alone
+        a = np.array([[1.0, -4.0, 0.0], [-2.0, 2.0, 0.0]], dtype=np.float32)
+        b = normalize(a, out=a)
+        self.assertIs(b, a)
+        np.testing.assert_array_equal(a, [[0.5, -1.0, 0.0], [-1.0, 0.5, 0.0]])
+        
+        # in-place taper matches tapered copy, column by column
+        fs, t = 1, 10
+        sig = self.untapered_objects[0].signal.astype(np.float64)
+        expected = my_taper(sig, fs, t)
+        c = np.column_stack([sig, 2 * sig])
+        my_taper(c, fs, t, out=c)
+        np.testing.assert_array_equal(c[:, 0], expected)
+        np.testing.assert_array_equal(c[:, 1], 2 * expected)
+        
+        # taper windows are cached (and not writeable)
+        N = clip_at_third(sig, fs, t)
+        self.assertIs(taper_window(N)[0], taper_window(N)[0])
+        self.assertFalse(taper_window(N)[1].flags.writeable)
+        
+        # time array into preallocated buffer
+        buf = np.empty(5)
+        t = timearray(range(5), 2, out=buf)
+        self.assertIs(t, buf)
+        np.testing.assert_array_equal(t, [0.0, 0.5, 1.0, 1.5, 2.0])
+
+    def test_demean_vecmag(self):
+        """
+        Tests demean_vecmag function (in place, into out, and with given mean).
+        """
+        xyz = np.array([[1, 2, 5], [3, 2, 1], [2, 5, 3]], dtype=np.float32)
+        expected = xyz - xyz.mean(axis=0)
+        a = np.empty((3, 4), dtype=np.float32)
+        a[:, 1:4] = xyz
+        v = demean_vecmag(a[:, 1:4], out=a[:, 0])
+        np.testing.assert_allclose(a[:, 1:4], expected, atol=1e-6)
+        np.testing.assert_allclose(a[:, 0], np.sqrt((expected ** 2).sum(axis=1)), rtol=1e-6)
+        np.testing.assert_array_equal(v, a[:, 0])
+        
+        # mean in double precision, even for float32 data with a big offset
+        b = np.array([[1.0e4 + 1], [1.0e4 - 1]] * 500000, dtype=np.float32)
+        m = demean(b)
+        self.assertEqual(m[0], 1.0e4)
+        self.assertEqual(np.abs(b).max(), 1)
+        
+        # given mean
+        xyz = np.ones((4, 3))
+        np.testing.assert_array_equal(demean_vecmag(xyz, mean=[1, 1, 0]), [1, 1, 1, 1])
+        np.testing.assert_array_equal(vecmag(np.array([[3.0, 4.0, 0.0]])), [5.0])
+
     @unittest.skip("not implemented yet")
     def test_spectrogram(self):
         """
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import shutil
+import datetime
+import unittest
+import tempfile
+from ugaudio.spectral_average_batch import spec_avg_tasks, spec_avg_schedule, task_psdsum_file, exit_code
+from ugaudio.spectral_average_batch import task_empty_file, EMPTY_EXIT_CODE, _run_task
+
+def _write_psdsum(task, nfft, fs, fc, num_files, pad_dir, out_dir, incremental, index_file):
+    """
+    Stand-in task that writes its psdsum file with just the incremental flag it got.
+    """
+    psdsum_file = task_psdsum_file(task, nfft, fs, out_dir)
+    if not os.path.exists(os.path.dirname(psdsum_file)):
+        os.makedirs(os.path.dirname(psdsum_file))
+    with open(psdsum_file, 'w') as f:
+        f.write(str(incremental))
+
+def _fail(task, *args):
+    """
+    Stand-in task that fails on its second day.
+    """
+    if task.day.day == 2:
+        sys.exit(1)  # like a task that died
+    _write_psdsum(task, *args)
+
+def _empty(task, nfft, fs, fc, num_files, pad_dir, out_dir, incremental, index_file):
+    """
+    Stand-in task whose second day has no PAD files (so it gets an empty marker instead of a psdsum file).
+    """
+    if task.day.day == 2:
+        empty_file = task_empty_file(task, nfft, fs, out_dir)
+        if not os.path.exists(os.path.dirname(empty_file)):
+            os.makedirs(os.path.dirname(empty_file))
+        open(empty_file, 'w').close()
+        sys.exit(EMPTY_EXIT_CODE)
+    _write_psdsum(task, nfft, fs, fc, num_files, pad_dir, out_dir, incremental, index_file)
+
+def _hang(task, *args):
+    """
+    Stand-in task that takes way too long.
+    """
+    time.sleep(30)
+
+# Test suite for ugaudio.spectral_average_batch.
+class SpectralAverageBatchTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.spectral_average_batch.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        self.out_dir = tempfile.mkdtemp()
+        self.tasks = spec_avg_tasks(['121f03', '121f08'], datetime.date(2020, 4, 1), datetime.date(2020, 4, 3))
+        self.nfft, self.fs, self.fc = 32768, 500.0, 200.0
+
+    def tearDown(self):
+        """
+        Clean up after tests.
+        """
+        shutil.rmtree(self.out_dir)
+
+    def _schedule(self, run_task, **kwargs):
+        """
+        Return results of schedule with stand-in run_task.
+        """
+        return spec_avg_schedule(self.tasks, self.nfft, self.fs, self.fc, out_dir=self.out_dir, workers=3, poll=0.01,
+                                 run_task=run_task, **kwargs)
+
+    def _incremental(self, task):
+        """
+        Return incremental flag that task's stand-in psdsum file was written with.
+        """
+        with open(task_psdsum_file(task, self.nfft, self.fs, self.out_dir)) as f:
+            return f.read()
+
+    def test_skip_force_update(self):
+        """
+        Test tasks with psdsum files are skipped, unless forced (recompute) or updating (incremental).
+        """
+        _write_psdsum(self.tasks[0], self.nfft, self.fs, self.fc, None, None, self.out_dir, 'existing', None)
+        results = self._schedule(_write_psdsum)
+        self.assertEqual([r.task for r in results], self.tasks)
+        self.assertEqual([r.status for r in results], ['skipped'] + ['done'] * 5)
+        self.assertEqual([self._incremental(t) for t in self.tasks], ['existing'] + ['True'] * 5)
+        self.assertEqual(exit_code(results), 0)
+
+        results = self._schedule(_write_psdsum, force=True)
+        self.assertEqual([r.status for r in results], ['done'] * 6)
+        self.assertEqual([self._incremental(t) for t in self.tasks], ['False'] * 6)
+
+        results = self._schedule(_write_psdsum, update=True)
+        self.assertEqual([r.status for r in results], ['done'] * 6)
+        self.assertEqual([self._incremental(t) for t in self.tasks], ['True'] * 6)
+
+    def test_failed_and_timeout(self):
+        """
+        Test failed and timed out tasks get status for each, and a nonzero exit code.
+        """
+        results = self._schedule(_fail)
+        self.assertEqual([r.status for r in results], ['done', 'failed', 'done'] * 2)
+        self.assertEqual(exit_code(results), 1)
+
+        t0 = time.time()
+        results = self._schedule(_hang, timeout=0.2, force=True)
+        self.assertTrue(time.time() - t0 < 10)
+        self.assertEqual([r.status for r in results], ['timeout'] * 6)
+        self.assertEqual(exit_code(results), 1)
+
+    def test_empty(self):
+        """
+        Test a day with no PAD files is empty (not failed), checkpointed and skipped on rerun.
+        """
+        results = self._schedule(_empty)
+        self.assertEqual([r.status for r in results], ['done', 'empty', 'done'] * 2)
+        self.assertEqual(exit_code(results), 0)
+        results = self._schedule(_empty)
+        self.assertEqual([r.status for r in results], ['skipped'] * 6)
+
+        # real task for a day without PAD files
+        task = self.tasks[0]
+        pad_dir = os.path.join(self.out_dir, 'pad')
+        os.makedirs(os.path.join(pad_dir, 'year2020', 'month04', 'day01', 'sams2_accel_121f03'))
+        with self.assertRaises(SystemExit) as cm:
+            _run_task(task, 256, self.fs, self.fc, None, pad_dir, os.path.join(self.out_dir, 'real'), False, None)
+        self.assertEqual(cm.exception.code, EMPTY_EXIT_CODE)
+        self.assertTrue(os.path.exists(task_empty_file(task, 256, self.fs, os.path.join(self.out_dir, 'real'))))
+
+def suite():
+    return unittest.makeSuite(SpectralAverageBatchTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+
+import os
+import time
+import shutil
+import datetime
+import unittest
+import tempfile
+import numpy as np
+from scipy.io import savemat
+from scipy.signal import welch
+from ugaudio.load import pad_runs
+from ugaudio.spectral_average_calc import PsdAccumulator, PsdRunningTally, merge_psdsum_files, default_max_gap
+from ugaudio.spectral_average_calc import PSDSUM_VERSION, file_psd_partial, spec_avg_one_day, psdsum_filename
+from ugaudio.spectral_average_calc import new_sources
+from ugaudio.spectral_average_plot import spec_avg_date_range_plot
+from ugaudio.psdstore import PsdStore
+
+_HEADER = """<?xml version="1.0" encoding="US-ASCII"?>
+<sams2_accel>
+    <SensorID>121f03</SensorID>
+    <SampleRate>500.0</SampleRate>
+    <CutoffFreq>200.0</CutoffFreq>
+    <SensorCoordinateSystem name="121f03" r="0.0" p="0.0" w="0.0" x="0.0" y="0.0" z="0.0" comment="LAB1O1, ER2, Lower Z Panel" time="01-Jan-2020,00:00:00.000"/>
+    <DataCoordinateSystem name="SSAnalysis" r="0.0" p="0.0" w="0.0" x="0.0" y="0.0" z="0.0" comment="Space Station Analysis" time="01-Jan-2020,00:00:00.000"/>
+</sams2_accel>
+"""
+
+def _pad_basename(start, stop, sensor='121f03'):
+    """
+    Return PAD-style basename for file with start and stop seconds after 2020-04-18 00:00:00.
+    """
+    t0 = datetime.datetime(2020, 4, 18)
+    fmt = lambda s: (t0 + datetime.timedelta(seconds=s)).strftime('%Y_%m_%d_%H_%M_%S.%f')[:-3]
+    return '%s+%s.%s' % (fmt(start), fmt(stop), sensor)
+
+# Test suite for ugaudio.spectral_average_calc.
+class SpectralAverageCalcTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.spectral_average_calc.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        # random txyz array long enough for exactly 10 segments with 50% overlap
+        np.random.seed(123)
+        self.fs, self.nperseg = 500.0, 256
+        numpts = self.nperseg + 9 * (self.nperseg // 2)
+        t = np.arange(numpts) / self.fs
+        xyz = np.random.randn(numpts, 3) + [1.0, -2.0, 3.0]
+        self.txyz = np.c_[t, xyz].astype(np.float32)
+
+    def test_append_matches_welch(self):
+        """
+        Test PsdAccumulator append gives same average PSD as welch.
+        """
+        pa = PsdAccumulator(self.fs, nperseg=self.nperseg, batch=3)
+        pa.append(self.txyz)
+        f, Pxx = welch(self.txyz[:, 1:].astype(np.float64), self.fs, nperseg=self.nperseg, axis=0)
+        self.assertEqual(pa.count, 10)
+        np.testing.assert_allclose(pa.f, f)
+        np.testing.assert_allclose(pa.spectral_avg()[:, 0:3], Pxx, rtol=1e-10)
+
+    def test_append_in_chunks(self):
+        """
+        Test PsdAccumulator append carries partial segments across chunks.
+        """
+        whole = PsdAccumulator(self.fs, nperseg=self.nperseg)
+        whole.append(self.txyz)
+
+        chunked = PsdAccumulator(self.fs, nperseg=self.nperseg)
+        i = 0
+        for n in [1, 100, 7, 300, 50, 1000, 2000]:
+            chunked.append(self.txyz[i:i + n])
+            i += n
+        self.assertEqual(chunked.count, whole.count)
+        np.testing.assert_allclose(chunked.psd, whole.psd, rtol=1e-12)
+
+    def test_merge(self):
+        """
+        Test PsdAccumulator merge and add.
+        """
+        half = self.txyz.shape[0] // 2
+        pa1 = PsdAccumulator(self.fs, nperseg=self.nperseg)
+        pa1.append(self.txyz[:half])
+        pa2 = PsdAccumulator(self.fs, nperseg=self.nperseg)
+        pa2.append(self.txyz[half:])
+
+        total = pa1 + pa2
+        self.assertEqual(total.count, pa1.count + pa2.count)
+        np.testing.assert_array_equal(total.psd[:, 0:3], pa1.psd[:, 0:3] + pa2.psd[:, 0:3])
+
+        # 4th column is RSS of x, y & z sums, so it averages to RSS of average PSD
+        avg = total.spectral_avg()
+        np.testing.assert_allclose(avg[:, 3], np.sqrt((avg[:, 0:3] ** 2).sum(axis=1)), rtol=1e-12)
+
+        # merging an empty accumulator changes nothing
+        total.merge(PsdAccumulator(self.fs, nperseg=self.nperseg))
+        self.assertEqual(total.count, pa1.count + pa2.count)
+
+        # mismatched parameters cannot merge
+        with self.assertRaises(ValueError):
+            pa1.merge(PsdAccumulator(self.fs, nperseg=2 * self.nperseg))
+
+    def test_psdsum_version(self):
+        """
+        Test psdsum files without a version load as version 1, which do not merge with version 2 sums.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        pa = PsdAccumulator(self.fs, nperseg=self.nperseg)
+        pa.append(self.txyz)
+        new_file = os.path.join(tmp_dir, 'new_psdsum.mat')
+        pa.save_psdsum_matfile(new_file)
+        self.assertEqual(PsdAccumulator.load_psdsum_matfile(new_file).version, PSDSUM_VERSION)
+
+        # old file: sum of per-file average PSDs (4th column RSS of each average) and count of files
+        old_file = os.path.join(tmp_dir, 'old_psdsum.mat')
+        savemat(old_file, {'deltaf': pa.f[1], 'psd': 2 * pa.spectral_avg(), 'count': 2})
+        old = PsdAccumulator.load_psdsum_matfile(old_file)
+        self.assertEqual((old.version, old.count), (1, 2))
+        np.testing.assert_allclose(old.spectral_avg(), pa.spectral_avg(), rtol=1e-12)
+        with self.assertRaises(ValueError):
+            pa.merge(old)
+        np.testing.assert_array_equal((old + old).psd, 2 * old.psd)
+        shutil.rmtree(tmp_dir)
+
+    def test_serial_run_breaks_at_gaps(self):
+        """
+        Test PsdRunningTally serial run lets segments span contiguous PAD files, but not a gap between files.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        n = self.txyz.shape[0]
+        starts = [0.0, n / self.fs, 2 * n / self.fs, 3 * n / self.fs + 60.0]  # 1 minute gap before last file
+        pad_files = []
+        for i, t0 in enumerate(starts):
+            fname = os.path.join(tmp_dir, _pad_basename(t0, t0 + (n - 1) / self.fs))
+            np.roll(self.txyz, 100 * i, axis=0).tofile(fname)
+            pad_files.append(fname)
+        self.assertEqual([len(run) for run in pad_runs(pad_files, default_max_gap(self.fs))], [3, 1])
+
+        pa = PsdAccumulator(self.fs, nperseg=self.nperseg)
+        PsdRunningTally(pad_files, pa).run()
+        expected = PsdAccumulator(self.fs, nperseg=self.nperseg)
+        expected.append(np.concatenate([np.fromfile(f, dtype=np.float32).reshape((-1, 4)) for f in pad_files[:3]]))
+        expected.break_tail()
+        expected.append(np.fromfile(pad_files[3], dtype=np.float32).reshape((-1, 4)))
+        self.assertEqual(pa.count, expected.count)
+        self.assertEqual(pa.count, 3 * 10 + 2 + 10)
+        np.testing.assert_allclose(pa.psd, expected.psd, rtol=1e-12)
+        shutil.rmtree(tmp_dir)
+
+    def test_overlap_and_detrend(self):
+        """
+        Test PsdAccumulator with other overlap and detrend matches welch, and they must match to merge.
+        """
+        for noverlap, detrend in [(0, 'constant'), (192, 'linear'), (64, False)]:
+            pa = PsdAccumulator(self.fs, nperseg=self.nperseg, noverlap=noverlap, detrend=detrend)
+            pa.append(self.txyz[:700])
+            pa.append(self.txyz[700:])
+            f, Pxx = welch(self.txyz[:, 1:].astype(np.float64), self.fs, nperseg=self.nperseg, noverlap=noverlap,
+                           detrend=detrend, axis=0)
+            np.testing.assert_allclose(pa.spectral_avg()[:, 0:3], Pxx, rtol=1e-10)
+            with self.assertRaises(ValueError):
+                pa.merge(PsdAccumulator(self.fs, nperseg=self.nperseg))
+
+    def test_merge_psdsum_files(self):
+        """
+        Test exact, segment-weighted merge of saved psdsum partials.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        parts, file_names = [], []
+        for i, (a, b) in enumerate([(0, 300), (300, 1400)]):
+            pa = PsdAccumulator(self.fs, nperseg=self.nperseg, noverlap=64, detrend='linear')
+            pa.append(self.txyz[a:b] * (i + 1))
+            file_names.append(os.path.join(tmp_dir, 'part%d_psdsum.mat' % i))
+            pa.save_psdsum_matfile(file_names[-1])
+            parts.append(pa)
+        total = merge_psdsum_files(file_names)
+        self.assertEqual(total.params(), parts[0].params())
+        self.assertEqual(total.count, parts[0].count + parts[1].count)
+        np.testing.assert_allclose(total.psd[:, 0:3], parts[0].psd[:, 0:3] + parts[1].psd[:, 0:3], rtol=1e-12)
+
+        # average is weighted by segments, not by partials
+        expected = (parts[0].psd[:, 0:3] + parts[1].psd[:, 0:3]) / (parts[0].count + parts[1].count)
+        np.testing.assert_allclose(total.spectral_avg()[:, 0:3], expected, rtol=1e-12)
+        shutil.rmtree(tmp_dir)
+
+    def test_parallel_run_reproducible(self):
+        """
+        Test PsdRunningTally run is same serially and regardless of number of workers, with segments spanning files.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        pad_files, t0 = [], 0.0
+        for i, n in enumerate([1408, 100, 700, 1001, 1408]):  # short files too (one shorter than a segment)
+            fname = os.path.join(tmp_dir, _pad_basename(t0, t0 + (n - 1) / self.fs))
+            (np.roll(self.txyz, 50 * i, axis=0)[:n] * (i + 1)).tofile(fname)
+            pad_files.append(fname)
+            t0 += n / self.fs
+
+        results = []
+        for workers, pool in [(None, None), (1, 'thread'), (3, 'thread'), (2, 'process')]:
+            pa = PsdAccumulator(self.fs, nperseg=self.nperseg)
+            PsdRunningTally(pad_files, pa).run(workers=workers, pool=pool)
+            results.append(pa)
+        for pa in results[1:]:
+            self.assertEqual(pa.count, results[0].count)
+            np.testing.assert_array_equal(pa.psd, results[0].psd)
+            self.assertEqual(pa.sources, results[0].sources)
+
+        # same segments as one accumulator over all of the (contiguous) data
+        whole = PsdAccumulator(self.fs, nperseg=self.nperseg)
+        whole.append(np.concatenate([np.fromfile(f, dtype=np.float32).reshape((-1, 4)) for f in pad_files]))
+        self.assertEqual(results[0].count, whole.count)
+        np.testing.assert_allclose(results[0].psd, whole.psd, rtol=1e-10)
+
+        # partials must be stitched in order
+        with self.assertRaises(ValueError):
+            PsdAccumulator(self.fs, nperseg=self.nperseg).stitch(file_psd_partial((pad_files[1],) + pa.params() +
+                                                                                  (5,)))
+        shutil.rmtree(tmp_dir)
+
+    def test_run_without_detrend(self):
+        """
+        Test PsdRunningTally run with detrend False matches PSD of each file demeaned first.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        pad_files, demeaned, t0 = [], [], 0.0
+        for i, n in enumerate([1408, 700, 1001]):
+            fname = os.path.join(tmp_dir, _pad_basename(t0, t0 + (n - 1) / self.fs))
+            a = (np.roll(self.txyz, 50 * i, axis=0)[:n] + [0, 1000.0 * i, -50.0, 7.0 * i]).astype(np.float32)
+            a.tofile(fname)
+            pad_files.append(fname)
+            b = a.astype(np.float64)
+            b[:, 1:4] -= b[:, 1:4].mean(axis=0)
+            demeaned.append(b)
+            t0 += n / self.fs
+
+        whole = PsdAccumulator(self.fs, nperseg=self.nperseg, detrend=False)
+        whole.append(np.concatenate(demeaned))
+        for workers, pool in [(None, None), (2, 'thread')]:
+            pa = PsdAccumulator(self.fs, nperseg=self.nperseg, detrend=False)
+            PsdRunningTally(pad_files, pa).run(workers=workers, pool=pool)
+            self.assertEqual(pa.count, whole.count)
+            np.testing.assert_allclose(pa.psd, whole.psd, rtol=1e-4)
+        shutil.rmtree(tmp_dir)
+
+    def _pad_day(self, tmp_dir, num_files=3):
+        """
+        Return PAD dir with num_files 10-minute (by name) files with headers for 121f03 on 2020-04-18, and their names.
+        """
+        pad_dir = os.path.join(tmp_dir, 'pad')
+        sensor_dir = os.path.join(pad_dir, 'year2020', 'month04', 'day18', 'sams2_accel_121f03')
+        os.makedirs(sensor_dir)
+        fnames = []
+        for i in range(num_files):
+            fname = os.path.join(sensor_dir, _pad_basename(600.0 * i, 600.0 * (i + 1)))
+            np.roll(self.txyz, 100 * i, axis=0).tofile(fname)
+            with open(fname + '.header', 'w') as f:
+                f.write(_HEADER)
+            fnames.append(fname)
+        return pad_dir, fnames
+
+    def test_spec_avg_one_day_incremental(self):
+        """
+        Test spec_avg_one_day recomputes by default, and incrementally is up to date, folds in new files or recomputes.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        pad_dir, fnames = self._pad_day(tmp_dir)
+        out_dir = os.path.join(tmp_dir, 'psdsum')
+        index_file = os.path.join(tmp_dir, 'padindex.sqlite')
+        psdsum_file = psdsum_filename('121f03', 2020, 4, 18, self.fs, self.nperseg, out_dir=out_dir)
+        day = lambda **kw: spec_avg_one_day('121f03', 2020, 4, 18, self.nperseg, self.fs, 200.0,
+                                            'LAB1O1, ER2, Lower Z Panel', pad_dir=pad_dir, out_dir=out_dir,
+                                            index_file=index_file, **kw)
+
+        # whole day (first 2 files), then again since incremental is off by default
+        prt = day(num_files=2)
+        self.assertEqual(prt.pad_files, fnames[:2])
+        self.assertEqual(prt.pa.count, 2 * 10 + 1)
+        self.assertEqual(day(num_files=2).pad_files, fnames[:2])
+
+        # saved sources come back from psdsum file, so nothing new to do
+        saved = PsdAccumulator.load_psdsum_matfile(psdsum_file)
+        self.assertEqual(saved.sources, prt.pa.sources)
+        self.assertEqual(new_sources(saved, fnames[:2]), [])
+        self.assertEqual(new_sources(saved, fnames), fnames[2:])
+        self.assertTrue(new_sources(saved, fnames[1:]) is None)
+        prt = day(num_files=2, incremental=True)
+        self.assertEqual(prt.pad_files, [])
+        self.assertEqual(prt.pa.count, saved.count)
+        np.testing.assert_array_equal(prt.pa.psd, saved.psd)
+
+        # new file gets folded in
+        prt = day(incremental=True)
+        self.assertEqual(prt.pad_files, fnames[2:])
+        self.assertEqual(prt.pa.count, saved.count + 10)
+        self.assertEqual(list(PsdAccumulator.load_psdsum_matfile(psdsum_file).sources.keys()),
+                         [os.path.basename(f) for f in fnames])
+
+        # file changed in place, so recompute whole day
+        time.sleep(0.01)
+        self.txyz[:700].tofile(fnames[0])
+        prt = day(incremental=True)
+        self.assertEqual(prt.pad_files, fnames)
+        self.assertEqual(prt.pa.count, (700 + 2 * 1408 - self.nperseg) // (self.nperseg // 2) + 1)
+
+        # other PSD parameters (same psdsum file name), so recompute whole day
+        self.assertEqual(day(incremental=True, noverlap=0).pad_files, fnames)
+
+        # psdsum file with no sources, or from before versions (count of files), so recompute whole day
+        pa = PsdAccumulator(self.fs, nperseg=self.nperseg)
+        pa.append(self.txyz)
+        pa.save_psdsum_matfile(psdsum_file)
+        self.assertEqual(day(incremental=True).pad_files, fnames)
+        savemat(psdsum_file, {'deltaf': pa.f[1], 'psd': pa.spectral_avg(), 'count': 1})
+        self.assertEqual(PsdAccumulator.load_psdsum_matfile(psdsum_file).version, 1)
+        prt = day(incremental=True)
+        self.assertEqual(prt.pad_files, fnames)
+        self.assertEqual(PsdAccumulator.load_psdsum_matfile(psdsum_file).version, PSDSUM_VERSION)
+        shutil.rmtree(tmp_dir)
+
+    def test_spec_avg_one_day_store(self):
+        """
+        Test spec_avg_one_day puts day in PsdStore, is up to date with it on rerun, and plots come from store.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        pad_dir, fnames = self._pad_day(tmp_dir)
+        store = PsdStore(os.path.join(tmp_dir, 'store'))
+        out_dir = os.path.join(tmp_dir, 'plots')
+        day = lambda **kw: spec_avg_one_day('121f03', 2020, 4, 18, self.nperseg, self.fs, 200.0,
+                                            'LAB1O1, ER2, Lower Z Panel', pad_dir=pad_dir, out_dir=out_dir,
+                                            index_file=os.path.join(tmp_dir, 'padindex.sqlite'), store=store, **kw)
+        prt = day()
+        self.assertEqual(prt.pad_files, fnames)
+        got = store.get('121f03', datetime.date(2020, 4, 18), self.fs, self.nperseg)
+        self.assertEqual(got.count, prt.pa.count)
+        self.assertEqual(got.sources, prt.pa.sources)
+        np.testing.assert_allclose(got.psd, prt.pa.psd, rtol=1e-12)
+        self.assertFalse(os.path.exists(out_dir))  # no psdsum file with a store
+
+        prt = day(incremental=True)
+        self.assertEqual(prt.pad_files, [])
+        self.assertEqual(prt.pa.count, got.count)
+
+        spec_avg_date_range_plot('121f03', 'LAB1O1, ER2, Lower Z Panel', datetime.date(2020, 4, 18),
+                                 datetime.date(2020, 4, 18), self.nperseg, self.fs, 200.0, out_dir=out_dir,
+                                 store=store)
+        month_dir = os.path.join(out_dir, 'year2020', 'month04')
+        self.assertEqual(sorted(os.listdir(month_dir)), ['2020-04-18_121f03_500p0_256_psdavg.pdf',
+                                                         '2020-04-18_2020-04-18_121f03_500p0_256_psdavg.pdf'])
+        store.close()
+        shutil.rmtree(tmp_dir)
+
+    def test_spec_avg_one_day_empty(self):
+        """
+        Test spec_avg_one_day on a day with no qualifying files saves no psdsum file.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        pad_dir, fnames = self._pad_day(tmp_dir, num_files=0)
+        out_dir = os.path.join(tmp_dir, 'psdsum')
+        prt = spec_avg_one_day('121f03', 2020, 4, 18, self.nperseg, self.fs, 200.0, 'LAB1O1, ER2, Lower Z Panel',
+                               pad_dir=pad_dir, out_dir=out_dir)
+        self.assertIsNone(prt.pa.psd)
+        self.assertFalse(os.path.exists(psdsum_filename('121f03', 2020, 4, 18, self.fs, self.nperseg,
+                                                        out_dir=out_dir)))
+        shutil.rmtree(tmp_dir)
+
+def suite():
+    return unittest.makeSuite(SpectralAverageCalcTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import unittest
+import tempfile
+import numpy as np
+from ugaudio.spectral_average_plot import decimate_psd, psd_plot_job, render_psd_plots
+
+class SpectralAveragePlotTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.spectral_average_plot.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        np.random.seed(3)
+        self.deltaf = 500.0 / 32768
+        self.psd = 10.0 ** np.random.uniform(-12, -6, (16385, 4))
+
+    def test_decimate_psd(self):
+        """
+        Test decimated traces stay within xlim, keep peaks and dips, and have at most max_points.
+        """
+        f, p = decimate_psd(self.psd, self.deltaf, xlim=[0, 200], max_points=500)
+        self.assertTrue(p.shape[0] <= 500)
+        self.assertEqual(f.shape, p.shape)
+        self.assertTrue(f.max() <= 200 + self.deltaf)
+        i2 = int(np.ceil(200 / self.deltaf)) + 1
+        np.testing.assert_array_equal(p.max(axis=0), self.psd[:i2].max(axis=0))
+        np.testing.assert_array_equal(p.min(axis=0), self.psd[:i2].min(axis=0))
+        self.assertTrue(np.all(np.diff(f, axis=0) >= 0))
+
+        # narrow xlim needs no decimation
+        f, p = decimate_psd(self.psd, self.deltaf, xlim=[0, 3], max_points=500)
+        np.testing.assert_array_equal(p, self.psd[:p.shape[0]])
+        np.testing.assert_allclose(f[:, 0], self.deltaf * np.arange(p.shape[0]))
+
+    def test_render_psd_plots(self):
+        """
+        Test plots get saved serially and by a pool of workers.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        jobs = [psd_plot_job(os.path.join(tmp_dir, 'plot%d.pdf' % i), self.psd * (i + 1), self.deltaf, '121f03',
+                             500.0, 'LAB1O1', 32768, axs='xyz' if i % 2 else 'xyzv') for i in range(4)]
+        self.assertEqual(render_psd_plots(jobs[:2]), [job[0] for job in jobs[:2]])
+        self.assertEqual(render_psd_plots(jobs[2:], workers=2), [job[0] for job in jobs[2:]])
+        for job in jobs:
+            self.assertTrue(os.path.getsize(job[0]) > 0)
+        shutil.rmtree(tmp_dir)
+
+def suite():
+    return unittest.makeSuite(SpectralAveragePlotTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import datetime
+import unittest
+import tempfile
+import numpy as np
+from ugaudio.create import padwrite
+from ugaudio.load import padread
+from ugaudio.spectral_average_calc import PsdAccumulator
+from ugaudio.spectrogram import iter_psd_slices, SpectrogramStore, build_spectrogram, _time_edges
+
+class SpectrogramTestCase(unittest.TestCase):
+    """
+    Test suite for ugaudio.spectrogram.
+    """
+
+    def setUp(self):
+        """
+        Get set up for tests.
+        """
+        # two 2-minute files at 100 sa/sec, with a 1-minute gap between them
+        np.random.seed(11)
+        self.fs, self.nfft = 100.0, 64
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pad_files = []
+        for b in ['2020_04_18_00_00_00.000+2020_04_18_00_02_00.000.121f02',
+                  '2020_04_18_00_03_00.000+2020_04_18_00_05_00.000.121f02']:
+            fname = os.path.join(self.tmp_dir, b)
+            x, y, z = np.random.randn(3, 12000)
+            padwrite(x, y, z, self.fs, fname)
+            self.pad_files.append(fname)
+
+    def tearDown(self):
+        """
+        Clean up after tests.
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def test_iter_psd_slices(self):
+        """
+        Test slices per file and per fixed time span.
+        """
+        slices = list(iter_psd_slices(self.pad_files, self.fs, self.nfft))
+        self.assertEqual(len(slices), 2)
+        self.assertEqual(slices[1].start, datetime.datetime(2020, 4, 18, 0, 3))
+        pa = PsdAccumulator(self.fs, nperseg=self.nfft)
+        pa.append(padread(self.pad_files[0]))
+        self.assertEqual(slices[0].pa.count, pa.count)
+        np.testing.assert_allclose(slices[0].pa.psd, pa.psd, rtol=1e-12)
+
+        # 1-minute slices: two per file, none in the gap
+        slices = list(iter_psd_slices(self.pad_files, self.fs, self.nfft, slice_seconds=60))
+        self.assertEqual([s.start.minute for s in slices], [0, 1, 3, 4])
+        self.assertEqual(slices[0].stop, datetime.datetime(2020, 4, 18, 0, 1))
+        pa = PsdAccumulator(self.fs, nperseg=self.nfft)
+        pa.append(padread(self.pad_files[0])[6000:])
+        np.testing.assert_allclose(slices[1].pa.psd, pa.psd, rtol=1e-12)
+
+    def test_store(self):
+        """
+        Test store appends (incrementally), maps and renders.
+        """
+        store_dir = os.path.join(self.tmp_dir, 'spgram')
+        store = SpectrogramStore(store_dir, fs=self.fs, nfft=self.nfft)
+        self.assertEqual(build_spectrogram(self.pad_files[:1], store, slice_seconds=60), 2)
+        self.assertEqual(build_spectrogram(self.pad_files, store, slice_seconds=60), 2)
+        self.assertEqual(build_spectrogram(self.pad_files, store, slice_seconds=60), 0)
+
+        # reopen existing store
+        store = SpectrogramStore(store_dir)
+        self.assertEqual(store.num_slices, 4)
+        self.assertEqual(store.last_stop(), datetime.datetime(2020, 4, 18, 0, 5))
+        m = store.psd_map()
+        self.assertEqual(m.shape, (4, self.nfft // 2 + 1, 4))
+        slices = list(iter_psd_slices(self.pad_files, self.fs, self.nfft, slice_seconds=60))
+        np.testing.assert_allclose(m[2], slices[2].pa.spectral_avg(), rtol=1e-6)
+        del m
+
+        # decimated image and rendered png
+        starts, stops, freqs, image = store.decimated(max_times=2, max_freqs=10, fmax=40.0)
+        self.assertEqual(image.shape, (2, 8))
+        self.assertEqual(starts[1], datetime.datetime(2020, 4, 18, 0, 3))
+        self.assertEqual(stops, [datetime.datetime(2020, 4, 18, 0, 2), datetime.datetime(2020, 4, 18, 0, 5)])
+        starts, stops, freqs, image = store.decimated(max_times=1)
+        self.assertEqual(starts, [datetime.datetime(2020, 4, 18, 0, 0)])
+        self.assertEqual(stops, [datetime.datetime(2020, 4, 18, 0, 5)])
+        png_file = os.path.join(self.tmp_dir, 'spgram.png')
+        store.render(png_file, max_times=3)
+        self.assertTrue(os.path.exists(png_file))
+
+    def test_partial_slice(self):
+        """
+        Test last slice in store grows when a later run has more of its data.
+        """
+        # four 30-second files in one 2-minute slice
+        pad_files = []
+        for i in range(4):
+            b = '2020_04_18_00_%02d_%02d.000+2020_04_18_00_%02d_%02d.000.121f03' % (i // 2, 30 * (i % 2),
+                                                                                (i + 1) // 2, 30 * ((i + 1) % 2))
+            fname = os.path.join(self.tmp_dir, b)
+            x, y, z = np.random.randn(3, 3000)
+            padwrite(x, y, z, self.fs, fname)
+            pad_files.append(fname)
+        store = SpectrogramStore(os.path.join(self.tmp_dir, 'partial'), fs=self.fs, nfft=self.nfft)
+        self.assertEqual(build_spectrogram(pad_files[:2], store, slice_seconds=120), 1)
+        t0 = datetime.datetime(2020, 4, 18, 0, 0)
+        self.assertEqual(store.last_slice(), (t0, t0 + datetime.timedelta(minutes=1)))
+        count_half = store.slice_map()[0, 2]
+        self.assertEqual(build_spectrogram(pad_files, store, slice_seconds=120), 1)
+        self.assertEqual(build_spectrogram(pad_files, store, slice_seconds=120), 0)
+        self.assertEqual(store.num_slices, 1)
+        self.assertEqual(store.last_stop(), datetime.datetime(2020, 4, 18, 0, 2))
+        full, = list(iter_psd_slices(pad_files, self.fs, self.nfft, slice_seconds=120))
+        self.assertEqual(store.slice_map()[0, 2], full.pa.count)
+        self.assertEqual(full.pa.count, 2 * count_half)
+        np.testing.assert_allclose(store.psd_map()[0], full.pa.spectral_avg(), rtol=1e-6)
+
+    def test_slice_sources(self):
+        """
+        Test a file that spans slices is a source of each of them.
+        """
+        slices = list(iter_psd_slices(self.pad_files, self.fs, self.nfft, slice_seconds=60))
+        for s, f in zip(slices, [0, 0, 1, 1]):
+            self.assertEqual(list(s.pa.sources), [os.path.basename(self.pad_files[f])])
+
+    def test_decimated_bad_range(self):
+        """
+        Test decimated raises ValueError for a frequency range without bins.
+        """
+        store = SpectrogramStore(os.path.join(self.tmp_dir, 'spgram'), fs=self.fs, nfft=self.nfft)
+        build_spectrogram(self.pad_files[:1], store)
+        self.assertRaises(ValueError, store.decimated, fmin=30.0, fmax=20.0)
+        self.assertRaises(ValueError, store.decimated, fmin=10.1, fmax=10.2)
+        self.assertRaises(ValueError, store.decimated, fmin=60.0)
+
+    def test_time_edges(self):
+        """
+        Test image rows are drawn at real times, with a blank row for each gap.
+        """
+        edges, rows = _time_edges([0.0, 1.0, 3.0, 4.0, 4.5], [1.0, 2.0, 4.0, 5.0, 5.5])
+        np.testing.assert_array_equal(edges, [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 5.5])
+        self.assertEqual(rows, [0, 1, None, 2, 3, 4])
+
+def suite():
+    return unittest.makeSuite(SpectrogramTestCase, 'test')
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite', verbosity=2)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+"""Write audio files (AIFF or WAV) from arrays of 16-bit integer frames."""
+
+import aifc
+import wave
+import numpy as np
+
+# default number of frames converted to bytes and written at a time
+BLOCK_FRAMES = 65536
+
+# Return open (AIFF or WAV if fname ends with .wav) writer and its sample dtype.
+def _open_writer(fname, fs, nchans, nframes=0):
+    """Return open (AIFF or WAV if fname ends with .wav) writer and its sample dtype.
+    
+    AIFF wants big-endian samples and WAV wants little-endian samples.  The
+    nframes value is just a first guess for the header; both modules patch the
+    header on close if a different number of frames got written.
+    """
+    sampwidth = 2 # this value based on data type (2 bytes in np.int16)
+    if fname.lower().endswith('.wav'):
+        g = wave.open(fname, 'wb')
+        g.setnchannels(nchans)
+        g.setsampwidth(sampwidth)
+        g.setframerate(int(round(fs)))
+        g.setnframes(nframes)
+        return g, '<i2'
+    g = aifc.open(fname, 'w')
+    #         nchans, sampwidth, framerate, nframes, comptype, compname
+    g.setparams((nchans, sampwidth, fs, nframes, 'NONE', 'not compressed'))
+    return g, '>i2'
+
+# Write chunks of frames, each shape (n,) for mono or (n, nchans), to AIFF (or WAV) file incrementally.
+def audiowrite_chunks(fname, chunks, fs, nchans=1, scale=None, offset=None, nframes=0, block_frames=BLOCK_FRAMES):
+    """Write chunks of frames, each shape (n,) for mono or (n, nchans), to AIFF (or WAV) file incrementally.
+    
+    Chunks can be any iterable of arrays (e.g. a generator fed by a PAD chunk
+    iterator), so the whole signal never needs to be in memory.  If scale or
+    offset is given, each chunk is conditioned as rint((chunk - offset) * scale)
+    then clipped to the int16 range; otherwise chunks are taken to already hold
+    16-bit integer values.  Either way, at most block_frames frames at a time
+    get converted to the file's byte order.  Return number of frames written.
+    """
+    g, dtype = _open_writer(fname, fs, nchans, nframes)
+    count = 0
+    try:
+        for chunk in chunks:
+            chunk = np.asarray(chunk)
+            for i in xrange(0, chunk.shape[0], block_frames):
+                block = chunk[i:i + block_frames]
+                if scale is not None or offset is not None:
+                    block = np.array(block, dtype=np.float64)
+                    if offset is not None:
+                        block -= offset
+                    if scale is not None:
+                        block *= scale
+                    np.rint(block, out=block)
+                    np.clip(block, -32768, 32767, out=block)
+                g.writeframes(block.astype(dtype).tostring())
+                count += block.shape[0]
+    finally:
+        g.close()
+    return count
+
+# Write int16 frames, shape (N,) for mono or (N, nchans), to AIFF (or WAV if fname ends with .wav) file.
+def audiowrite(fname, frames, fs):
+    """Write int16 frames, shape (N,) for mono or (N, nchans), to AIFF (or WAV if fname ends with .wav) file.
+
+    Each row of a 2d frames array is one audio frame, so columns become
+    channels (interleaved in the file).  Frames go to the file a block at a
+    time (see audiowrite_chunks), so there is never a byte-swapped copy of the
+    whole array.
+    """
+    frames = np.asarray(frames)
+    nchans = 1 if frames.ndim == 1 else frames.shape[1]
+    audiowrite_chunks(fname, [frames], fs, nchans=nchans, nframes=frames.shape[0])